@@ -1,12 +1,26 @@
-import re
-import statistics
-from collections import defaultdict
+import argparse
 import os
 
+import numpy as np
+
+from packed_genome import open_genome
+from gtf_store import STRANDS, load_annotation
+from intron_engine import (MINUS, derive_introns, gene_names_by_gene, splice_motif_codes,
+                           tally_by_chromosome, transcript_genes)
+from incremental_annotation import first_row_record, run_incremental
+from length_stats import LengthStats
+from figures import emit, intron_summary, output_paths
+from plotting import PLOTS_ENABLED
+from profiling import stage
+from result_cache import run_cached, source_files
+from sidecar import file_stamp
+
 GTF_FILE = "schoenii_annotation.gtf" 
 FASTA_FILE = "Schoenii_assembly.fa"
 OUTPUT_DATA_FILE = "all_intron_lengths.txt"
 OUTPUT_PLOT_FILE = "Figure_Intron_Distribution.png"
+EXPORT_CHUNK = 65536   # introns formatted and written per write() call
+RC_TRANSLATION = str.maketrans("ACGTN", "TGCAN")   # other symbols are kept as-is
 
 # Updated list including regulatory genes and cytoskeleton factors
 CULPRIT_KEYWORDS = [
@@ -21,22 +35,10 @@ CULPRIT_KEYWORDS = [
 ]
 # =================================================
 
-def parse_fasta(fasta_path):
-    """Reads genome fasta into a dict for consensus checking"""
-    genome = {}
-    current_chrom = None
-    seq_parts = []
+def parse_fasta(fasta_path, packed=False):
+    """Opens the genome for consensus checking: .fai/mmap index, or 2-bit packed arrays when packed=True"""
     try:
-        with open(fasta_path, 'r') as f:
-            for line in f:
-                line = line.strip()
-                if line.startswith(">"):
-                    if current_chrom: genome[current_chrom] = "".join(seq_parts)
-                    current_chrom = line[1:].split()[0]
-                    seq_parts = []
-                else:
-                    seq_parts.append(line)
-            if current_chrom: genome[current_chrom] = "".join(seq_parts)
+        genome = open_genome(fasta_path, packed)
         print(f"Loaded genome: {len(genome)} sequences.")
         return genome
     except FileNotFoundError:
@@ -44,135 +46,235 @@ def parse_fasta(fasta_path):
         return None
 
 def get_reverse_complement(seq):
-    complement = {'A': 'T', 'C': 'G', 'G': 'C', 'T': 'A', 'N': 'N'}
-    return "".join(complement.get(base, base) for base in reversed(seq.upper()))
+    return seq.upper().translate(RC_TRANSLATION)[::-1]
+
+def fallback_motif(genome, store, introns, i):
+    """Scalar splice-site read for introns the vectorised path cannot handle"""
+    seq = genome.fetch(store.seqid_names[introns['seqid'][i]], int(introns['start'][i]), int(introns['end'][i]))
+    if introns['strand'][i] == MINUS:
+        seq = get_reverse_complement(seq)
+    return f"{seq[:2]}-{seq[-2:]}"
+
+def intron_motifs(genome, store, introns):
+    """Splice motif of every intron ('' where the sequence is not in the genome)"""
+    motifs = [''] * len(introns['length'])
+    fast, bases, fallback = splice_motif_codes(genome, store, introns)
+    codes = bases.tobytes().decode('latin-1')   # 4 characters per intron
+    for j, i in enumerate(fast.tolist()):
+        motifs[i] = f"{codes[4 * j:4 * j + 2]}-{codes[4 * j + 2:4 * j + 4]}"
+    for i in fallback.tolist():
+        motifs[i] = fallback_motif(genome, store, introns, i)
+    return motifs
+
+def splice_site_counts(genome, store, introns, workers=1):
+    """Splice motif -> intron count, in order of first occurrence; read chromosome by chromosome"""
+    tally, fallback = tally_by_chromosome(genome, store, introns, workers)
+    splice_sites = {motif: count for motif, (count, _) in tally.items()}
+    first_seen = {motif: first for motif, (_, first) in tally.items()}
+    for i in fallback.tolist():
+        motif = fallback_motif(genome, store, introns, i)
+        splice_sites[motif] = splice_sites.get(motif, 0) + 1
+        first_seen[motif] = min(first_seen.get(motif, i), i)
+    return dict(sorted(splice_sites.items(), key=lambda x: first_seen[x[0]]))
+
+def culprit_entries(store, introns):
+    """(first intron index, report line) per intron-containing transcript of a conserved gene family"""
+    # Keyword match once per distinct gene name
+    gene_of = transcript_genes(store)
+    name_of = gene_names_by_gene(store)
+    culprit_name = np.array([any(k in name for k in CULPRIT_KEYWORDS) for name in store.gene_names] + [False])
+    tx_gene = gene_of[introns['transcript']]
+    hit = np.flatnonzero(culprit_name[np.where(tx_gene >= 0, name_of[tx_gene], -1)])
+    entries = []
+    if len(hit):
+        tr = introns['transcript'][hit]
+        bounds = np.flatnonzero(np.r_[True, tr[1:] != tr[:-1], True])
+        for a, b in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+            g = int(tx_gene[hit[a]])
+            g_name = store.gene_names[name_of[g]]
+            entries.append((int(hit[a]), f"{g_name} (ID: {store.gene_ids[g]}) - Introns: {introns['length'][hit[a:b]].tolist()} bp"))
+    return entries
+
+def _record_introns(store, row_record, n_records, genome):
+    """Per annotation record: transcripts, intron lengths, splice motifs and culprit lines (incremental mode)"""
+    introns = derive_introns(store)
+    motifs = intron_motifs(genome, store, introns) if genome else [''] * len(introns['length'])
+    exon_rows = np.flatnonzero(store.feature_mask('exon') & (store.gene >= 0) & (store.transcript >= 0))
+    tx_record = first_row_record(store.transcript, exon_rows, row_record, len(store.transcript_ids))
+    intron_record = tx_record[introns['transcript']].tolist()
 
-def analyze_gtf():
-    print(f"Reading {GTF_FILE}...")
+    results = [{'n_transcripts': int(n), 'lengths': [], 'motifs': [], 'culprits': []}
+               for n in np.bincount(tx_record[tx_record >= 0], minlength=n_records)]
+    for r, length, motif in zip(intron_record, introns['length'].tolist(), motifs):
+        results[r]['lengths'].append(length)
+        results[r]['motifs'].append(motif)
+    for i, line in culprit_entries(store, introns):
+        results[intron_record[i]]['culprits'].append(line)
+    return results
 
-    transcripts = defaultdict(list)
-    transcript_to_gene = {}
-    gene_id_to_name = {}
+def _incremental_analysis(gtf_path, fasta_path, genome):
+    """(n_transcripts, intron lengths, splice-site counts, culprit lines) reusing the previous run's
+    per-record results (<gtf>.introns.state.json); None if the annotation cannot be split into records"""
+    context = {'fasta': file_stamp(fasta_path), 'culprit_keywords': CULPRIT_KEYWORDS,
+               'code': [file_stamp(f) for f in [__file__] + source_files('intron_engine', 'gtf_store')]}
+    merged = run_incremental(gtf_path, gtf_path + ".introns.state.json", context,
+                             lambda store, row_record, n: _record_introns(store, row_record, n, genome))
+    if merged is None:
+        print("Incremental: a gene or transcript spans several gene records; running a full analysis")
+        return None
+    results, summary = merged
+    print(f"Incremental: re-analysed {summary['reanalysed']} of {summary['records']} gene records "
+          f"({summary['removed']} removed)")
+
+    # Global intron index = introns of earlier records + index within the record, so motifs are
+    # ordered by first occurrence exactly as splice_site_counts orders a full run
+    splice_sites, first_seen, offset = {}, {}, 0
+    for r in results:
+        for i, motif in enumerate(r['motifs']):
+            if motif:
+                splice_sites[motif] = splice_sites.get(motif, 0) + 1
+                first_seen[motif] = min(first_seen.get(motif, offset + i), offset + i)
+        offset += len(r['motifs'])
+    splice_sites = dict(sorted(splice_sites.items(), key=lambda x: first_seen[x[0]]))
+    return (sum(r['n_transcripts'] for r in results),
+            [l for r in results for l in r['lengths']],
+            splice_sites,
+            [c for r in results for c in r['culprits']])
 
-    # Regex patterns
-    re_tid = re.compile(r'transcript_id "([^"]+)"')
-    re_gid = re.compile(r'gene_id "([^"]+)"')
-    re_gname = re.compile(r'gene_name "([^"]+)"')
+def service_splice_sites(socket_path, gtf_path, fasta_path):
+    """Splice-site counts from a running query_service.py holding the same, unchanged GTF and FASTA;
+    None when the service is unreachable or serves other inputs"""
+    from query_client import QueryClient, QueryError
+    try:
+        with QueryClient(socket_path) as client:
+            if client.serves('annotation', gtf_path) and client.serves('genome', fasta_path):
+                return client.splice_sites()
+        print("Query service holds other inputs; checking splice sites locally")
+    except (OSError, QueryError) as e:
+        print(f"Query service unavailable ({e}); checking splice sites locally")
+    return None
 
+def _full_analysis(gtf_path, fasta_path, genome=None, packed=False, workers=1, table_path=None, service=None):
     try:
-        with open(GTF_FILE, 'r') as f:
-            for line in f:
-                if line.startswith("#") or not line.strip(): continue
-                parts = line.strip().split('\t')
-                if len(parts) < 9: continue
-
-                feature_type = parts[2]
-                attributes = parts[8]
-
-                gid_match = re_gid.search(attributes)
-                gname_match = re_gname.search(attributes)
-
-                if gid_match and gname_match:
-                    gene_id_to_name[gid_match.group(1)] = gname_match.group(1)
-
-                if feature_type == 'exon':
-                    tid_match = re_tid.search(attributes)
-                    if tid_match and gid_match:
-                        t_id = tid_match.group(1)
-                        transcripts[t_id].append({
-                            'chrom': parts[0],
-                            'start': int(parts[3]),
-                            'end': int(parts[4]),
-                            'strand': parts[6]
-                        })
-                        transcript_to_gene[t_id] = gid_match.group(1)
+        with stage("parse_gtf") as s:
+            store = load_annotation(gtf_path)
+            s.count = len(store)
     except FileNotFoundError:
-        print(f"ERROR: GTF file '{GTF_FILE}' not found.")
-        return
+        print(f"ERROR: GTF file '{gtf_path}' not found.")
+        return None
 
     # --- ANALYZE ---
-    intron_lengths = []
-    splice_sites = defaultdict(int)
-    culprits_found = []
-
-    genome = parse_fasta(FASTA_FILE)
-    print(f"\nAnalyzing {len(transcripts)} transcripts...")
-
-    for t_id, exons in transcripts.items():
-        exons.sort(key=lambda x: x['start'])
-        if len(exons) < 2: continue 
-
-        g_id = transcript_to_gene.get(t_id)
-        g_name = gene_id_to_name.get(g_id, "Unknown")
-        is_culprit = any(k in g_name for k in CULPRIT_KEYWORDS)
-
-        local_introns = []
-
-        for i in range(len(exons) - 1):
-            intron_start = exons[i]['end'] + 1
-            intron_end = exons[i+1]['start'] - 1
-            length = intron_end - intron_start + 1
-
-            if length < 1: continue
-
-            intron_lengths.append(length)
-            local_introns.append(length)
-
-            # Consensus Check
-            if genome and exons[0]['chrom'] in genome:
-                chrom_seq = genome[exons[0]['chrom']]
-                try:
-                    seq = chrom_seq[intron_start-1 : intron_end]
-                    if exons[0]['strand'] == '-':
-                        seq = get_reverse_complement(seq)
-                    motif = f"{seq[:2]}-{seq[-2:]}"
-                    splice_sites[motif] += 1
-                except (IndexError, KeyError):
-                    pass
-
-        if is_culprit and local_introns:
-             culprits_found.append(f"{g_name} (ID: {g_id}) - Introns: {local_introns} bp")
-
-    if intron_lengths:
-        with open(OUTPUT_DATA_FILE, "w") as f:
-            for l in intron_lengths:
-                f.write(f"{l}\n")
-        print(f"\n Exported {len(intron_lengths)} intron lengths to '{OUTPUT_DATA_FILE}'")
+    with stage("derive_introns") as s:
+        introns = derive_introns(store)
+        s.count = len(introns['length'])
+    splice_sites = None
+    if service:
+        with stage("splice_check_service"):
+            splice_sites = service_splice_sites(service, gtf_path, fasta_path)
+    if genome is None and (splice_sites is None or table_path):
+        with stage("load_genome"):
+            genome = parse_fasta(fasta_path, packed)
+
+    # Consensus check: vectorised donor/acceptor lookup, scalar slice only for edge cases
+    if splice_sites is not None:
+        print(f"Splice sites of {len(introns['length'])} introns taken from the query service")
+    elif genome:
+        with stage("splice_check", count=len(introns['length'])):
+            splice_sites = splice_site_counts(genome, store, introns, workers)
+    else:
+        splice_sites = {}
+
+    # Conserved gene families
+    with stage("culprit_scan"):
+        culprits_found = [line for _, line in culprit_entries(store, introns)]
+
+    if table_path:
+        with stage("export_table", count=len(introns['length'])):
+            export_intron_table(table_path, genome, store, introns)
+        print(f"\n Exported {len(introns['length'])} introns to '{table_path}'")
+    return introns['n_transcripts'], introns['length'], splice_sites, culprits_found
+
+def export_intron_table(table_path, genome, store, introns, chunk=EXPORT_CHUNK):
+    """One TSV row per intron (chrom, start, end, strand, transcript, motif), formatted and written
+    chunk by chunk; the motif column is empty without a genome"""
+    columns = ('seqid', 'start', 'end', 'strand', 'transcript', 'length')
+    with open(table_path, 'w') as f:
+        f.write("chrom\tstart\tend\tstrand\ttranscript\tmotif\n")
+        for a in range(0, len(introns['length']), chunk):
+            part = {k: introns[k][a:a + chunk] for k in columns}
+            motifs = intron_motifs(genome, store, part) if genome else [''] * len(part['length'])
+            f.write("".join(f"{store.seqid_names[c]}\t{s}\t{e}\t{STRANDS[st]}\t{store.transcript_ids[t]}\t{m}\n"
+                            for c, s, e, st, t, m in zip(part['seqid'].tolist(), part['start'].tolist(),
+                                                         part['end'].tolist(), part['strand'].tolist(),
+                                                         part['transcript'].tolist(), motifs)))
+
+def export_lengths(intron_lengths, data_path, chunk=EXPORT_CHUNK):
+    """Writes the lengths one per line, chunk by chunk, and returns their LengthStats"""
+    stats = LengthStats()
+    with open(data_path, "w") as f:
+        for a in range(0, len(intron_lengths), chunk):
+            part = intron_lengths[a:a + chunk]
+            f.write("".join(f"{l}\n" for l in part.tolist()))
+            stats.update(part)
+    return stats
+
+def plot_intron_histogram(stats, plot_path, plots=True, formats=None):
+    """Bins the streamed length counts and renders them (plots=True) or saves the bins for figures.py ('defer')"""
+    try:
+        written = emit(intron_summary(stats), plot_path, plots, formats)
+    except ImportError:
+        print("Matplotlib not installed")
+        return
+    if plots == 'defer':
+        print(f"Saved histogram data for later rendering: '{written[0]}'")
+    else:
+        shown = "', '".join(written)
+        print(f"Generated histogram: '{shown}'")
+
+def analyze_gtf(gtf_path=GTF_FILE, fasta_path=FASTA_FILE, data_path=OUTPUT_DATA_FILE, plot_path=OUTPUT_PLOT_FILE,
+                incremental=False, packed=False, plots=PLOTS_ENABLED, figure_formats=None, workers=1,
+                table_path=None, service=None):
+    print(f"Reading {gtf_path}...")
+
+    analysis = genome = None
+    if incremental:
+        if not os.path.exists(gtf_path):
+            print(f"ERROR: GTF file '{gtf_path}' not found.")
+            return
+        with stage("load_genome"):
+            genome = parse_fasta(fasta_path, packed)
+        with stage("incremental_analysis"):
+            analysis = _incremental_analysis(gtf_path, fasta_path, genome)
+    if analysis is None:
+        analysis = _full_analysis(gtf_path, fasta_path, genome, packed, workers, table_path, service)
+        if analysis is None:
+            return
+    elif table_path:
+        print(f"Intron table '{table_path}' is only written by a full analysis; skipped")
+    n_transcripts, intron_lengths, splice_sites, culprits_found = analysis
+    print(f"\nAnalyzing {n_transcripts} transcripts...")
+
+    intron_lengths = np.asarray(intron_lengths, dtype=np.int64)
+    stats = LengthStats()
+    if len(intron_lengths):
+        with stage("export_lengths", count=len(intron_lengths)):
+            stats = export_lengths(intron_lengths, data_path)
+        print(f"\n Exported {stats.n} intron lengths to '{data_path}'")
         
-        try:
-            import matplotlib.pyplot as plt
-            
-            plt.figure(figsize=(10, 6))
-            # Histogram
-            plt.hist(intron_lengths, bins=50, color='skyblue', edgecolor='black', alpha=0.7)
-            
-            # Mean and Median
-            mean_val = statistics.mean(intron_lengths)
-            median_val = statistics.median(intron_lengths)
-            plt.axvline(mean_val, color='blue', linestyle='dashed', linewidth=1.5, label=f'Mean: {mean_val:.1f} bp')
-            plt.axvline(median_val, color='red', linestyle='dashed', linewidth=1.5, label=f'Median: {median_val:.0f} bp')
-            
-            plt.xlabel('Intron Length (bp)')
-            plt.ylabel('Frequency')
-            plt.title('Figure: Distribution of Intron Lengths')
-            plt.legend()
-            plt.grid(axis='y', alpha=0.5)
-            
-            plt.savefig(OUTPUT_PLOT_FILE, dpi=300)
-            print(f"Generated histogram: '{OUTPUT_PLOT_FILE}'")
-            
-        except ImportError:
-            print("Matplotlib not installed")
+        if plots:
+            with stage("plot"):
+                plot_intron_histogram(stats, plot_path, plots, figure_formats)
 
     # Print text report
     print("\n" + "="*40)
     print("Intron analysis report")
     print("="*40)
-    print(f"Total introns found: {len(intron_lengths)}")
-    if intron_lengths:
-        print(f"Average Length: {statistics.mean(intron_lengths):.2f} bp")
-        print(f"Median Length: {statistics.median(intron_lengths)} bp")
-        print(f"Min/Max: {min(intron_lengths)}/{max(intron_lengths)} bp")
+    print(f"Total introns found: {stats.n}")
+    if stats.n:
+        print(f"Average Length: {stats.mean:.2f} bp")
+        print(f"Standard Deviation: {stats.stdev:.2f} bp")
+        print(f"Median Length: {stats.median} bp")
+        print(f"Min/Max: {stats.min}/{stats.max} bp")
 
     print("\n Consensus splice sites")
     if splice_sites:
@@ -190,4 +292,37 @@ def analyze_gtf():
         print(f"  ... and {len(culprits_found)-100} more.")
 
 if __name__ == "__main__":
-    analyze_gtf()
+    parser = argparse.ArgumentParser(description="Intron lengths, splice-site consensus and intron-rich gene families.")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Re-analyse only the gene records changed since the last incremental run")
+    parser.add_argument("--packed", action="store_true",
+                        help="Hold the genome as 2-bit packed arrays (cached as <fasta>.2bit.npz) instead of a memory map")
+    parser.add_argument("--no-plots", action="store_true",
+                        help="Text report and intron lengths only; matplotlib is never imported")
+    parser.add_argument("--defer-plots", action="store_true",
+                        help="Save the binned histogram (.summary.npz) for figures.py instead of rendering it")
+    parser.add_argument("--figure-formats", default=None, help="Comma-separated, e.g. png,svg (default: png)")
+    parser.add_argument("--intron-table", default=None, metavar="TSV",
+                        help="Also write one row per intron: chrom, start, end, strand, transcript, motif")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Check splice sites of several chromosomes in parallel (default: 1)")
+    parser.add_argument("--service", nargs='?', const=".analysis_service.sock", default=None, metavar="SOCKET",
+                        help="Take splice-site counts from a running query_service.py holding the same GTF and FASTA "
+                             "(full analysis only; falls back to the local check)")
+    args = parser.parse_args()
+    plots = 'defer' if args.defer_plots else PLOTS_ENABLED and not args.no_plots
+    formats = args.figure_formats.split(',') if args.figure_formats else None
+
+    if args.incremental:
+        analyze_gtf(incremental=True, packed=args.packed, plots=plots, figure_formats=formats, workers=args.workers,
+                    table_path=args.intron_table)
+    else:
+        # Skipped (report replayed, files restored) when the inputs, code and keywords are unchanged
+        run_cached("introns", analyze_gtf,
+                   inputs=[GTF_FILE, FASTA_FILE, __file__] + source_files('intron_engine', 'gtf_store', 'genome_index',
+                                                                          'packed_genome', 'figures', 'length_stats'),
+                   outputs=[OUTPUT_DATA_FILE] + output_paths(OUTPUT_PLOT_FILE, plots, formats)
+                           + ([args.intron_table] if args.intron_table else []),
+                   params={'culprit_keywords': CULPRIT_KEYWORDS, 'plots': plots, 'intron_table': args.intron_table},
+                   kwargs={'packed': args.packed, 'plots': plots, 'figure_formats': formats,
+                           'workers': args.workers, 'table_path': args.intron_table, 'service': args.service})
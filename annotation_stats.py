@@ -1,73 +1,175 @@
-import re
-from collections import defaultdict
-
-def parse_gtf_attributes(attr_str):
-    attr_dict = {}
-    for attr in re.findall(r'(\S+) "([^"]+)"', attr_str):
-        attr_dict[attr[0]] = attr[1]
-    return attr_dict
-
-def gtf_stats(gtf_path):
-    genes = {}
-    transcripts = defaultdict(set)
-    exons_per_gene = defaultdict(set)
-    exons_per_transcript = defaultdict(int)
-    alt_spliced_genes = set()
-    genes_with_introns = set()
-    single_exon_genes = set()
-    annotated_genes = set()
-    unannotated_genes = set()
-
-    with open(gtf_path) as f:
-        for line in f:
-            if line.startswith('#'): continue
-            parts = line.strip().split('\t')
-            if len(parts) < 9: continue
-            feature = parts[2]
-            attrs = parse_gtf_attributes(parts[8])
-            gene_id = attrs.get('gene_id', None)
-            transcript_id = attrs.get('transcript_id', None)
-
-            if feature == 'gene' and gene_id:
-                genes[gene_id] = attrs
-                # functional annotation: must have at least one of gene_name, go_terms, or cog_category non-empty/non "-"
-                gene_name = attrs.get('gene_name', None)
-                go_terms = attrs.get('go_terms', "-")
-                cog_category = attrs.get('cog_category', "-")
-                if ((gene_name and gene_name != "-") or
-                    (go_terms and go_terms != "-") or
-                    (cog_category and cog_category != "-")):
-                    annotated_genes.add(gene_id)
-                else:
-                    unannotated_genes.add(gene_id)
-
-            if feature == 'transcript' and transcript_id and gene_id:
-                transcripts[gene_id].add(transcript_id)
-            if feature == 'exon' and gene_id and transcript_id:
-                exons_per_gene[gene_id].add(parts[3] + "-" + parts[4])  # unique exon positions
-                exons_per_transcript[transcript_id] += 1
-
-    # Single/multi-exon/intronic genes
-    for gene, exons in exons_per_gene.items():
-        if len(exons) == 1:
-            single_exon_genes.add(gene)
+import argparse
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from gtf_store import load_annotation
+from incremental_annotation import first_row_record, run_incremental
+from profiling import stage
+from result_cache import source_files
+from sidecar import file_stamp
+
+STAT_KEYS = ['total_genes', 'total_transcripts', 'total_exons', 'single_exon_genes', 'multi_exon_genes',
+             'alt_spliced_genes', 'annotated_genes', 'unannotated_genes']
+
+def _unique_pairs(a, b):
+    """Unique (a, b) rows as an (n, 2) array"""
+    if len(a) == 0:
+        return np.empty((0, 2), dtype=np.int64)
+    return np.unique(np.column_stack([a, b]), axis=0)
+
+def gene_table(store):
+    """Per gene code: has a gene record, annotated/unannotated gene record, transcripts, unique exons"""
+    n = len(store.gene_ids)
+    has_gene = store.gene >= 0
+    has_tx = store.transcript >= 0
+
+    # Gene records; functional annotation is only decoded for these rows
+    gene_row = np.zeros(n, dtype=bool)
+    annotated = np.zeros(n, dtype=bool)
+    unannotated = np.zeros(n, dtype=bool)
+    for row in np.flatnonzero(store.feature_mask('gene') & has_gene):
+        g = store.gene[row]
+        attrs = store.attributes(row)
+        gene_row[g] = True
+        # functional annotation: must have at least one of gene_name, go_terms, or cog_category non-empty/non "-"
+        gene_name = attrs.get('gene_name', None)
+        go_terms = attrs.get('go_terms', "-")
+        cog_category = attrs.get('cog_category', "-")
+        if ((gene_name and gene_name != "-") or
+            (go_terms and go_terms != "-") or
+            (cog_category and cog_category != "-")):
+            annotated[g] = True
         else:
-            genes_with_introns.add(gene)
+            unannotated[g] = True
+
+    # Transcripts per gene
+    tx = store.feature_mask('transcript') & has_gene & has_tx
+    gene_tx = _unique_pairs(store.gene[tx], store.transcript[tx])
+    tx_per_gene = np.bincount(gene_tx[:, 0], minlength=n)
+
+    # Unique exon positions per gene
+    ex = store.feature_mask('exon') & has_gene & has_tx
+    exon_keys = np.unique(np.column_stack([store.gene[ex], store.start[ex], store.end[ex]]), axis=0) \
+        if ex.any() else np.empty((0, 3), dtype=np.int64)
+    exons_per_gene = np.bincount(exon_keys[:, 0], minlength=n)
+
+    return {'gene_row': gene_row, 'annotated': annotated, 'unannotated': unannotated,
+            'transcripts': tx_per_gene, 'exons': exons_per_gene}
+
+def stat_columns(table):
+    """Per gene code: its contribution (0/1 or a count) to each statistic"""
+    return {
+        'total_genes': table['gene_row'],
+        'total_transcripts': table['transcripts'],
+        'total_exons': table['exons'],
+        'single_exon_genes': table['exons'] == 1,
+        'multi_exon_genes': table['exons'] > 1,
+        'alt_spliced_genes': table['transcripts'] > 1,
+        'annotated_genes': table['annotated'],
+        'unannotated_genes': table['unannotated'],
+    }
+
+def _record_stats(store, row_record, n_records):
+    """Statistics per annotation record (incremental mode), each gene counted in the record of its first line"""
+    gene_record = first_row_record(store.gene, np.flatnonzero(store.gene >= 0), row_record, len(store.gene_ids))
+    seen = gene_record >= 0
+    sums = {k: np.bincount(gene_record[seen], weights=v[seen].astype(np.int64), minlength=n_records)
+            for k, v in stat_columns(gene_table(store)).items()}
+    return [{k: int(sums[k][r]) for k in sums} for r in range(n_records)]
+
+def compute_gtf_stats(gtf_path, incremental=False):
+    """Returns the annotation statistics as an ordered dict (no printing).
+
+    With incremental=True only the gene records edited since the previous incremental
+    run are re-analysed; per-record results are kept in <gtf>.stats.state.json."""
+    if incremental:
+        with stage("incremental_stats"):
+            merged = run_incremental(gtf_path, gtf_path + ".stats.state.json",
+                                     {'code': [file_stamp(f) for f in [__file__] + source_files('gtf_store')]}, _record_stats)
+        if merged is not None:
+            results, summary = merged
+            print(f"Incremental: re-analysed {summary['reanalysed']} of {summary['records']} gene records "
+                  f"({summary['removed']} removed)")
+            return {k: sum(r[k] for r in results) for k in STAT_KEYS}
+        print("Incremental: a gene or transcript spans several gene records; running a full analysis")
+    with stage("parse_gtf") as s:
+        store = load_annotation(gtf_path)
+        s.count = len(store)
+    with stage("gene_stats", count=len(store.gene_ids)):
+        return {k: int(np.sum(v)) for k, v in stat_columns(gene_table(store)).items()}
+
+def gtf_stats(gtf_path, incremental=False):
+    stats = compute_gtf_stats(gtf_path, incremental)
+    n_genes = stats['total_genes']
+    print(f"Total genes: {n_genes}")
+    print(f"Total transcripts: {stats['total_transcripts']}")
+    print(f"Total exons: {stats['total_exons']}")
+    print(f"Single-exon genes: {stats['single_exon_genes']}")
+    print(f"Genes with introns (multi-exon): {stats['multi_exon_genes']}")
+    print(f"Genes with >1 transcript (alternative splicing): {stats['alt_spliced_genes']}")
+    print(f"Functionally annotated genes: {stats['annotated_genes']} ({stats['annotated_genes']/float(n_genes)*100:.1f}%)")
+    print(f"Unannotated genes: {stats['unannotated_genes']} ({stats['unannotated_genes']/float(n_genes)*100:.1f}%)")
+    return stats
+
+# --- Batch comparison mode ---------------------------------------------------
+
+def _timed_stats(gtf_path):
+    t0 = time.perf_counter()
+    try:
+        stats = compute_gtf_stats(gtf_path)
+        error = None
+    except (FileNotFoundError, ValueError) as e:
+        stats, error = {}, str(e)
+    return gtf_path, stats, time.perf_counter() - t0, error
 
-    for gene, tids in transcripts.items():
-        if len(tids) > 1:
-            alt_spliced_genes.add(gene)
+def compare_annotations(gtf_paths, workers=None):
+    """Computes gtf statistics for every annotation in a process pool.
+    Returns {path: stats} (input order) plus 'wall_time_s' per annotation."""
+    workers = min(workers or os.cpu_count() or 1, len(gtf_paths)) or 1
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for path, stats, elapsed, error in pool.map(_timed_stats, gtf_paths):
+            if error:
+                print(f"  {path}: FAILED ({error})")
+            else:
+                print(f"  {path}: {elapsed:.2f} s")
+            stats['wall_time_s'] = round(elapsed, 3)
+            results[path] = stats
+    return results
 
-    print(f"Total genes: {len(genes)}")
-    print(f"Total transcripts: {sum(len(tset) for tset in transcripts.values())}")
-    print(f"Total exons: {sum(len(exonset) for exonset in exons_per_gene.values())}")
-    print(f"Single-exon genes: {len(single_exon_genes)}")
-    print(f"Genes with introns (multi-exon): {len(genes_with_introns)}")
-    print(f"Genes with >1 transcript (alternative splicing): {len(alt_spliced_genes)}")
-    print(f"Functionally annotated genes: {len(annotated_genes)} ({len(annotated_genes)/float(len(genes))*100:.1f}%)")
-    print(f"Unannotated genes: {len(unannotated_genes)} ({len(unannotated_genes)/float(len(genes))*100:.1f}%)")
+def write_comparison(results, out_path):
+    """Writes one table with a row per statistic and a column per annotation (.csv or .json)"""
+    if out_path.endswith('.json'):
+        with open(out_path, 'w') as f:
+            json.dump(results, f, indent=2)
+        return
+    metrics = []
+    for stats in results.values():
+        metrics += [m for m in stats if m not in metrics]
+    with open(out_path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['metric'] + list(results))
+        for m in metrics:
+            writer.writerow([m] + [results[p].get(m, '') for p in results])
 
 if __name__ == "__main__":
-    gtf_path = "schoenii_annotation.gtf"  # braker_prot.gtf, braker_rnaseq.gtf, schoenii_annotation.gtf)
-    gtf_stats(gtf_path)
+    parser = argparse.ArgumentParser(description="Global statistics for one or more GTF annotations.")
+    parser.add_argument("gtf", nargs='*', default=["schoenii_annotation.gtf"],  # braker_prot.gtf, braker_rnaseq.gtf, schoenii_annotation.gtf)
+                        help="Annotation(s); more than one switches to the parallel comparison mode")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--incremental", action="store_true",
+                        help="Single annotation only: re-analyse just the gene records changed since the last incremental run")
+    parser.add_argument("-o", "--output", default="annotation_comparison.csv", help="Comparison table (.csv or .json)")
+    args = parser.parse_args()
 
+    if len(args.gtf) == 1:
+        gtf_stats(args.gtf[0], args.incremental)
+    else:
+        print(f"Comparing {len(args.gtf)} annotations...")
+        write_comparison(compare_annotations(args.gtf, args.workers), args.output)
+        print(f"Saved comparison table to {args.output}")
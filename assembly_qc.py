@@ -0,0 +1,260 @@
+import argparse
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# =================================================
+# First-pass assembly QC, before QUAST/BUSCO (see Assembly_QC.sh).
+# Each assembly is read once in large blocks. In that pass the headers are sanitized
+# ('/' -> '_', as the awk step before BUSCO), the cleaned FASTA is written if asked,
+# and contiguity (N50/L50/N90/L90), GC content, N-gap runs and per-contig
+# lengths/global offsets are computed. Many assemblies (e.g. the IPA parameter
+# sweep: dupsTrue-100x, ...) are checked in a process pool and ranked by N50:
+#
+#   python assembly_qc.py */outputs/final_purged_primary.fasta --clean -o assembly_qc.tsv
+# =================================================
+
+BLOCK = 1 << 24   # 16 MB reads
+CLEAN_SUFFIX = "_cleaned"
+GC_CODES = list(b'GCgc')
+AT_CODES = list(b'ATat')
+N_CODES = list(b'Nn')
+SUMMARY_KEYS = ['contigs', 'total_length', 'largest_contig', 'N50', 'L50', 'N90', 'L90',
+                'gc_percent', 'n_bases', 'n_per_100kb', 'gaps']
+
+
+class _AssemblyScan:
+    """Per-contig counters filled block by block"""
+
+    def __init__(self):
+        self.names, self.lengths, self.gc, self.at = [], [], [], []
+        self.gap_contig, self.gap_start, self.gap_end = [], [], []
+        self._open_gap = None   # start of an N run still open at the end of the last segment
+
+    def start_contig(self, header):
+        self.close_contig()
+        fields = header[1:].split()
+        self.names.append(fields[0].decode() if fields else '')
+        self.lengths.append(0)
+        self.gc.append(0)
+        self.at.append(0)
+
+    def close_contig(self):
+        if self._open_gap is not None:
+            self._add_gaps([self._open_gap], [self.lengths[-1]])
+            self._open_gap = None
+
+    def feed(self, segment):
+        """Counts one run of sequence lines of the current contig"""
+        seq = segment.translate(None, b'\r\n')
+        if not seq:
+            return
+        if not self.names:
+            raise ValueError("sequence found before the first '>' header")
+        pos = self.lengths[-1]
+        self.lengths[-1] += len(seq)
+        codes = np.frombuffer(seq, dtype=np.uint8)
+        counts = np.bincount(codes, minlength=256)   # every letter in one pass
+        self.gc[-1] += int(counts[GC_CODES].sum())
+        self.at[-1] += int(counts[AT_CODES].sum())
+        if self._open_gap is None and not counts[N_CODES].any():
+            return
+
+        is_n = (codes | 0x20) == ord('n')
+        step = np.diff(is_n.view(np.int8), prepend=np.int8(self._open_gap is not None))
+        starts = (np.flatnonzero(step == 1) + pos).tolist()
+        ends = (np.flatnonzero(step == -1) + pos).tolist()
+        if self._open_gap is not None:
+            starts.insert(0, self._open_gap)
+        self._open_gap = starts.pop() if is_n[-1] else None
+        self._add_gaps(starts, ends)
+
+    def _add_gaps(self, starts, ends):
+        self.gap_contig += [len(self.names) - 1] * len(starts)
+        self.gap_start += starts
+        self.gap_end += ends
+
+
+def _scan_block(scan, text, out, line_start=True, final=False):
+    """Splits a block into header lines and sequence runs; the block may start and end mid-line
+    (sequence is fed as it arrives). Returns a header line cut by the end of the block, to be
+    prefixed to the next one."""
+    pos = 0
+    while pos < len(text):
+        if text[pos] == 0x3E and (pos or line_start):   # '>' at a line start
+            eol = text.find(b'\n', pos)
+            if eol < 0 and not final:
+                return text[pos:]
+            eol = len(text) if eol < 0 else eol + 1
+            header = text[pos:eol].replace(b'/', b'_')
+            scan.start_contig(header)
+            chunk = header
+        else:
+            nxt = text.find(b'\n>', pos)
+            eol = len(text) if nxt < 0 else nxt + 1
+            chunk = text[pos:eol]
+            scan.feed(chunk)
+        if out is not None:
+            out.write(chunk)
+        pos = eol
+    return b''
+
+
+def cleaned_path_for(fasta_path):
+    stem, ext = os.path.splitext(fasta_path)
+    return f"{stem}{CLEAN_SUFFIX}{ext or '.fasta'}"
+
+
+def scan_assembly(fasta_path, cleaned_path=None, block=BLOCK):
+    """Reads `fasta_path` once; writes the header-sanitized copy to `cleaned_path` if given.
+    Returns the filled _AssemblyScan."""
+    scan = _AssemblyScan()
+    out = open(cleaned_path, 'wb') if cleaned_path else None
+    try:
+        with open(fasta_path, 'rb') as f:
+            carry, line_start = b'', True   # only a partial header line is carried between blocks
+            for data in iter(lambda: f.read(block), b''):
+                if carry:
+                    data, line_start = carry + data, True
+                carry = _scan_block(scan, data, out, line_start)
+                line_start = data.endswith(b'\n')
+            _scan_block(scan, carry, out, final=True)
+    except ValueError as e:
+        raise ValueError(f"{fasta_path}: {e}")
+    finally:
+        if out is not None:
+            out.close()
+    scan.close_contig()
+    return scan
+
+
+def contiguity(lengths):
+    """N50/L50/N90/L90 of the contig lengths"""
+    ordered = np.sort(np.asarray(lengths, dtype=np.int64))[::-1]
+    covered = np.cumsum(ordered)
+    stats = {}
+    for pct in (50, 90):
+        i = int(np.searchsorted(covered * 100, covered[-1] * pct)) if len(ordered) else 0
+        stats[f'N{pct}'] = int(ordered[i]) if len(ordered) else 0
+        stats[f'L{pct}'] = i + 1 if len(ordered) else 0
+    return stats
+
+
+def assembly_summary(scan):
+    lengths = np.array(scan.lengths, dtype=np.int64)
+    total = int(lengths.sum())
+    gc, at = sum(scan.gc), sum(scan.at)
+    n_bases = int(np.sum(np.array(scan.gap_end, dtype=np.int64) - np.array(scan.gap_start, dtype=np.int64)))
+    summary = {'contigs': len(lengths), 'total_length': total,
+               'largest_contig': int(lengths.max()) if len(lengths) else 0}
+    summary.update(contiguity(lengths))
+    summary.update({'gc_percent': round(gc / (gc + at) * 100, 2) if gc + at else 0.0,
+                    'n_bases': n_bases,
+                    'n_per_100kb': round(n_bases / total * 1e5, 2) if total else 0.0,
+                    'gaps': len(scan.gap_start)})
+    return summary
+
+
+def write_details(scan, fasta_path):
+    """<assembly>.contigs.tsv (length, global offset, GC, Ns per contig) and <assembly>.gaps.bed"""
+    stem = os.path.splitext(fasta_path)[0]
+    gap_contig = np.array(scan.gap_contig, dtype=np.int64)
+    gap_len = np.array(scan.gap_end, dtype=np.int64) - np.array(scan.gap_start, dtype=np.int64)
+    n_per_contig = np.bincount(gap_contig, weights=gap_len, minlength=len(scan.names)).astype(np.int64)
+    offsets = np.cumsum([0] + scan.lengths[:-1])
+    with open(stem + ".contigs.tsv", 'w', newline='') as f:
+        writer = csv.writer(f, delimiter='\t')
+        writer.writerow(['contig', 'length', 'global_offset', 'gc_percent', 'n_bases'])
+        for name, length, offset, gc, at, n in zip(scan.names, scan.lengths, offsets.tolist(),
+                                                   scan.gc, scan.at, n_per_contig.tolist()):
+            writer.writerow([name, length, offset, round(gc / (gc + at) * 100, 2) if gc + at else 0.0, n])
+    with open(stem + ".gaps.bed", 'w') as f:
+        f.write("".join(f"{scan.names[c]}\t{s}\t{e}\n"
+                        for c, s, e in zip(scan.gap_contig, scan.gap_start, scan.gap_end)))
+
+
+def assembly_qc(fasta_path, clean=False, details=False):
+    """QC summary of one assembly (one read of the file)"""
+    scan = scan_assembly(fasta_path, cleaned_path_for(fasta_path) if clean else None)
+    if details:
+        write_details(scan, fasta_path)
+    return assembly_summary(scan)
+
+
+# --- Many assemblies -----------------------------------------------------------
+
+def _timed_qc(job):
+    fasta_path, clean, details = job
+    t0 = time.perf_counter()
+    try:
+        summary, error = assembly_qc(fasta_path, clean, details), None
+    except (FileNotFoundError, ValueError) as e:
+        summary, error = {}, str(e)
+    return fasta_path, summary, time.perf_counter() - t0, error
+
+
+def rank_assemblies(fasta_paths, clean=False, details=False, workers=None):
+    """QC of every assembly in a process pool; {path: summary} ordered by N50 (then fewer contigs)"""
+    workers = min(workers or os.cpu_count() or 1, len(fasta_paths)) or 1
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for path, summary, elapsed, error in pool.map(_timed_qc, [(p, clean, details) for p in fasta_paths]):
+            if error:
+                print(f"  {path}: FAILED ({error})")
+                continue
+            summary['wall_time_s'] = round(elapsed, 3)
+            results[path] = summary
+    return dict(sorted(results.items(), key=lambda x: (-x[1]['N50'], x[1]['contigs'])))
+
+
+def write_ranking(results, out_path):
+    """One row per assembly, best first (.tsv/.csv or .json)"""
+    if out_path.endswith('.json'):
+        with open(out_path, 'w') as f:
+            json.dump(results, f, indent=2)
+        return
+    with open(out_path, 'w', newline='') as f:
+        writer = csv.writer(f, delimiter=',' if out_path.endswith('.csv') else '\t')
+        writer.writerow(['rank', 'assembly'] + SUMMARY_KEYS + ['wall_time_s'])
+        for rank, (path, summary) in enumerate(results.items(), 1):
+            writer.writerow([rank, path] + [summary[k] for k in SUMMARY_KEYS] + [summary['wall_time_s']])
+
+
+def print_summary(summary):
+    print(f"Contigs: {summary['contigs']}")
+    print(f"Total length: {summary['total_length']:,} bp")
+    print(f"Largest contig: {summary['largest_contig']:,} bp")
+    print(f"N50: {summary['N50']:,} bp (L50: {summary['L50']})")
+    print(f"N90: {summary['N90']:,} bp (L90: {summary['L90']})")
+    print(f"GC content: {summary['gc_percent']:.2f}%")
+    print(f"N's per 100 kbp: {summary['n_per_100kb']:.2f} ({summary['gaps']} gaps, {summary['n_bases']:,} bp)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Single-pass contiguity/GC/gap QC for one or more assemblies.")
+    parser.add_argument("fasta", nargs='+', help="Assembly FASTA(s); more than one are ranked in parallel")
+    parser.add_argument("--clean", action="store_true",
+                        help=f"Also write the header-sanitized copy ('/' -> '_') as <assembly>{CLEAN_SUFFIX}.fasta for BUSCO")
+    parser.add_argument("--details", action="store_true",
+                        help="Also write <assembly>.contigs.tsv (lengths, global offsets, GC) and <assembly>.gaps.bed")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("-o", "--output", default="assembly_qc.tsv", help="Ranking table (.tsv, .csv or .json)")
+    args = parser.parse_args()
+
+    if len(args.fasta) == 1:
+        try:
+            print_summary(assembly_qc(args.fasta[0], args.clean, args.details))
+        except FileNotFoundError:
+            print(f"ERROR: assembly '{args.fasta[0]}' not found.")
+    else:
+        print(f"Checking {len(args.fasta)} assemblies...")
+        results = rank_assemblies(args.fasta, args.clean, args.details, args.workers)
+        for rank, (path, summary) in enumerate(results.items(), 1):
+            print(f"  {rank:>3}. {path}: N50 {summary['N50']:,} bp, {summary['contigs']} contigs, "
+                  f"{summary['total_length']:,} bp, GC {summary['gc_percent']:.2f}% ({summary['wall_time_s']:.2f} s)")
+        write_ranking(results, args.output)
+        print(f"Saved ranking to {args.output}")
@@ -0,0 +1,235 @@
+import argparse
+import contextlib
+import csv
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import profiling
+
+# =================================================
+# Multi-genome batch driver.
+# A manifest lists the inputs of every strain; each analysis script runs as one
+# task in a process pool and writes its files and stdout into <outdir>/<genome>/.
+# Parsed inputs are shared through the on-disk caches the loaders already keep
+# (.fai, <gtf>.npz, ltrs.gff3.feather): one "prepare" task per genome builds them
+# before that genome's analyses start. An input file shared by several genomes is
+# prepared once, by the first genome listing it, and the others wait for that task,
+# so no two tasks parse (or write the cache of) the same file.
+# =================================================
+
+MANIFEST_COLUMNS = ['genome', 'fasta', 'gtf', 'ltrs', 'gydb', 'blast']
+OUTPUT_DIR = "batch_results"
+SUMMARY_FILE = "batch_summary.tsv"
+
+# task -> required manifest inputs
+TASKS = {
+    'centromeres': ('fasta',),
+    'introns': ('gtf',),
+    'annotation_stats': ('gtf',),
+    'te_stats': ('ltrs',),
+    'te_classification': ('gydb',),
+    'ltr_plot': ('ltrs',),
+    'mat_genes': ('blast',),
+}
+FIGURE_TASKS = {'ltr_plot'}   # tasks whose only output is a figure
+CACHED_INPUTS = ('fasta', 'gtf', 'ltrs')   # inputs the prepare task builds sidecar caches for
+
+
+def read_manifest(path):
+    """Tab-separated manifest with a header row (genome, fasta, gtf, ltrs, gydb, blast).
+    Empty or '-' fields mean the input is missing; relative paths are taken relative
+    to the manifest's directory."""
+    base = os.path.dirname(os.path.abspath(path))
+    genomes = []
+    with open(path, newline='') as f:
+        rows = csv.DictReader((line for line in f if line.strip() and not line.startswith('#')), delimiter='\t')
+        if 'genome' not in (rows.fieldnames or []):
+            raise ValueError(f"Manifest {path} has no 'genome' column")
+        for row in rows:
+            entry = {'genome': row['genome'].strip()}
+            for col in MANIFEST_COLUMNS[1:]:
+                value = (row.get(col) or '').strip()
+                entry[col] = os.path.join(base, value) if value and value != '-' else None
+            genomes.append(entry)
+
+    names = [g['genome'] for g in genomes]
+    duplicated = sorted({n for n in names if names.count(n) > 1})
+    if duplicated:
+        raise ValueError(f"Duplicate genome names in manifest: {', '.join(duplicated)}")
+    return genomes
+
+
+# --- Worker side ---------------------------------------------------------------
+
+def _prepare(entry):
+    """Builds the shared on-disk caches of one genome's inputs"""
+    from genome_index import GenomeIndex
+    from gtf_store import load_annotation
+    from ltr_loader import load_ltrs
+
+    if entry['fasta'] and os.path.exists(entry['fasta']):
+        GenomeIndex(entry['fasta']).close()
+    if entry['gtf'] and os.path.exists(entry['gtf']):
+        load_annotation(entry['gtf'])
+    if entry['ltrs'] and os.path.exists(entry['ltrs']):
+        load_ltrs(entry['ltrs'])
+
+
+def _run(task, entry, outdir, plots=True, figure_formats=None):
+    if task == 'centromeres':
+        from find_centromeres import find_centromeres_with_global_coords
+        find_centromeres_with_global_coords(entry['fasta'], workers=1)
+    elif task == 'introns':
+        from analyze_introns_w_len import analyze_gtf
+        analyze_gtf(entry['gtf'], entry['fasta'] or "",
+                    os.path.join(outdir, "all_intron_lengths.txt"),
+                    os.path.join(outdir, "Figure_Intron_Distribution.png"), plots=plots, figure_formats=figure_formats)
+    elif task == 'annotation_stats':
+        from annotation_stats import gtf_stats
+        gtf_stats(entry['gtf'])
+    elif task == 'te_stats':
+        from retrotransposon_stats import analyze_retrotransposons
+        analyze_retrotransposons(entry['ltrs'], entry['gydb'] or "", None,
+                                 os.path.join(outdir, "FINAL_TE_DATASET.csv"))
+    elif task == 'te_classification':
+        from TE_analysis import summarize_classification
+        summarize_classification(entry['gydb'], os.path.join(outdir, "TE_Analysis_Summary.txt"))
+    elif task == 'ltr_plot':
+        from retrotransposon_analysis import plot_ltr_analysis
+        plot_ltr_analysis(entry['ltrs'], os.path.join(outdir, "LTR_Analysis.png"), plots, figure_formats)
+    elif task == 'mat_genes':
+        from mat_gene_analysis import analyze_blast_results
+        analyze_blast_results(entry['blast'], synteny_file=os.path.join(outdir, "mat_synteny.tsv"))
+
+
+def run_task(task, entry, outdir, profile_mode=None, plots=True, figure_formats=None):
+    """Runs one task with stdout captured to <outdir>/<task>.log.
+    plots=False skips figures and 'defer' leaves .summary.npz files for figures.py.
+    With profile_mode set ('timers', 'cprofile' or 'tracemalloc') its stages are
+    written to <outdir>/<task>.profile.json.
+    Returns (genome, task, seconds, error message or None)."""
+    os.environ.setdefault('MPLBACKEND', 'Agg')   # workers have no display
+    os.makedirs(outdir, exist_ok=True)
+    t0 = time.perf_counter()
+    error = None
+    profile = profiling.session(os.path.join(outdir, f"{task}.profile.json"), profile_mode) \
+        if profile_mode else contextlib.nullcontext()
+    with open(os.path.join(outdir, f"{task}.log"), 'w') as log, contextlib.redirect_stdout(log), profile:
+        try:
+            if task == 'prepare':
+                _prepare(entry)
+            else:
+                _run(task, entry, outdir, plots, figure_formats)
+        except Exception as e:   # one failing strain must not take down the batch
+            error = f"{type(e).__name__}: {e}"
+            print(f"FAILED: {error}")
+    return entry['genome'], task, time.perf_counter() - t0, error
+
+
+# --- Scheduler -------------------------------------------------------------------
+
+def plan_prepare(genomes):
+    """Assigns every cached input file to the first genome listing it.
+    Returns ({genome: entry restricted to the inputs it prepares},
+             {genome: genomes whose prepare tasks must finish before its analyses})."""
+    owner = {}
+    prepare, waits = {}, {}
+    for entry in genomes:
+        name = entry['genome']
+        prepare[name] = dict(entry)
+        waits[name] = {name}
+        for col in CACHED_INPUTS:
+            if not entry[col]:
+                continue
+            key = os.path.realpath(entry[col])
+            if key in owner:
+                prepare[name][col] = None   # built by the owner's prepare task
+                waits[name].add(owner[key])
+            else:
+                owner[key] = name
+    return prepare, waits
+
+
+def run_batch(genomes, outdir=OUTPUT_DIR, tasks=tuple(TASKS), workers=None, profile_mode=None, plots=True,
+              figure_formats=None):
+    """Schedules every (genome, task) pair in a process pool.
+    A genome's analyses are submitted as soon as the prepare tasks of all its inputs finish.
+    Returns a list of (genome, task, status, seconds) in manifest/task order."""
+    results = {}
+    workers = workers or os.cpu_count() or 1
+    prepare, waits = plan_prepare(genomes)
+    entries = {entry['genome']: entry for entry in genomes}
+    prepared, started = set(), set()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for entry in genomes:
+            genome_dir = os.path.join(outdir, entry['genome'])
+            for task in tasks:
+                absent = [col for col in TASKS[task] if not entry[col]]
+                if absent:
+                    results[(entry['genome'], task)] = (f"skipped (no {', '.join(absent)})", 0.0)
+            pending.add(pool.submit(run_task, 'prepare', prepare[entry['genome']], genome_dir,
+                                    profile_mode, plots, figure_formats))
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                genome, task, elapsed, error = fut.result()
+                status = f"failed ({error})" if error else "ok"
+                print(f"  {genome:<20} {task:<18} {status} [{elapsed:.1f} s]")
+                results[(genome, task)] = (status, elapsed)
+                if task == 'prepare':
+                    prepared.add(genome)
+            for genome, needs in waits.items():
+                if genome in started or not needs <= prepared:
+                    continue
+                started.add(genome)
+                for t in tasks:
+                    if (genome, t) not in results:
+                        pending.add(pool.submit(run_task, t, entries[genome], os.path.join(outdir, genome),
+                                                profile_mode, plots, figure_formats))
+
+    order = ['prepare'] + list(tasks)
+    return [(g['genome'], t, *results[(g['genome'], t)]) for g in genomes for t in order]
+
+
+def write_summary(rows, out_path):
+    with open(out_path, 'w', newline='') as f:
+        writer = csv.writer(f, delimiter='\t')
+        writer.writerow(['genome', 'task', 'status', 'seconds'])
+        for genome, task, status, elapsed in rows:
+            writer.writerow([genome, task, status, f"{elapsed:.3f}"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the analysis suite for every genome of a manifest in parallel.")
+    parser.add_argument("manifest", help="TSV with columns: " + ", ".join(MANIFEST_COLUMNS))
+    parser.add_argument("-o", "--outdir", default=OUTPUT_DIR, help="One sub-directory per genome is created here")
+    parser.add_argument("--workers", type=int, default=None, help="Pool size (default: all cores)")
+    parser.add_argument("--tasks", nargs='+', choices=list(TASKS), default=list(TASKS))
+    parser.add_argument("--profile", nargs='?', const='timers', choices=['timers', 'cprofile', 'tracemalloc'],
+                        help="Write <outdir>/<genome>/<task>.profile.json with per-stage timings")
+    parser.add_argument("--no-plots", action="store_true", help="Skip all figures (drops the ltr_plot task)")
+    parser.add_argument("--defer-plots", action="store_true",
+                        help="Write binned figure data (*.summary.npz) instead of figures; render later with figures.py")
+    parser.add_argument("--figure-formats", default=None, help="Comma-separated, e.g. png,svg (default: png)")
+    args = parser.parse_args()
+
+    try:
+        genomes = read_manifest(args.manifest)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"Cannot read manifest: {e}")
+        raise SystemExit(1)
+
+    tasks = [t for t in args.tasks if not (args.no_plots and t in FIGURE_TASKS)]
+    print(f"Running {len(tasks)} tasks for {len(genomes)} genomes...")
+    t0 = time.perf_counter()
+    plots = False if args.no_plots else 'defer' if args.defer_plots else True
+    rows = run_batch(genomes, args.outdir, tasks, args.workers, args.profile, plots,
+                     args.figure_formats.split(',') if args.figure_formats else None)
+    os.makedirs(args.outdir, exist_ok=True)
+    summary_path = os.path.join(args.outdir, SUMMARY_FILE)
+    write_summary(rows, summary_path)
+    failed = sum(1 for r in rows if r[2].startswith('failed'))
+    print(f"Finished in {time.perf_counter() - t0:.1f} s ({failed} failed). Summary: {summary_path}")
@@ -0,0 +1,290 @@
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from size_units import parse_size
+from synthetic_data import BLAST_NAME, CLS_NAME, FASTA_NAME, GTF_NAME, LTR_NAME, TRUTH_NAME, generate_dataset
+
+# =================================================
+# Benchmark suite over deterministic synthetic inputs (synthetic_data.py).
+# Every benchmark runs in a fresh process, so its peak RSS is its own, and reports
+# wall/CPU time, throughput (MB/s and records/s of its input) and whether its
+# result matches the planted ground truth. Sidecar caches (.fai, .npz, .feather)
+# are removed before each run unless --warm is given. Runs offline.
+# =================================================
+
+DATA_DIR = "bench_data"
+OUTPUT_JSON = "benchmark_results.json"
+SIDECARS = [".fai", ".npz", ".2bit.npz", ".feather", ".stats.state.json", ".introns.state.json"]
+STARTUP_MODULES = ['analyze_introns_w_len', 'annotation_stats', 'find_centromeres', 'retrotransposon_stats',
+                   'retrotransposon_analysis', 'TE_analysis', 'mat_gene_analysis', 'batch_analysis']
+HEAVY_MODULES = ['numpy', 'pandas', 'matplotlib', 'seaborn', 'scipy']
+
+
+# --- Benchmarks (run inside the child process, cwd = dataset directory) --------
+
+def _bench_scan(truth, workers, packed=False):
+    from motif_scanner import scan_genome
+    hits = list(scan_genome(FASTA_NAME, workers=workers, packed=packed))
+    found = {(c, s, e, strand) for c, s, e, strand in hits}
+    planted = {tuple(m) for m in truth['motifs']}
+    recall = len(planted & found) / len(planted) if planted else 1.0
+    return {'records': len(hits), 'planted': len(planted), 'recall': recall, 'ok': recall == 1.0}
+
+
+def _bench_scan_packed(truth, workers):
+    return _bench_scan(truth, workers, packed=True)
+
+
+def _bench_introns(truth, workers):
+    from analyze_introns_w_len import analyze_gtf
+    report = io.StringIO()
+    with contextlib.redirect_stdout(report):
+        analyze_gtf(GTF_NAME, FASTA_NAME, "all_intron_lengths.txt", "Figure_Intron_Distribution.png")
+    lengths = np.loadtxt("all_intron_lengths.txt", dtype=np.int64, ndmin=1)
+    sites = {}
+    for line in report.getvalue().splitlines():
+        motif, _, rest = line.strip().partition(': ')
+        if len(motif) == 5 and motif[2] == '-' and rest.endswith('%)'):
+            sites[motif] = int(rest.split()[0])
+    expected = {k: v for k, v in truth['splice_sites'].items() if v}
+    t = truth['introns']
+    ok = (len(lengths) == t['count'] and int(lengths.sum()) == t['sum']
+          and int(lengths.min()) == t['min'] and int(lengths.max()) == t['max'] and sites == expected)
+    return {'records': len(lengths), 'splice_sites': sites, 'ok': ok}
+
+
+def _bench_gtf_stats(truth, workers):
+    from annotation_stats import compute_gtf_stats
+    stats = compute_gtf_stats(GTF_NAME)
+    keys = {'total_genes': 'genes', 'total_transcripts': 'transcripts', 'total_exons': 'exons',
+            'single_exon_genes': 'single_exon_genes', 'multi_exon_genes': 'multi_exon_genes',
+            'alt_spliced_genes': 'alt_spliced_genes'}
+    return {'records': stats['total_genes'], 'ok': all(stats[k] == truth[v] for k, v in keys.items())}
+
+
+def _bench_te_stats(truth, workers):
+    import pandas as pd
+    from retrotransposon_stats import analyze_retrotransposons
+    with contextlib.redirect_stdout(io.StringIO()):
+        analyze_retrotransposons(LTR_NAME, CLS_NAME, None, "FINAL_TE_DATASET.csv")
+    df = pd.read_csv("FINAL_TE_DATASET.csv")
+    classified = int((df['Superfamily'] != 'Unclassified').sum())
+    return {'records': len(df), 'ok': len(df) == truth['ltrs'] and classified == truth['ltr_classified']}
+
+
+def _bench_mat_genes(truth, workers):
+    import pandas as pd
+    from mat_gene_analysis import analyze_blast_results
+    with contextlib.redirect_stdout(io.StringIO()):
+        analyze_blast_results(BLAST_NAME, synteny_file="mat_synteny.tsv")
+    scaffolds = sorted(pd.read_csv("mat_synteny.tsv", sep='\t')['sseqid'].unique())
+    return {'records': truth['blast_hits'], 'ok': scaffolds == truth['synteny_scaffolds']}
+
+
+# name -> (function, input file the throughput is measured on)
+BENCHMARKS = {
+    'scan_genome': (_bench_scan, FASTA_NAME),
+    'scan_genome_packed': (_bench_scan_packed, FASTA_NAME),
+    'analyze_gtf': (_bench_introns, GTF_NAME),
+    'compute_gtf_stats': (_bench_gtf_stats, GTF_NAME),
+    'analyze_retrotransposons': (_bench_te_stats, LTR_NAME),
+    'analyze_blast_results': (_bench_mat_genes, BLAST_NAME),
+}
+
+
+def _run_one(name, data_dir, workers):
+    """Child-process entry: runs one benchmark and measures it"""
+    os.chdir(data_dir)
+    os.environ["ANALYSIS_CACHE_DIR"] = ""
+    os.environ.setdefault("MPLBACKEND", "Agg")
+    with open(TRUTH_NAME) as f:
+        truth = json.load(f)
+    func, source = BENCHMARKS[name]
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    cpu0 = _cpu_seconds()
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = func(truth, workers)
+    wall = time.perf_counter() - t0
+    cpu = _cpu_seconds() - cpu0
+
+    size_mb = os.path.getsize(source) / 1e6
+    result.update({
+        'wall_s': round(wall, 4),
+        'cpu_s': round(cpu, 4),
+        'input_mb': round(size_mb, 3),
+        'mb_per_s': round(size_mb / wall, 2) if wall else None,
+        'records_per_s': round(result['records'] / wall, 1) if wall else None,
+        'rss_start_mb': round(rss_before / 1024, 1),
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'peak_rss_workers_mb': round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1),
+    })
+    return result
+
+
+def _cpu_seconds():
+    """User + system time of this process and its finished worker processes"""
+    own, workers = resource.getrusage(resource.RUSAGE_SELF), resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + workers.ru_utime + workers.ru_stime
+
+
+# --- Driver --------------------------------------------------------------------
+
+def prepare_dataset(size, seed, data_root=DATA_DIR):
+    """Generates (or reuses) the dataset for one scale; returns its directory"""
+    data_dir = os.path.abspath(os.path.join(data_root, f"{size}_seed{seed}"))
+    truth_path = os.path.join(data_dir, TRUTH_NAME)
+    if not os.path.exists(truth_path):
+        print(f"Generating {size} dataset in {data_dir}...")
+        generate_dataset(data_dir, parse_size(size), seed)
+    return data_dir
+
+
+def clear_sidecars(data_dir):
+    for source in (FASTA_NAME, GTF_NAME, LTR_NAME):
+        for suffix in SIDECARS:
+            path = os.path.join(data_dir, source + suffix)
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def run_benchmarks(sizes, names, seed=1, repeat=1, workers=None, warm=False, data_root=DATA_DIR):
+    results = []
+    ctx = multiprocessing.get_context("spawn")
+    for size in sizes:
+        data_dir = prepare_dataset(size, seed, data_root)
+        for name in names:
+            for run in range(repeat):
+                if not warm:
+                    clear_sidecars(data_dir)
+                with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                    try:
+                        result = pool.submit(_run_one, name, data_dir, workers).result()
+                    except Exception as e:
+                        result = {'ok': False, 'error': f"{type(e).__name__}: {e}"}
+                result = dict({'benchmark': name, 'scale': size, 'run': run + 1}, **result)
+                results.append(result)
+                print(_format_row(result))
+    return results
+
+
+def measure_startup(modules=STARTUP_MODULES, repeat=5):
+    """Start-up cost of every script: a fresh interpreter importing it (best of `repeat`),
+    with the import time alone and the heavy libraries it pulled in"""
+    code = ("import sys, time; t0 = time.perf_counter(); import {module}; "
+            "print(time.perf_counter() - t0); print(','.join(m for m in {heavy} if m in sys.modules))")
+    results = []
+    for module in modules:
+        best = None
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            out = subprocess.run([sys.executable, "-c", code.format(module=module, heavy=HEAVY_MODULES)],
+                                 cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True,
+                                 env=dict(os.environ, ANALYSIS_PROFILE=""))
+            wall = time.perf_counter() - t0
+            if out.returncode != 0:
+                best = {'ok': False, 'error': out.stderr.strip().splitlines()[-1]}
+                break
+            import_s, heavy = out.stdout.splitlines()[-2:]
+            if best is None or wall < best['wall_s']:
+                best = {'wall_s': round(wall, 4), 'import_s': round(float(import_s), 4),
+                        'heavy_modules': heavy.split(',') if heavy else [], 'ok': True}
+        row = dict({'benchmark': f"startup:{module}", 'scale': '-', 'run': 1}, **best)
+        results.append(row)
+        if row['ok']:
+            print(f"{'-':>6} {row['benchmark']:<40} {row['wall_s']:>7.3f} s  (import {row['import_s']:.3f} s)  "
+                  f"loads: {', '.join(row['heavy_modules']) or '-'}")
+        else:
+            print(f"{'-':>6} {row['benchmark']:<40} FAILED  {row['error']}")
+    return results
+
+
+def _format_row(r):
+    if 'error' in r:
+        return f"{r['scale']:>6} {r['benchmark']:<26} run {r['run']}  FAILED  {r['error']}"
+    return (f"{r['scale']:>6} {r['benchmark']:<26} run {r['run']}  {r['wall_s']:>9.3f} s  cpu {r['cpu_s']:>9.3f} s  "
+            f"{r['mb_per_s'] or 0:>8.1f} MB/s  {r['records_per_s'] or 0:>11.0f} rec/s  "
+            f"peak {r['peak_rss_mb']:>7.1f} MB (workers {r['peak_rss_workers_mb']:.1f})  "
+            f"{'ok' if r['ok'] else 'MISMATCH'}")
+
+
+def compare(results, baseline_path):
+    """Prints the speed-up of every benchmark/scale against a previous results JSON (best run each)"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)['results']
+
+    def best(rows):
+        out = {}
+        for r in rows:
+            if 'wall_s' in r:
+                key = (r['scale'], r['benchmark'])
+                out[key] = min(out.get(key, r['wall_s']), r['wall_s'])
+        return out
+
+    old, new = best(baseline), best(results)
+    print(f"\nComparison with {baseline_path}:")
+    for key in sorted(new):
+        if key in old:
+            print(f"{key[0]:>6} {key[1]:<26} {old[key]:>9.3f} s -> {new[key]:>9.3f} s  ({old[key] / new[key]:.2f}x)")
+
+
+def write_results(results, out_path, args):
+    meta = {
+        'date': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'python': sys.version.split()[0],
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'seed': args.seed,
+        'workers': args.workers,
+        'warm': args.warm,
+    }
+    with open(out_path, 'w') as f:
+        json.dump({'meta': meta, 'results': results}, f, indent=2)
+    print(f"\nSaved results to {out_path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks the core analyses on synthetic genomes of given sizes.")
+    parser.add_argument("--scales", default="10M", help="Comma-separated genome sizes, e.g. 10M,100M,1G")
+    parser.add_argument("--benchmarks", default=",".join(BENCHMARKS),
+                        help=f"Comma-separated subset of: {', '.join(BENCHMARKS)}")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=None, help="Motif scanner processes (default: all cores)")
+    parser.add_argument("--warm", action="store_true", help="Keep .fai/.npz/.feather caches between runs")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="Where generated datasets are kept and reused")
+    parser.add_argument("-o", "--output", default=OUTPUT_JSON)
+    parser.add_argument("--compare", metavar="OLD_JSON", help="Report speed-ups against a previous results file")
+    parser.add_argument("--startup", action="store_true",
+                        help="Also time each script's start-up (fresh interpreter + imports); "
+                             "use --benchmarks '' to measure start-up only")
+    args = parser.parse_args()
+
+    names = [n.strip() for n in args.benchmarks.split(',') if n.strip()]
+    unknown = [n for n in names if n not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+
+    results = run_benchmarks([s.strip() for s in args.scales.split(',')], names, args.seed,
+                             args.repeat, args.workers, args.warm, args.data_dir) if names else []
+    if args.startup:
+        results += measure_startup()
+    write_results(results, args.output, args)
+    if args.compare:
+        compare(results, args.compare)
+    if not all(r.get('ok') for r in results):
+        sys.exit(1)
@@ -0,0 +1,179 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+# =================================================
+# Indexed store for tabular (outfmt 6) tBLASTn hits.
+# Hits are grouped by subject scaffold and sorted by coordinate once; query
+# categories (e.g. SLA2 vs MAT/HMG/alpha) are regex-matched once per distinct
+# query, and "targets near the best anchor hit" is answered with one merge.
+# =================================================
+
+BLAST_COLUMNS = ["qseqid", "sseqid", "pident", "length", "mismatch", "gapopen",
+                 "qstart", "qend", "sstart", "send", "evalue", "bitscore"]
+
+BLAST_DTYPES = {"qseqid": str, "sseqid": str, "pident": np.float64, "length": np.int32,
+                "mismatch": np.int32, "gapopen": np.int32, "qstart": np.int32, "qend": np.int32,
+                "sstart": np.int64, "send": np.int64, "evalue": np.float64, "bitscore": np.float64}
+CHUNK_ROWS = 1_000_000
+
+# category name -> case-insensitive regex on qseqid
+MAT_CATEGORIES = {
+    'SLA2': "Sla2",
+    'MAT': "mat|HMG|alpha",
+}
+
+
+class HitStore:
+    """Hits sorted by (sseqid, start); `row` keeps each hit's line number in the input."""
+
+    def __init__(self, df, categories=MAT_CATEGORIES, queries=None):
+        df = df.reset_index(drop=True)
+        if 'row' not in df:
+            df['row'] = np.arange(len(df))
+        df['smin'] = np.minimum(df['sstart'], df['send'])
+        df['smax'] = np.maximum(df['sstart'], df['send'])
+
+        # Regex each distinct query once, then broadcast to its hits
+        distinct = pd.Series(df['qseqid'].unique(), dtype=object)
+        for name, pattern in categories.items():
+            member = set(distinct[distinct.str.contains(pattern, case=False, regex=True)])
+            df[_flag(name)] = df['qseqid'].isin(member)
+
+        self.queries = list(df['qseqid'].unique()) if queries is None else list(queries)
+        self.categories = dict(categories)
+        self.hits = df.sort_values(['sseqid', 'smin'], kind='stable').reset_index(drop=True)
+
+    @classmethod
+    def from_file(cls, path, categories=MAT_CATEGORIES):
+        return cls(pd.read_csv(path, sep='\t', names=BLAST_COLUMNS), categories)
+
+    def __len__(self):
+        return len(self.hits)
+
+    def category(self, name):
+        """Hits of one category, in input order"""
+        return self.hits[self.hits[_flag(name)]].sort_values('row')
+
+    def scaffold(self, sseqid):
+        """All hits on one subject sequence, coordinate-sorted (binary search on the sorted index)"""
+        keys = self.hits['sseqid'].to_numpy()
+        lo, hi = np.searchsorted(keys, sseqid, 'left'), np.searchsorted(keys, sseqid, 'right')
+        return self.hits.iloc[lo:hi]
+
+    def best_hits(self, name):
+        """Best (highest bitscore, earliest on ties) hit of a category per scaffold,
+        scaffolds in order of their first hit of that category"""
+        cat = self.category(name)
+        first_seen = cat.drop_duplicates('sseqid').set_index('sseqid')['row']
+        best = cat.sort_values('bitscore', ascending=False, kind='stable').drop_duplicates('sseqid')
+        order = np.argsort(first_seen.loc[best['sseqid']].to_numpy(), kind='stable')
+        return best.iloc[order]
+
+    def near_best(self, anchor, target, max_distance=None):
+        """Hits of `target` on every scaffold carrying an `anchor` hit, with their distance
+        (bp gap, 0 if overlapping) to the best anchor hit of that scaffold.
+        Scaffolds are ordered by first anchor hit, target hits by input order."""
+        best = self.best_hits(anchor)[['sseqid', 'qseqid', 'sstart', 'send', 'smin', 'smax', 'bitscore', 'row']]
+        best = best.add_prefix('anchor_').rename(columns={'anchor_sseqid': 'sseqid'})
+        best['scaffold_rank'] = np.arange(len(best))
+
+        pairs = self.category(target).merge(best, on='sseqid', how='inner')
+        pairs['distance'] = np.maximum.reduce([
+            np.zeros(len(pairs), dtype=np.int64),
+            (pairs['smin'] - pairs['anchor_smax']).to_numpy(),
+            (pairs['anchor_smin'] - pairs['smax']).to_numpy(),
+        ])
+        if max_distance is not None:
+            pairs = pairs[pairs['distance'] <= max_distance]
+        return pairs.sort_values(['scaffold_rank', 'row'], kind='stable').reset_index(drop=True)
+
+    def synteny_table(self, anchor, targets, max_distance=None):
+        """One row per (anchor scaffold, target hit) for each target category"""
+        tables = []
+        for i, target in enumerate(targets):
+            pairs = self.near_best(anchor, target, max_distance)
+            pairs.insert(0, 'target_category', target)
+            pairs.insert(0, 'anchor_category', anchor)
+            pairs['target_rank'] = i
+            tables.append(pairs)
+        table = pd.concat(tables, ignore_index=True) if tables else pd.DataFrame()
+        if not table.empty:
+            table = table.sort_values(['scaffold_rank', 'target_rank', 'row'], kind='stable')
+        columns = ['anchor_category', 'target_category', 'sseqid',
+                   'anchor_qseqid', 'anchor_sstart', 'anchor_send', 'anchor_bitscore',
+                   'qseqid', 'sstart', 'send', 'distance', 'evalue', 'bitscore', 'pident']
+        return table[columns] if not table.empty else pd.DataFrame(columns=columns)
+
+
+def stream_hits(path, categories=MAT_CATEGORIES, anchor='SLA2', targets=('MAT',),
+                chunksize=CHUNK_ROWS, max_evalue=None, min_bitscore=None,
+                max_targets=None):
+    """Builds a HitStore from an outfmt 6 file of any size, read in typed chunks.
+
+    E-value/bitscore filters are applied per chunk. Per scaffold only the first and the
+    best anchor hit are kept (enough to reproduce ordering and distances), plus every
+    target hit, so memory grows with the number of target hits. With `max_targets` only
+    that many best-scoring target hits per scaffold are kept and memory stays bounded
+    (a warning reports how many were dropped)."""
+    flags = {}        # qseqid -> (is_anchor, is_target), regex evaluated once per query
+    anchors, kept_targets = None, None
+    target_chunks = []   # uncapped: concatenated once at the end
+    row_base, dropped = 0, 0
+
+    reader = pd.read_csv(path, sep='\t', names=BLAST_COLUMNS, dtype=BLAST_DTYPES, chunksize=chunksize)
+    for chunk in reader:
+        chunk['row'] = np.arange(row_base, row_base + len(chunk))
+        row_base += len(chunk)
+        for q in chunk['qseqid'].unique():
+            if q not in flags:
+                flags[q] = (re.search(categories[anchor], q, re.IGNORECASE) is not None,
+                            any(re.search(categories[t], q, re.IGNORECASE) for t in targets))
+        if max_evalue is not None:
+            chunk = chunk[chunk['evalue'] <= max_evalue]
+        if min_bitscore is not None:
+            chunk = chunk[chunk['bitscore'] >= min_bitscore]
+
+        is_anchor = chunk['qseqid'].map(lambda q: flags[q][0]).to_numpy(dtype=bool)
+        is_target = chunk['qseqid'].map(lambda q: flags[q][1]).to_numpy(dtype=bool)
+
+        a = pd.concat([anchors, chunk[is_anchor]]) if anchors is not None else chunk[is_anchor]
+        first = a.sort_values('row').drop_duplicates('sseqid')
+        best = a.sort_values(['bitscore', 'row'], ascending=[False, True]).drop_duplicates('sseqid')
+        anchors = pd.concat([first, best]).drop_duplicates('row')
+
+        if max_targets is None:
+            target_chunks.append(chunk[is_target])
+            continue
+        t = pd.concat([kept_targets, chunk[is_target]]) if kept_targets is not None else chunk[is_target]
+        n = len(t)
+        t = t.sort_values(['bitscore', 'row'], ascending=[False, True]).groupby('sseqid', sort=False).head(max_targets)
+        dropped += n - len(t)
+        kept_targets = t
+
+    if target_chunks:
+        kept_targets = pd.concat(target_chunks)
+    if anchors is None:
+        anchors = kept_targets = pd.DataFrame({c: pd.Series(dtype=d) for c, d in BLAST_DTYPES.items()}).assign(row=[])
+    if dropped:
+        print(f"Warning: --max-targets {max_targets} dropped {dropped:,} lower-scoring target hits "
+              f"from scaffolds with more than {max_targets} target hits")
+    reduced = pd.concat([anchors, kept_targets]).drop_duplicates('row').sort_values('row')
+    return HitStore(reduced, categories, queries=list(flags))
+
+
+def _flag(name):
+    return "is_" + name
+
+
+def parse_categories(specs):
+    """['NAME=regex', ...] -> {NAME: regex}, validating each regex"""
+    categories = {}
+    for spec in specs:
+        name, _, pattern = spec.partition('=')
+        if not pattern:
+            raise ValueError(f"Category must look like NAME=REGEX, got {spec!r}")
+        re.compile(pattern)
+        categories[name] = pattern
+    return categories
@@ -0,0 +1,270 @@
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from length_stats import LengthStats
+from plotting import pyplot
+
+# =================================================
+# Figure rendering decoupled from the analyses.
+# The analyses reduce their rows to small pre-binned summaries with NumPy
+# (histogram counts/edges, per-chromosome counts, element segments or a density
+# track), and the renderers draw only those. A summary can be drawn at once,
+# or saved as <figure>.summary.npz and rendered later (deferred) - for many genomes
+# at a time in a process pool, each worker on the headless Agg backend:
+#
+#   python figures.py batch_results/*/*.summary.npz --formats png,svg --workers 8
+#
+# Any matplotlib output format is accepted (png at 300 dpi; svg/pdf/eps are vector).
+# =================================================
+
+SUMMARY_SUFFIX = ".summary.npz"
+DPI = 300
+CHROM_ORDER = ['ChrI', 'ChrII', 'ChrIII', 'ChrIV', 'ChrV', 'ChrVI']
+INTRON_BINS = 50
+DENSITY_THRESHOLD = 20000   # above this many elements panel C becomes a density track
+DENSITY_BINS = 2000
+
+
+# --- Summaries (NumPy only) ----------------------------------------------------
+
+def intron_summary(intron_lengths):
+    """Histogram panel from the lengths themselves or from a LengthStats accumulated while streaming"""
+    stats = intron_lengths if isinstance(intron_lengths, LengthStats) else LengthStats.of(intron_lengths)
+    counts, edges = stats.histogram(INTRON_BINS)
+    return {'kind': 'introns', 'counts': counts, 'edges': edges, 'mean': stats.mean, 'median': stats.median}
+
+
+def ltr_summary(df, order=CHROM_ORDER):
+    """Panels of the LTR figure from a load_ltrs() DataFrame"""
+    chrom = df['Chromosome'].to_numpy()
+    starts, lengths = df['Start'].to_numpy(np.int64), df['Length'].to_numpy(np.int64)
+    left, right = df['L_LTR_Len'].to_numpy(), df['R_LTR_Len'].to_numpy()
+
+    sim_counts, sim_edges = np.histogram(df['Similarity'].to_numpy(np.float64), bins=15)
+    len_counts, len_edges = np.histogram(lengths, bins=20)
+    ltr_edges = np.histogram_bin_edges(np.concatenate([left, right]), bins=15)   # shared bins, dodged bars
+
+    summary = {'kind': 'ltrs', 'order': np.array(order),
+               'chrom_counts': np.array([(chrom == c).sum() for c in order]),
+               'sim_counts': sim_counts, 'sim_edges': sim_edges,
+               'len_counts': len_counts, 'len_edges': len_edges,
+               'ltr_edges': ltr_edges, 'left_counts': np.histogram(left, ltr_edges)[0],
+               'right_counts': np.histogram(right, ltr_edges)[0],
+               'max_pos': df['End'].max() * 1.05}
+
+    # Panel C: element segments, or one binned density row per chromosome when there are too many
+    chrom_idx = np.full(len(chrom), -1)
+    for i, c in enumerate(order):
+        chrom_idx[chrom == c] = i
+    placed = chrom_idx >= 0
+    if len(df) > DENSITY_THRESHOLD:
+        edges = np.linspace(0, summary['max_pos'], DENSITY_BINS + 1)
+        density = np.zeros((len(order), DENSITY_BINS), dtype=np.int64)
+        for i in range(len(order)):
+            sel = chrom_idx == i
+            density[i] = np.histogram(starts[sel] + lengths[sel] // 2, bins=edges)[0]
+        summary.update(density=density, density_edges=edges)
+    else:
+        summary.update(seg_chrom=chrom_idx[placed], seg_start=starts[placed], seg_len=lengths[placed])
+    return summary
+
+
+def save_summary(summary, path):
+    with open(path, 'wb') as f:
+        np.savez(f, **summary)
+
+
+def load_summary(path):
+    with np.load(path, allow_pickle=False) as data:
+        return {k: (data[k].item() if data[k].ndim == 0 else data[k]) for k in data.files}
+
+
+# --- Renderers -----------------------------------------------------------------
+
+def _bars(ax, counts, edges, **style):
+    ax.bar(edges[:-1], counts, width=np.diff(edges), align='edge', **style)
+
+
+def _desaturate(color, prop):
+    """Same muted tone seaborn gives bar plots"""
+    import colorsys
+    from matplotlib.colors import to_rgb
+    h, l, sat = colorsys.rgb_to_hls(*to_rgb(color))
+    return colorsys.hls_to_rgb(h, l, sat * prop)
+
+
+def draw_introns(plt, s):
+    fig = plt.figure(figsize=(10, 6))
+    ax = fig.gca()
+    _bars(ax, s['counts'], s['edges'], color='skyblue', edgecolor='black', alpha=0.7)
+    ax.axvline(s['mean'], color='blue', linestyle='dashed', linewidth=1.5, label=f"Mean: {s['mean']:.1f} bp")
+    ax.axvline(s['median'], color='red', linestyle='dashed', linewidth=1.5, label=f"Median: {s['median']:.0f} bp")
+    ax.set_xlabel('Intron Length (bp)')
+    ax.set_ylabel('Frequency')
+    ax.set_title('Figure: Distribution of Intron Lengths')
+    ax.legend()
+    ax.grid(axis='y', alpha=0.5)
+    return fig
+
+
+def draw_ltrs(plt, s):
+    order = [str(c) for c in s['order']]
+    plt.rcParams.update({'font.size': 12})
+    fig = plt.figure(figsize=(16, 18))
+    gs = fig.add_gridspec(3, 2, height_ratios=[1, 0.8, 1], hspace=0.4)
+
+    ax1 = fig.add_subplot(gs[0, 0])
+    ax1.bar(range(len(order)), s['chrom_counts'], width=0.8, color=_desaturate('steelblue', 0.75), edgecolor='black')
+    ax1.set_xticks(range(len(order)))
+    ax1.set_xticklabels(order)
+    ax1.set_title("A. Abundance of LTR Elements per Chromosome", fontsize=14, fontweight='bold', loc='left')
+    ax1.set_xlabel("Chromosome", fontsize=12)
+    ax1.set_ylabel("Number of Elements", fontsize=12)
+    for x, height in enumerate(s['chrom_counts'].tolist()):
+        ax1.annotate(f'{height}', (x, height), ha='center', va='bottom', fontsize=12, fontweight='bold')
+
+    ax3 = fig.add_subplot(gs[0, 1])
+    _bars(ax3, s['len_counts'], s['len_edges'], color='teal', alpha=0.75, edgecolor='black')
+    ax3.set_title("B. Full Element Length Distribution", fontsize=14, fontweight='bold', loc='left')
+    ax3.set_xlabel("Total Element Length (bp)", fontsize=12)
+    ax3.set_ylabel("Frequency (Number of Elements)", fontsize=12)
+    ax3.axvline(x=5500, color='red', linestyle='--', linewidth=2, label='Canonical Length (~5.5kb)')
+    ax3.legend()
+
+    ax2 = fig.add_subplot(gs[1, :])   # spans both columns
+    if 'density' in s:
+        edges = s['density_edges']
+        for y, counts in enumerate(s['density']):
+            height = 0.5 * counts / max(counts.max(), 1)
+            ax2.fill_between(edges[:-1], y - 0.25, y - 0.25 + height, step='post', facecolor='#555555', edgecolor='none')
+    else:
+        for y in range(len(order)):
+            sel = s['seg_chrom'] == y
+            ax2.broken_barh(list(zip(s['seg_start'][sel], s['seg_len'][sel])), (y - 0.25, 0.5),
+                            facecolor='#555555', edgecolor='none')
+    ax2.set_yticks(range(len(order)))
+    ax2.set_yticklabels(order, fontsize=12)
+    ax2.set_xlim(0, s['max_pos'])
+    ax2.set_xlabel("Genomic Coordinate (bp)", fontsize=12)
+    ax2.set_ylabel("Chromosome", fontsize=12)
+    ax2.set_title("C. Genomic Distribution of LTR Elements", fontsize=14, fontweight='bold', loc='left')
+    ax2.grid(True, axis='x', linestyle='--', alpha=0.5)
+
+    ax5 = fig.add_subplot(gs[2, 0])
+    edges, width = s['ltr_edges'], np.diff(s['ltr_edges'])
+    for k, (label, counts) in enumerate([('Left LTR', s['left_counts']), ('Right LTR', s['right_counts'])]):
+        # dodged like seaborn's multiple='dodge', shrink=0.8
+        ax5.bar(edges[:-1] + width * (0.1 + 0.4 * k), counts, width=width * 0.4, align='edge',
+                color=f'C{k}', alpha=0.75, edgecolor='black', label=label)
+    ax5.legend(title='Type')
+    ax5.set_title("D. LTR Region Length Distribution", fontsize=14, fontweight='bold', loc='left')
+    ax5.set_xlabel("LTR Length (bp)", fontsize=12)
+    ax5.set_ylabel("Frequency (Number of LTRs)", fontsize=12)
+
+    ax4 = fig.add_subplot(gs[2, 1])
+    _bars(ax4, s['sim_counts'], s['sim_edges'], color='rebeccapurple', alpha=0.75, edgecolor='black')
+    ax4.set_title("E. LTR Pair Sequence Identity", fontsize=14, fontweight='bold', loc='left')
+    ax4.set_xlabel("Sequence Identity (%)", fontsize=12)
+    ax4.set_ylabel("Frequency (Number of Elements)", fontsize=12)
+
+    fig.tight_layout()
+    return fig
+
+
+DRAWERS = {'introns': draw_introns, 'ltrs': draw_ltrs}
+
+
+def figure_paths(out_path, formats=None):
+    """Output files for `out_path` in each of `formats` (default: the path's own extension)"""
+    base, ext = os.path.splitext(out_path)
+    if not formats:
+        return [out_path]
+    return [f"{base}.{fmt.lstrip('.')}" for fmt in formats]
+
+
+def render(summary, out_path, formats=None):
+    """Draws a summary (dict or .summary.npz path) into every requested format; returns the files written"""
+    if isinstance(summary, str):
+        summary = load_summary(summary)
+    plt = pyplot()
+    fig = DRAWERS[summary['kind']](plt, summary)
+    paths = figure_paths(out_path, formats)
+    for path in paths:
+        fig.savefig(path, dpi=DPI)
+    plt.close(fig)
+    return paths
+
+
+def emit(summary, out_path, plots=True, formats=None):
+    """The analyses' single exit point for figures.
+    plots=True renders now, 'defer' saves <out_path>.summary.npz for figures.py, False does nothing.
+    Returns the files written."""
+    if plots == 'defer':
+        path = os.path.splitext(out_path)[0] + SUMMARY_SUFFIX
+        save_summary(summary, path)
+        return [path]
+    if plots:
+        return render(summary, out_path, formats)
+    return []
+
+
+def output_paths(out_path, plots=True, formats=None):
+    """What emit() would write; used to declare result-cache outputs"""
+    if plots == 'defer':
+        return [os.path.splitext(out_path)[0] + SUMMARY_SUFFIX]
+    return figure_paths(out_path, formats) if plots else []
+
+
+# --- Pooled rendering of saved summaries ---------------------------------------
+
+def _init_renderer():
+    os.environ.setdefault("MPLBACKEND", "Agg")
+    pyplot()
+
+
+def _render_job(job):
+    summary_path, out_path, formats = job
+    try:
+        return summary_path, render(summary_path, out_path, formats), None
+    except Exception as e:   # one broken summary must not stop the others
+        return summary_path, [], f"{type(e).__name__}: {e}"
+
+
+def render_many(summary_paths, formats=('png',), outdir=None, workers=None):
+    """Renders saved summaries in a process pool. Figures go next to their summary
+    (or into `outdir`), named after it. Yields (summary, files written, error or None)."""
+    jobs = []
+    for path in summary_paths:
+        name = os.path.basename(path)[:-len(SUMMARY_SUFFIX)] if path.endswith(SUMMARY_SUFFIX) else os.path.basename(path)
+        jobs.append((path, os.path.join(outdir or os.path.dirname(path), name), list(formats)))
+    workers = min(workers or os.cpu_count() or 1, max(len(jobs), 1))
+    if workers == 1:
+        _init_renderer()
+        yield from map(_render_job, jobs)
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_renderer) as pool:
+        yield from pool.map(_render_job, jobs)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render saved figure summaries (*.summary.npz) in parallel.")
+    parser.add_argument("summaries", nargs='+')
+    parser.add_argument("--formats", default="png", help="Comma-separated, e.g. png,svg,pdf")
+    parser.add_argument("-o", "--outdir", default=None, help="Default: next to each summary")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.outdir:
+        os.makedirs(args.outdir, exist_ok=True)
+    failed = 0
+    for summary_path, written, error in render_many(args.summaries, args.formats.split(','), args.outdir, args.workers):
+        if error:
+            failed += 1
+            print(f"FAILED {summary_path}: {error}")
+        else:
+            print(f"{summary_path} -> {', '.join(written)}")
+    if failed:
+        raise SystemExit(1)
@@ -1,59 +1,43 @@
-import re
-from Bio import SeqIO
+from genome_index import GenomeIndex
+from motif_scanner import CENTROMERE_PATTERN, scan_genome
+from result_cache import run_cached, source_files
+from profiling import stage
 
 FASTA_FILE = "Schoenii_assembly.fa"
+WORKERS = None   # None = all cores
 
-def find_centromeres_with_global_coords():
-    print(f"Reading {FASTA_FILE} to calculate Global Offsets...")
+def find_centromeres_with_global_coords(fasta_path=FASTA_FILE, workers=WORKERS):
+    print(f"Reading {fasta_path} to calculate Global Offsets...")
     
-    chrom_offsets = {}
-    current_global_position = 0
-    
-    genome_records = []
     try:
-        for record in SeqIO.parse(FASTA_FILE, "fasta"):
-            chrom_offsets[record.id] = current_global_position
-            genome_records.append(record)
-            current_global_position += len(record)
+        genome = GenomeIndex(fasta_path)
     except FileNotFoundError:
         print("Fasta file not found")
         return
 
+    # Global offsets come straight from the .fai lengths; no sequence is loaded here
+    chrom_offsets = dict(genome.offsets)
+    current_global_position = genome.total_length
+    genome.close()
+
     print(f"Total genome length (Concatenated): {current_global_position:,} bp")
     print("-" * 80)
     print(f"{'Chrom':<10} | {'Local Start':<12} | {'Local End':<12} | {'GLOBAL START':<15} | {'GLOBAL END':<15}")
     print("-" * 80)
 
-    # Scan for motifs
-    pattern = re.compile(r"([AG]TCAC[AG]TG)([ATCGN]{70,120})(TGT[AT][TG]G[TG]T)")
-
-    for record in genome_records:
-        # Skip mitochondria if present
-        if "Mito" in record.id or "ChrM" in record.id or "mt" in record.id.lower():
-            continue
-
-        offset = chrom_offsets[record.id]
-
-        # Search Forward Strand
-        for match in pattern.finditer(str(record.seq)):
-            local_start = match.start() + 1
-            local_end = match.end()
-            
+    # Scan for motifs on both strands, chunked across all cores (mitochondria skipped)
+    with stage("motif_scan") as s:
+        s.count = 0
+        for chrom, local_start, local_end, strand in scan_genome(fasta_path, CENTROMERE_PATTERN, workers=workers):
+            offset = chrom_offsets[chrom]
             global_start = offset + local_start
             global_end = offset + local_end
-            
-            print(f"{record.id:<10} | {local_start:<12} | {local_end:<12} | {global_start:<15,} | {global_end:<15,}")
+            suffix = " (Rev)" if strand == '-' else ""
+            s.count += 1
 
-        # Search Reverse Strand
-        rev_seq = record.seq.reverse_complement()
-        for match in pattern.finditer(str(rev_seq)):
-            local_start = len(record) - match.end() + 1
-            local_end = len(record) - match.start()
-            
-            global_start = offset + local_start
-            global_end = offset + local_end
-            
-            print(f"{record.id:<10} | {local_start:<12} | {local_end:<12} | {global_start:<15,} | {global_end:<15,} (Rev)")
+            print(f"{chrom:<10} | {local_start:<12} | {local_end:<12} | {global_start:<15,} | {global_end:<15,}{suffix}")
 
 if __name__ == "__main__":
-    find_centromeres_with_global_coords()
+    run_cached("centromeres", find_centromeres_with_global_coords,
+               inputs=[FASTA_FILE, __file__] + source_files('motif_scanner', 'genome_index'),
+               outputs=[], params={'pattern': CENTROMERE_PATTERN})
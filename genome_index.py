@@ -0,0 +1,188 @@
+import mmap
+import os
+
+import numpy as np
+
+from sidecar import atomic_write
+
+# =================================================
+# Random-access genome layer shared by the analysis scripts.
+# A samtools-compatible .fai index is built once next to the FASTA; slices are
+# then served straight from a memory map, so no chromosome is ever fully loaded.
+# A FASTA with uneven line widths has no .fai layout; it is read into memory
+# instead (as the original per-script parsers did). If the .fai cannot be
+# written (read-only directory) the index is kept in memory only.
+# =================================================
+
+COMPLEMENT = str.maketrans("ACGTNacgtn", "TGCANtgcan")
+
+
+def fai_path_for(fasta_path):
+    return fasta_path + ".fai"
+
+
+def fai_entries(fasta_path):
+    """Scans the FASTA once: (name, length, offset, linebases, linewidth) per record.
+    Raises ValueError if a record's lines are not all the same width (no .fai layout exists)."""
+    entries = []
+    name = None
+
+    def close_record():
+        if name is not None:
+            entries.append((name, length, offset, linebases, linewidth))
+
+    with open(fasta_path, 'rb') as f:
+        pos = 0
+        short_line_seen = False
+        for line in f:
+            line_len = len(line)
+            if line.startswith(b">"):
+                close_record()
+                name = line[1:].split()[0].decode()
+                length, offset, linebases, linewidth = 0, pos + line_len, 0, 0
+                short_line_seen = False
+            elif name is not None:
+                bases = len(line.rstrip(b"\r\n"))
+                if linebases == 0:
+                    if bases:
+                        linebases, linewidth = bases, line_len
+                    else:
+                        offset = pos + line_len   # blank line right after the header
+                elif bases and (short_line_seen or bases > linebases):
+                    raise ValueError(f"{fasta_path}: record '{name}' has uneven line lengths; cannot index")
+                elif bases != linebases:
+                    short_line_seen = True
+                length += bases
+            pos += line_len
+        close_record()
+    return entries
+
+
+def build_fai(fasta_path, fai_path=None):
+    """Writes a samtools-compatible .fai next to the FASTA"""
+    fai_path = fai_path or fai_path_for(fasta_path)
+    entries = fai_entries(fasta_path)
+    # Written aside and renamed into place: GenomeIndex trusts any .fai newer than the FASTA
+    with atomic_write(fai_path, 'w') as out:
+        for entry in entries:
+            out.write("\t".join(str(x) for x in entry) + "\n")
+    return fai_path
+
+
+class GenomeIndex:
+    """Indexed, memory-mapped FASTA. Coordinates are 1-based and inclusive (GTF style)."""
+
+    def __init__(self, fasta_path):
+        self.fasta_path = fasta_path
+        fai = fai_path_for(fasta_path)
+        entries = None
+        if not os.path.exists(fai) or os.path.getmtime(fai) < os.path.getmtime(fasta_path):
+            try:
+                entries = fai_entries(fasta_path)
+            except ValueError:
+                # Unevenly wrapped: no byte layout to map, so hold the sequences in memory instead
+                self._file = None
+                self._load_in_memory(fasta_path)
+                return
+            try:
+                build_fai(fasta_path, fai)
+            except OSError:
+                pass   # read-only location; index kept in memory only
+        if entries is None:
+            with open(fai) as f:
+                entries = [line.rstrip("\n").split("\t")[:5] for line in f]
+        self._set_layout(entries)
+
+        self._file = open(fasta_path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.total_length else b""
+
+    def _set_layout(self, entries):
+        self.names = []
+        self.lengths = {}
+        self.offsets = {}        # global (concatenated) 0-based start of each sequence
+        self._layout = {}        # name -> (byte offset, linebases, linewidth)
+        total = 0
+        for name, length, offset, linebases, linewidth in entries:
+            self.names.append(name)
+            self.lengths[name] = int(length)
+            self.offsets[name] = total
+            self._layout[name] = (int(offset), int(linebases), int(linewidth))
+            total += int(length)
+        self.total_length = total
+
+    def _load_in_memory(self, fasta_path):
+        """Reads every record into one unwrapped buffer, laid out as a single-line-per-record FASTA"""
+        names, seqs = [], []
+        with open(fasta_path, 'rb') as f:
+            for line in f:
+                if line.startswith(b">"):
+                    names.append(line[1:].split()[0].decode())
+                    seqs.append([])
+                elif names:
+                    seqs[-1].append(line.rstrip(b"\r\n"))
+        seqs = [b"".join(parts) for parts in seqs]
+        entries, offset = [], 0
+        for name, seq in zip(names, seqs):
+            width = max(len(seq), 1)
+            entries.append((name, len(seq), offset, width, width))
+            offset += len(seq)
+        self._set_layout(entries)
+        self._map = b"".join(seqs)
+
+    def __contains__(self, chrom):
+        return chrom in self.lengths
+
+    def __len__(self):
+        return len(self.names)
+
+    def close(self):
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        if self._file is not None:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _byte_offset(self, chrom, pos0):
+        offset, linebases, linewidth = self._layout[chrom]
+        return offset + (pos0 // linebases) * linewidth + pos0 % linebases
+
+    def release(self, chrom):
+        """Drops the pages of `chrom` this process has touched from its resident set
+        (they stay in the OS page cache), so walking the genome chromosome by
+        chromosome keeps at most one chromosome resident"""
+        if not isinstance(self._map, mmap.mmap) or not hasattr(mmap, 'MADV_DONTNEED') or not self.lengths[chrom]:
+            return
+        start = self._layout[chrom][0] // mmap.PAGESIZE * mmap.PAGESIZE
+        end = self._byte_offset(chrom, self.lengths[chrom] - 1) + 1
+        self._map.madvise(mmap.MADV_DONTNEED, start, end - start)
+
+    def fetch(self, chrom, start=1, end=None, strand='+'):
+        """Returns chrom[start..end] (1-based, inclusive); reverse-complemented when strand is '-'.
+        Out-of-range coordinates are clipped, matching Python slice semantics."""
+        length = self.lengths[chrom]
+        end = length if end is None else min(end, length)
+        start = max(start, 1)
+        if end < start:
+            return ""
+        raw = self._map[self._byte_offset(chrom, start - 1):self._byte_offset(chrom, end - 1) + 1]
+        seq = raw.replace(b"\n", b"").replace(b"\r", b"").decode('ascii')
+        if strand == '-':
+            seq = seq.translate(COMPLEMENT)[::-1]
+        return seq
+
+    def bases_at(self, chrom_idx, pos0):
+        """Vectorised single-base lookup: raw ASCII codes (uint8) of base `pos0` (0-based)
+        on sequence `self.names[chrom_idx]`, read straight from the memory map"""
+        offset = np.array([self._layout[n][0] for n in self.names], dtype=np.int64)[chrom_idx]
+        linebases = np.array([self._layout[n][1] for n in self.names], dtype=np.int64)[chrom_idx]
+        linewidth = np.array([self._layout[n][2] for n in self.names], dtype=np.int64)[chrom_idx]
+        buf = np.frombuffer(self._map, dtype=np.uint8)
+        return buf[offset + (pos0 // linebases) * linewidth + pos0 % linebases]
+
+    def global_coord(self, chrom, pos):
+        return self.offsets[chrom] + pos
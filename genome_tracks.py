@@ -0,0 +1,337 @@
+import argparse
+import os
+import zipfile
+
+import numpy as np
+
+from genome_index import GenomeIndex
+from gtf_store import load_annotation
+from interval_index import read_intervals
+from intron_engine import derive_introns
+from ltr_loader import LTR_FILE, load_ltrs
+from motif_scanner import CENTROMERE_PATTERN, scan_genome
+from profiling import stage
+from sidecar import atomic_write, file_stamp
+from size_units import parse_size
+
+# =================================================
+# Sliding-window genome tracks in global (concatenated) coordinates.
+# One pass over the inputs stores, per RESOLUTION-bp bin of every chromosome, the
+# prefix sums of: G, C and A/C/G/T counts; bp covered by genes, exons, introns and
+# LTR elements; LTR element count and summed identity (by midpoint); motif hits
+# (by start). The sums are cached as <fasta>.tracks.npz, so any window/step that
+# is a multiple of the resolution is two array lookups per window - choosing a
+# new window size never re-reads the FASTA, GTF or LTR tables:
+#
+#   python genome_tracks.py --window 10000,50000 --step 5000 --format bedgraph -o tracks/
+# =================================================
+
+CACHE_VERSION = 2         # 2: coverage of overlapping intervals is their union
+RESOLUTION = 100          # bp per prefix-sum step
+READ_BLOCK = 1 << 20      # bases fetched per step of the GC pass (rounded to the resolution)
+FASTA_FILE = "Schoenii_assembly.fa"
+GTF_FILE = "schoenii_annotation.gtf"
+HITS_FILE = "centromere_hits.bed"   # optional motif_scanner.py output; scanned for when missing
+SUMS = ('g', 'c', 'acgt', 'gene_bp', 'exon_bp', 'intron_bp', 'te_bp', 'te_count', 'te_identity', 'motif_count')
+TRACKS = ('gc', 'gc_skew', 'gene_density', 'exon_density', 'intron_density', 'te_density', 'te_count',
+          'ltr_identity', 'motif_count')
+
+
+def coverage_prefix(edges, starts, ends):
+    """Total length of [start, end) intervals (0-based, half-open) lying left of each edge:
+    sum over intervals of |[s, e) & [0, x)|, evaluated for all edges by binary search"""
+    s, e = np.sort(starts), np.sort(ends)
+    cum_s, cum_e = np.r_[0, np.cumsum(s)], np.r_[0, np.cumsum(e)]
+    ks, ke = np.searchsorted(s, edges), np.searchsorted(e, edges)
+    return edges * ks - cum_s[ks] - (edges * ke - cum_e[ke])
+
+
+def merge_intervals(starts, ends):
+    """Union of [start, end) intervals as sorted, disjoint (starts, ends); touching intervals are joined"""
+    starts, ends = np.asarray(starts, dtype=np.int64), np.asarray(ends, dtype=np.int64)
+    if not len(starts):
+        return starts, ends
+    order = np.argsort(starts, kind='stable')
+    s, e = starts[order], ends[order]
+    first = np.flatnonzero(np.r_[True, s[1:] > np.maximum.accumulate(e)[:-1]])
+    return s[first], np.maximum.reduceat(e, first)
+
+
+def point_prefix(edges, positions, weights=None):
+    """Count (or weight sum) of 0-based positions left of each edge"""
+    order = np.argsort(positions, kind='stable')
+    cum = np.r_[0, np.cumsum(np.ones(len(order)) if weights is None else np.asarray(weights, dtype=np.float64)[order])]
+    return cum[np.searchsorted(np.asarray(positions)[order], edges)]
+
+
+class GenomeTracks:
+    """Prefix sums per RESOLUTION-bp bin, chromosome after chromosome.
+
+    `bin_offsets[i]` is the first global bin of chromosome i; each sum array has one
+    entry per bin edge (bins + 1 per chromosome), starting at 0 for every chromosome."""
+
+    def __init__(self, names, lengths, resolution, sums):
+        self.names = list(names)
+        self.lengths = np.asarray(lengths, dtype=np.int64)
+        self.resolution = resolution
+        self.sums = sums
+        self.offsets = np.r_[0, np.cumsum(self.lengths)[:-1]]                   # global bp start
+        self.bin_offsets = np.r_[0, np.cumsum(-(-self.lengths // resolution) + 1)[:-1]]
+
+    def edges(self, i):
+        """Local bp position of every bin edge of chromosome i"""
+        return np.minimum(np.arange(-(-self.lengths[i] // self.resolution) + 1) * self.resolution, self.lengths[i])
+
+    # --- construction ----------------------------------------------------------
+    @classmethod
+    def build(cls, fasta_path, gtf_path=None, ltr_path=None, hits_path=None, pattern=CENTROMERE_PATTERN,
+              resolution=RESOLUTION, workers=None):
+        with GenomeIndex(fasta_path) as genome:
+            names = list(genome.names)
+            lengths = [genome.lengths[n] for n in names]
+            tracks = cls(names, lengths, resolution, {})
+            with stage("gc_pass", count=int(sum(lengths))):
+                g, c, acgt = tracks._base_sums(genome)
+        tracks.sums.update(g=g, c=c, acgt=acgt)
+
+        empty = ([], np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64))
+        genes = exons = introns = empty
+        if gtf_path:
+            with stage("gtf_intervals"):
+                genes, exons, introns = _annotation_intervals(load_annotation(gtf_path))
+        tracks.sums['gene_bp'] = tracks._coverage(*genes)
+        tracks.sums['exon_bp'] = tracks._coverage(*exons)
+        tracks.sums['intron_bp'] = tracks._coverage(*introns)
+
+        te_chrom, te_start, te_end = empty
+        te_identity = np.empty(0)
+        if ltr_path:
+            df = load_ltrs(ltr_path)
+            te_chrom, te_identity = df['Chromosome'].to_numpy(), df['Similarity'].to_numpy(np.float64)
+            te_start, te_end = df['Start'].to_numpy(np.int64) - 1, df['End'].to_numpy(np.int64)
+        midpoint = (te_start + te_end) // 2
+        tracks.sums['te_bp'] = tracks._coverage(te_chrom, te_start, te_end)
+        tracks.sums['te_count'] = tracks._points(te_chrom, midpoint)
+        tracks.sums['te_identity'] = tracks._points(te_chrom, midpoint, te_identity)
+
+        with stage("motif_hits") as s:
+            if hits_path and os.path.exists(hits_path):
+                hit_chrom, hit_start, _ = read_intervals(hits_path)
+            else:
+                hits = list(scan_genome(fasta_path, pattern, workers=workers))
+                hit_chrom, hit_start = [h[0] for h in hits], [h[1] for h in hits]
+            s.count = len(hit_start)
+        tracks.sums['motif_count'] = tracks._points(hit_chrom, np.asarray(hit_start, dtype=np.int64) - 1)
+        return tracks
+
+    def _base_sums(self, genome):
+        """Prefix sums of G, C and A/C/G/T counts, read one block of a chromosome at a time"""
+        r = self.resolution
+        block = max(READ_BLOCK // r, 1) * r
+        out = {k: [] for k in ('g', 'c', 'acgt')}
+        for i, chrom in enumerate(self.names):
+            per_bin = {k: [] for k in out}
+            for start in range(0, int(self.lengths[i]), block):
+                seq = genome.fetch(chrom, start + 1, start + block).encode('ascii')
+                codes = np.frombuffer(seq + b'\0' * (-len(seq) % r), dtype=np.uint8).reshape(-1, r) | 0x20
+                g, c = (codes == ord('g')).sum(1), (codes == ord('c')).sum(1)
+                per_bin['g'].append(g)
+                per_bin['c'].append(c)
+                per_bin['acgt'].append(g + c + (codes == ord('a')).sum(1) + (codes == ord('t')).sum(1))
+            genome.release(chrom)
+            for k in out:
+                out[k].append(np.r_[0, np.cumsum(np.concatenate(per_bin[k] or [np.empty(0, dtype=np.int64)]))])
+        return [np.concatenate(out[k]).astype(np.int64) for k in ('g', 'c', 'acgt')]
+
+    def _by_chromosome(self, chroms, prefix_fn):
+        """Concatenated per-chromosome prefix_fn(edges, rows) over the rows on each sequence
+        (rows on sequences missing from the genome are ignored)"""
+        index = {name: i for i, name in enumerate(self.names)}
+        codes = np.array([index.get(c, -1) for c in chroms], dtype=np.int64)
+        order = np.argsort(codes, kind='stable')
+        bounds = np.searchsorted(codes[order], np.arange(len(self.names) + 1))
+        return np.concatenate([prefix_fn(self.edges(i), order[bounds[i]:bounds[i + 1]]) for i in range(len(self.names))])
+
+    def _coverage(self, chroms, starts, ends):
+        """bp covered by the union of the intervals (shared isoform exons, nested LTRs count once)"""
+        return self._by_chromosome(chroms, lambda edges, rows: coverage_prefix(
+            edges, *merge_intervals(starts[rows], ends[rows])))
+
+    def _points(self, chroms, positions, weights=None):
+        return self._by_chromosome(chroms, lambda edges, rows: point_prefix(
+            edges, positions[rows], None if weights is None else weights[rows]))
+
+    # --- windows ---------------------------------------------------------------
+    def windows(self, window, step=None):
+        """Window table: chrom index, local start/end (0-based, half-open), global start, and every track.
+        `window` and `step` must be multiples of the resolution."""
+        r, step = self.resolution, step or window
+        if window % r or step % r:
+            raise ValueError(f"window and step must be multiples of the {r} bp track resolution")
+        chrom, lo, hi = [], [], []
+        for i, length in enumerate(self.lengths.tolist()):
+            n_bins = -(-length // r)
+            first = np.arange(0, n_bins, step // r)
+            chrom.append(np.full(len(first), i))
+            lo.append(self.bin_offsets[i] + first)
+            hi.append(self.bin_offsets[i] + np.minimum(first + window // r, n_bins))
+        chrom, lo, hi = np.concatenate(chrom), np.concatenate(lo), np.concatenate(hi)
+        start = (lo - self.bin_offsets[chrom]) * r
+        end = np.minimum((hi - self.bin_offsets[chrom]) * r, self.lengths[chrom])
+        span = end - start
+        delta = {k: self.sums[k][hi] - self.sums[k][lo] for k in SUMS}
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            gc = delta['g'] + delta['c']
+            table = {'chrom': chrom, 'start': start, 'end': end, 'global_start': self.offsets[chrom] + start,
+                     'gc': np.where(delta['acgt'] > 0, gc / delta['acgt'], np.nan),
+                     'gc_skew': np.where(gc > 0, (delta['g'] - delta['c']) / gc, np.nan),
+                     'gene_density': delta['gene_bp'] / span,
+                     'exon_density': delta['exon_bp'] / span,
+                     'intron_density': delta['intron_bp'] / span,
+                     'te_density': delta['te_bp'] / span,
+                     'te_count': delta['te_count'].astype(np.int64),
+                     'ltr_identity': np.where(delta['te_count'] > 0, delta['te_identity'] / delta['te_count'], np.nan),
+                     'motif_count': delta['motif_count'].astype(np.int64)}
+        return table
+
+    # --- on-disk cache ---------------------------------------------------------
+    def save(self, cache_path, meta):
+        arrays = {k: self.sums[k] for k in SUMS}
+        arrays.update(names=np.array(self.names, dtype=str), lengths=self.lengths,
+                      resolution=np.array(self.resolution), meta=np.array(meta, dtype=str))
+        with atomic_write(cache_path) as f:
+            np.savez(f, **arrays)
+
+    @classmethod
+    def load_cached(cls, cache_path, meta):
+        with np.load(cache_path, allow_pickle=False) as data:
+            if data['meta'].tolist() != list(meta):
+                return None
+            return cls(data['names'].tolist(), data['lengths'], int(data['resolution']), {k: data[k] for k in SUMS})
+
+
+def _annotation_intervals(store):
+    """(chroms, starts, ends) of gene spans, exons and introns, 0-based half-open.
+    Gene spans run from the first to the last exon of the gene."""
+    rows = np.flatnonzero(store.feature_mask('exon') & (store.gene >= 0))
+    seqid_names = np.array(store.seqid_names, dtype=object)
+    exons = (seqid_names[store.seqid[rows]], store.start[rows] - 1, store.end[rows].astype(np.int64))
+
+    order = rows[np.argsort(store.gene[rows], kind='stable')]
+    bounds = np.flatnonzero(np.r_[True, store.gene[order][1:] != store.gene[order][:-1]]) if len(order) else []
+    genes = (seqid_names[store.seqid[order[bounds]]] if len(order) else [],
+             np.minimum.reduceat(store.start[order], bounds) - 1 if len(order) else np.empty(0, dtype=np.int64),
+             np.maximum.reduceat(store.end[order], bounds).astype(np.int64) if len(order) else np.empty(0, dtype=np.int64))
+
+    introns = derive_introns(store)
+    introns = (seqid_names[introns['seqid']], introns['start'] - 1, introns['end'].astype(np.int64))
+    return genes, exons, introns
+
+
+def load_tracks(fasta_path=FASTA_FILE, gtf_path=GTF_FILE, ltr_path=LTR_FILE, hits_path=HITS_FILE,
+                pattern=CENTROMERE_PATTERN, resolution=RESOLUTION, use_cache=True, workers=None):
+    """GenomeTracks for the inputs, reusing <fasta>.tracks.npz while none of them changed.
+    Missing GTF/LTR inputs give all-zero tracks; raises FileNotFoundError without the FASTA."""
+    if not os.path.exists(fasta_path):
+        raise FileNotFoundError(fasta_path)
+    gtf_path = gtf_path if gtf_path and os.path.exists(gtf_path) else None
+    ltr_path = ltr_path if ltr_path and os.path.exists(ltr_path) else None
+    hits_path = hits_path if hits_path and os.path.exists(hits_path) else None
+    meta = [str(CACHE_VERSION), str(resolution)]
+    meta += [str(file_stamp(p)) for p in (fasta_path, gtf_path, ltr_path, hits_path)]
+    meta.append("" if hits_path else pattern)
+    cache_path = fasta_path + ".tracks.npz"
+    if use_cache and os.path.exists(cache_path):
+        try:
+            tracks = GenomeTracks.load_cached(cache_path, meta)
+            if tracks is not None:
+                return tracks
+        except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+            pass   # unreadable/truncated/stale cache: rebuild
+
+    tracks = GenomeTracks.build(fasta_path, gtf_path, ltr_path, hits_path, pattern, resolution, workers)
+    if use_cache:
+        try:
+            tracks.save(cache_path, meta)
+        except OSError:
+            pass   # read-only location; just skip caching
+    return tracks
+
+
+def write_bedgraphs(tracks, table, prefix, names=TRACKS):
+    """One <prefix>.<track>.bedGraph per track (windows with no value are left out)"""
+    paths = []
+    chrom_names = np.array(tracks.names, dtype=object)[table['chrom']]
+    for name in names:
+        values = table[name]
+        keep = ~np.isnan(values) if values.dtype.kind == 'f' else np.ones(len(values), dtype=bool)
+        path = f"{prefix}.{name}.bedGraph"
+        with open(path, 'w') as f:
+            f.write(f"track type=bedGraph name={name}\n")
+            f.write("".join(f"{c}\t{s}\t{e}\t{v:.6g}\n" for c, s, e, v in zip(
+                chrom_names[keep], table['start'][keep].tolist(), table['end'][keep].tolist(), values[keep].tolist())))
+        paths.append(path)
+    return paths
+
+
+def write_window_npz(tracks, table, path, names=TRACKS):
+    """All tracks as columns of one .npz (chrom codes into `chrom_names`)"""
+    np.savez(path, chrom_names=np.array(tracks.names, dtype=str),
+             **{k: table[k] for k in ('chrom', 'start', 'end', 'global_start')}, **{k: table[k] for k in names})
+    return [path]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Windowed GC, gene/exon/intron, TE and motif-hit tracks.")
+    parser.add_argument("--fasta", default=FASTA_FILE)
+    parser.add_argument("--gtf", default=GTF_FILE)
+    parser.add_argument("--ltrs", default=LTR_FILE)
+    parser.add_argument("--hits", default=HITS_FILE, help="Motif hits (BED or motif_scanner TSV); scanned for when missing")
+    parser.add_argument("--pattern", default=CENTROMERE_PATTERN, help="Motif regex used when there is no hits file")
+    parser.add_argument("--window", default="10k", help="Window size(s), comma-separated (e.g. 10k,50k)")
+    parser.add_argument("--step", default=None, help="Step between windows (default: the window size)")
+    parser.add_argument("--resolution", type=int, default=RESOLUTION,
+                        help="Bin size of the cached prefix sums; windows and steps must be multiples of it")
+    parser.add_argument("--tracks", default=",".join(TRACKS), help="Comma-separated subset of: " + ", ".join(TRACKS))
+    parser.add_argument("--format", choices=['bedgraph', 'npz'], default='bedgraph')
+    parser.add_argument("--workers", type=int, default=None, help="Motif scan processes")
+    parser.add_argument("-o", "--outdir", default="tracks")
+    args = parser.parse_args()
+
+    names = [t for t in args.tracks.split(',') if t]
+    unknown = sorted(set(names) - set(TRACKS))
+    if unknown:
+        parser.error(f"unknown track(s): {', '.join(unknown)}")
+    if args.resolution < 1:
+        parser.error("--resolution must be a positive number of bp")
+    try:
+        windows = [parse_size(w) for w in args.window.split(',') if w.strip()]
+        step = parse_size(args.step) if args.step else None
+    except ValueError:
+        parser.error("--window and --step take sizes such as 10000, 10k or 1.5M")
+    for size in windows + ([step] if step is not None else []):
+        if size < 1 or size % args.resolution:
+            parser.error(f"window and step sizes must be positive multiples of the "
+                         f"{args.resolution} bp resolution (got {size:,})")
+    if not windows:
+        parser.error("--window needs at least one size")
+    try:
+        tracks = load_tracks(args.fasta, args.gtf, args.ltrs, args.hits, args.pattern, args.resolution,
+                             workers=args.workers)
+    except FileNotFoundError:
+        print(f"ERROR: FASTA file '{args.fasta}' not found.")
+        raise SystemExit(1)
+    print(f"Tracks for {len(tracks.names)} sequences ({int(tracks.lengths.sum()):,} bp) "
+          f"at {tracks.resolution} bp resolution")
+
+    os.makedirs(args.outdir, exist_ok=True)
+    for window in windows:
+        window_step = step or window
+        table = tracks.windows(window, window_step)
+        prefix = os.path.join(args.outdir, f"w{window}_s{window_step}")
+        if args.format == 'npz':
+            written = write_window_npz(tracks, table, prefix + ".npz", names)
+        else:
+            written = write_bedgraphs(tracks, table, prefix, names)
+        print(f"  window {window:,} bp, step {window_step:,} bp: {len(table['start'])} windows -> {len(written)} file(s)")
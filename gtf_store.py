@@ -0,0 +1,229 @@
+import os
+import re
+import zipfile
+
+import numpy as np
+
+from sidecar import atomic_write, file_stamp
+
+# =================================================
+# Single-pass GTF/GFF3 reader shared by the annotation scripts.
+# Each file is parsed once into NumPy columns (coordinates, strand codes and
+# interned seqid/feature/ID codes); the raw attribute column is kept as one
+# byte blob and only decoded for the rows that ask for it. The columns are
+# cached as <annotation>.npz and reused while the file's mtime/size match.
+# =================================================
+
+CACHE_VERSION = 1
+STRANDS = ['+', '-', '.']
+STRAND_CODES = {'+': 0, '-': 1}
+
+GTF_ATTR_RE = re.compile(r'(\S+) "([^"]+)"')
+GTF_KEY_RE = {key: re.compile(r'(?:^|[\s;])' + key + r' "([^"]+)"') for key in ('gene_id', 'transcript_id', 'gene_name')}
+
+
+def parse_gtf_attributes(attr_str):
+    attr_dict = {}
+    for attr in GTF_ATTR_RE.findall(attr_str):
+        attr_dict[attr[0]] = attr[1]
+    return attr_dict
+
+
+def parse_gff3_attributes(attr_str):
+    attr_dict = {}
+    for field in attr_str.strip().strip(';').split(';'):
+        if '=' in field:
+            key, value = field.split('=', 1)
+            attr_dict[key.strip()] = value.strip()
+    return attr_dict
+
+
+def is_gff3(path):
+    return path.lower().endswith(('.gff', '.gff3'))
+
+
+class _Interner:
+    def __init__(self):
+        self.codes = {}
+        self.values = []
+
+    def __call__(self, value):
+        if value is None:
+            return -1
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class GTFStore:
+    """Columnar view of an annotation. Row i is the i-th feature line of the file.
+
+    seqid/feature/gene/transcript/gene_name are int32 codes into the matching
+    *_names lists (-1 = attribute absent); start/end are 1-based inclusive."""
+
+    COLUMNS = ('seqid', 'feature', 'start', 'end', 'strand', 'gene', 'transcript', 'gene_name', 'attr_offsets')
+    TABLES = ('seqid_names', 'feature_names', 'gene_ids', 'transcript_ids', 'gene_names')
+
+    def __init__(self, columns, tables, attr_blob, gff3=False):
+        for name in self.COLUMNS:
+            setattr(self, name, columns[name])
+        for name in self.TABLES:
+            setattr(self, name, tables[name])
+        self.attr_blob = attr_blob
+        self.gff3 = gff3
+        self._attr_cache = {}
+
+    def __len__(self):
+        return len(self.start)
+
+    # --- lookups ---------------------------------------------------------
+    def feature_code(self, feature):
+        try:
+            return self.feature_names.index(feature)
+        except ValueError:
+            return -1
+
+    def feature_mask(self, feature):
+        return self.feature == self.feature_code(feature)
+
+    def raw_attributes(self, row):
+        return self.attr_blob[self.attr_offsets[row]:self.attr_offsets[row + 1]].tobytes().decode()
+
+    def attributes(self, row):
+        """Decodes the attribute column of one row on demand"""
+        parse = parse_gff3_attributes if self.gff3 else parse_gtf_attributes
+        return parse(self.raw_attributes(row))
+
+    def attribute(self, key, rows=None):
+        """Values of one attribute (None where absent) for `rows` (default: all rows); memoised per key"""
+        if rows is None:
+            if key not in self._attr_cache:
+                self._attr_cache[key] = [self.attributes(i).get(key) for i in range(len(self))]
+            return self._attr_cache[key]
+        return [self.attributes(i).get(key) for i in rows]
+
+    # --- construction ----------------------------------------------------
+    @classmethod
+    def parse(cls, path):
+        with open(path, 'r') as f:
+            return cls.parse_lines(f, is_gff3(path))
+
+    @classmethod
+    def parse_lines(cls, lines, gff3=False):
+        """Builds a store from an iterable of GTF/GFF3 lines (comments and short lines skipped)"""
+        seqids, features = _Interner(), _Interner()
+        gene_ids, transcript_ids, gene_names = _Interner(), _Interner(), _Interner()
+
+        seqid, feature, start, end, strand = [], [], [], [], []
+        gene, transcript, gene_name = [], [], []
+        attr_chunks, attr_offsets = [], [0]
+        parent_gene = {}   # GFF3 only: transcript ID -> gene ID
+
+        re_gid, re_tid, re_gname = GTF_KEY_RE['gene_id'], GTF_KEY_RE['transcript_id'], GTF_KEY_RE['gene_name']
+
+        for line in lines:
+            if line.startswith('#'): continue
+            parts = line.rstrip('\n').split('\t')
+            if len(parts) < 9: continue
+            attrs = parts[8]
+
+            if gff3:
+                a = parse_gff3_attributes(attrs)
+                ftype = parts[2]
+                if ftype == 'gene':
+                    gid, tid = a.get('ID'), None
+                elif ftype in ('mRNA', 'transcript'):
+                    gid, tid = a.get('Parent'), a.get('ID')
+                    if tid and gid: parent_gene[tid] = gid
+                else:
+                    gid, tid = None, a.get('Parent')
+                gname = a.get('Name') or a.get('gene_name')
+            else:
+                m = re_gid.search(attrs); gid = m.group(1) if m else None
+                m = re_tid.search(attrs); tid = m.group(1) if m else None
+                m = re_gname.search(attrs); gname = m.group(1) if m else None
+
+            seqid.append(seqids(parts[0]))
+            feature.append(features(parts[2]))
+            start.append(int(parts[3]))
+            end.append(int(parts[4]))
+            strand.append(STRAND_CODES.get(parts[6], 2))
+            gene.append(gene_ids(gid))
+            transcript.append(transcript_ids(tid))
+            gene_name.append(gene_names(gname))
+            encoded = attrs.encode()
+            attr_chunks.append(encoded)
+            attr_offsets.append(attr_offsets[-1] + len(encoded))
+
+        if gff3 and parent_gene:
+            # Exons/CDS only carry Parent=<transcript>; resolve their gene through the transcript
+            for i, t in enumerate(transcript):
+                if gene[i] == -1 and t != -1:
+                    gene[i] = gene_ids(parent_gene.get(transcript_ids.values[t]))
+
+        columns = {
+            'seqid': np.array(seqid, dtype=np.int32),
+            'feature': np.array(feature, dtype=np.int32),
+            'start': np.array(start, dtype=np.int64),
+            'end': np.array(end, dtype=np.int64),
+            'strand': np.array(strand, dtype=np.int8),
+            'gene': np.array(gene, dtype=np.int32),
+            'transcript': np.array(transcript, dtype=np.int32),
+            'gene_name': np.array(gene_name, dtype=np.int32),
+            'attr_offsets': np.array(attr_offsets, dtype=np.int64),
+        }
+        tables = {
+            'seqid_names': seqids.values,
+            'feature_names': features.values,
+            'gene_ids': gene_ids.values,
+            'transcript_ids': transcript_ids.values,
+            'gene_names': gene_names.values,
+        }
+        blob = np.frombuffer(b"".join(attr_chunks), dtype=np.uint8)
+        return cls(columns, tables, blob, gff3)
+
+    # --- on-disk cache ---------------------------------------------------
+    def save(self, cache_path, source_stat):
+        arrays = {name: getattr(self, name) for name in self.COLUMNS}
+        for name in self.TABLES:
+            arrays[name] = np.array(getattr(self, name), dtype=str)
+        arrays['attr_blob'] = self.attr_blob
+        arrays['meta'] = np.array([CACHE_VERSION, source_stat[0], source_stat[1], int(self.gff3)], dtype=np.int64)
+        with atomic_write(cache_path) as f:
+            np.savez(f, **arrays)
+
+    @classmethod
+    def load_cached(cls, cache_path, source_stat):
+        with np.load(cache_path, allow_pickle=False) as data:
+            meta = data['meta']
+            if meta[0] != CACHE_VERSION or meta[1] != source_stat[0] or meta[2] != source_stat[1]:
+                return None
+            columns = {name: data[name] for name in cls.COLUMNS}
+            tables = {name: data[name].tolist() for name in cls.TABLES}
+            return cls(columns, tables, data['attr_blob'], bool(meta[3]))
+
+
+def load_annotation(path, use_cache=True):
+    """Returns a GTFStore for `path`, reusing <path>.npz when the annotation is unchanged.
+    Raises FileNotFoundError if the annotation does not exist."""
+    stat = file_stamp(path)
+    if stat is None:
+        raise FileNotFoundError(path)
+    cache_path = path + ".npz"
+    if use_cache and os.path.exists(cache_path):
+        try:
+            store = GTFStore.load_cached(cache_path, stat)
+            if store is not None:
+                return store
+        except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+            pass   # unreadable/truncated/stale cache: fall through and rebuild
+
+    store = GTFStore.parse(path)
+    if use_cache:
+        try:
+            store.save(cache_path, stat)
+        except OSError:
+            pass   # read-only location; just skip caching
+    return store
@@ -0,0 +1,104 @@
+import hashlib
+import io
+import json
+import re
+
+import numpy as np
+
+from gtf_store import GTFStore, is_gff3
+from sidecar import atomic_write
+
+# =================================================
+# Incremental re-analysis of an edited annotation.
+# The GTF/GFF3 is cut into records, one per 'gene' line plus the lines that follow
+# it, and each record is identified by a hash of its bytes. Results from the
+# previous run are kept per record in a JSON state file; on the next run only
+# added or edited records are parsed and analysed, and the aggregates are rebuilt
+# from the stored per-record results in file order.
+# =================================================
+
+STATE_VERSION = 1
+GENE_LINE_RE = re.compile(rb'^[^\t\n]*\t[^\t\n]*\tgene\t', re.M)
+
+
+def split_records(path):
+    """The annotation as byte blocks, each starting at a 'gene' line
+    (lines before the first gene line form a record of their own)"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    bounds = [m.start() for m in GENE_LINE_RE.finditer(data)]
+    if not bounds or bounds[0] != 0:
+        bounds.insert(0, 0)
+    bounds.append(len(data))
+    return [data[a:b] for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+
+def record_ids(store, row_record, n_records):
+    """Per record: the gene ('g:') and transcript ('t:') IDs its lines mention"""
+    ids = [[] for _ in range(n_records)]
+    for prefix, codes, names in (('g:', store.gene, store.gene_ids), ('t:', store.transcript, store.transcript_ids)):
+        rows = codes >= 0
+        if not rows.any(): continue
+        pairs = np.unique(np.column_stack([row_record[rows], codes[rows]]), axis=0)
+        for r, c in pairs.tolist():
+            ids[r].append(prefix + names[c])
+    return ids
+
+
+def run_incremental(path, state_path, context, analyze):
+    """Runs `analyze(store, row_record, n_records) -> [result per record]` on the records
+    of `path` that are new since the last run and merges them with the stored results.
+
+    `context` (parameters, genome stamp, ...) must match the stored one for old
+    results to be reused. Results must be JSON-serialisable. Returns (results in
+    file order, {'records', 'reanalysed', 'removed'}), or None when a gene or
+    transcript is split over several records and cannot be analysed per record."""
+    context = dict(context, version=STATE_VERSION)
+    records = split_records(path)
+    digests = [hashlib.blake2b(r, digest_size=16).hexdigest() for r in records]
+
+    known = {}
+    try:
+        with open(state_path) as f:
+            state = json.load(f)
+        if state.get('context') == context:
+            known = state['records']
+    except (OSError, ValueError, KeyError):
+        pass
+
+    todo = [i for i, d in enumerate(digests) if d not in known]
+    lines, line_record = [], []
+    for k, i in enumerate(todo):
+        for line in io.StringIO(records[i].decode(), newline=None):
+            if line.startswith('#') or line.count('\t') < 8: continue   # rows GTFStore would skip
+            lines.append(line)
+            line_record.append(k)
+    store = GTFStore.parse_lines(lines, is_gff3(path))
+    row_record = np.array(line_record, dtype=np.int64)
+    fresh_ids = record_ids(store, row_record, len(todo))
+    fresh_results = analyze(store, row_record, len(todo)) if todo else []
+
+    entries = dict(known)
+    for k, i in enumerate(todo):
+        entries[digests[i]] = {'ids': fresh_ids[k], 'result': fresh_results[k]}
+    ordered = [entries[d] for d in digests]
+
+    # Per-record results are only additive if no gene/transcript crosses a record boundary
+    n_ids = sum(len(e['ids']) for e in ordered)
+    if len({i for e in ordered for i in e['ids']}) != n_ids:
+        return None
+
+    with atomic_write(state_path, 'w') as f:
+        json.dump({'context': context, 'records': {d: entries[d] for d in digests}}, f)
+
+    summary = {'records': len(digests), 'reanalysed': len(todo), 'removed': len(set(known) - set(digests))}
+    return [e['result'] for e in ordered], summary
+
+
+def first_row_record(codes, rows, row_record, n_codes):
+    """Record of the first of `rows` carrying each code (-1 for codes not seen)"""
+    out = np.full(n_codes, -1, dtype=np.int64)
+    if len(rows):
+        seen, first = np.unique(codes[rows], return_index=True)
+        out[seen] = row_record[rows[first]]
+    return out
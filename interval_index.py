@@ -0,0 +1,223 @@
+import numpy as np
+
+# =================================================
+# Per-chromosome interval index for TE / annotation / motif-hit overlap queries.
+# Intervals are kept as start-sorted NumPy arrays; overlap, containment and
+# nearest-neighbour queries are binary searches (np.searchsorted) run for a
+# whole batch of query windows at once. Intervals that start before a window
+# are found through a max-end tree over the same order, so a few very long
+# intervals do not widen the search for every query. Coordinates are 1-based, inclusive.
+# =================================================
+
+LEAF_BLOCK = 32   # rows under a max-end tree node small enough to check directly
+
+
+class IntervalIndex:
+    """Batched overlap/nearest queries over intervals grouped by chromosome.
+
+    Hits are returned as row numbers into the arrays the index was built from,
+    so they can be used directly with .iloc on the source DataFrame."""
+
+    def __init__(self, chroms, starts, ends):
+        chroms = np.asarray(chroms, dtype=object)
+        starts = np.asarray(starts, dtype=np.int64)
+        ends = np.asarray(ends, dtype=np.int64)
+        self._by_chrom = {}
+        for chrom, rows in _group_queries(chroms):
+            rows = rows[np.argsort(starts[rows], kind='stable')]
+            s, e = starts[rows], ends[rows]
+            prefix_max = np.maximum.accumulate(e)
+            # Row attaining the running max of ends (latest such row); used by nearest_batch()
+            attain = np.maximum.accumulate(np.where(e == prefix_max, np.arange(len(e)), 0))
+            depth, tree = _max_end_tree(e)
+            self._by_chrom[chrom] = {
+                'rows': rows, 'start': s, 'end': e,
+                'depth': depth, 'max_end_tree': tree,
+                'prefix_max_end': prefix_max, 'prefix_max_at': attain,
+            }
+        self.size = len(starts)
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def chromosomes(self):
+        return list(self._by_chrom)
+
+    # --- loaders -----------------------------------------------------------
+    @classmethod
+    def from_dataframe(cls, df, chrom='Chromosome', start='Start', end='End'):
+        return cls(df[chrom].to_numpy(), df[start].to_numpy(), df[end].to_numpy())
+
+    @classmethod
+    def from_bed(cls, path):
+        return cls(*read_intervals(path))
+
+    @classmethod
+    def from_gff(cls, path, feature=None):
+        """GFF3/GTF rows, optionally restricted to one feature type (column 3)"""
+        chroms, starts, ends = [], [], []
+        with open(path) as f:
+            for line in f:
+                if line.startswith('#'): continue
+                parts = line.rstrip('\n').split('\t')
+                if len(parts) < 9 or (feature and parts[2] != feature): continue
+                chroms.append(parts[0])
+                starts.append(int(parts[3]))
+                ends.append(int(parts[4]))
+        return cls(chroms, starts, ends)
+
+    # --- queries -------------------------------------------------------------
+    def overlap(self, chrom, start, end):
+        """Rows overlapping [start, end] on chrom, in start order"""
+        return self.overlap_batch([chrom], [start], [end])[1]
+
+    def overlap_batch(self, chroms, starts, ends):
+        """All (query, row) pairs where row overlaps the query window.
+
+        Rows starting inside the window are one contiguous run found by two binary
+        searches. Rows starting before it are those of the prefix whose end reaches
+        q_start, found by descending the max-end tree; only subtrees holding a hit are
+        entered. Cost per query is O(log n) plus O(1) per hit starting inside the window
+        and at most O(log n + LEAF_BLOCK) per hit starting before it, however long the
+        longest interval is."""
+        chroms, starts, ends = _as_query(chroms, starts, ends)
+        out_q, out_r = [], []
+        for chrom, q in _group_queries(chroms):
+            idx = self._by_chrom.get(chrom)
+            if idx is None: continue
+            qs, qe = starts[q], ends[q]
+            lo = np.searchsorted(idx['start'], qs, side='left')
+            hi = np.searchsorted(idx['start'], qe, side='right')
+            before_q, before = _reaching(idx, q, starts, lo)
+            inside_q, inside = _expand_ranges(q, lo, hi)
+            qi, pos = np.concatenate([before_q, inside_q]), np.concatenate([before, inside])
+            # Both parts are already in (query, position) order and, per query, every row
+            # starting before the window precedes those inside it
+            order = np.argsort(qi, kind='stable')
+            out_q.append(qi[order])
+            out_r.append(idx['rows'][pos[order]])
+        return _concat(out_q), _concat(out_r)
+
+    def within_batch(self, chroms, starts, ends, distance):
+        """(query, row) pairs for rows lying within `distance` bp of each query window"""
+        chroms, starts, ends = _as_query(chroms, starts, ends)
+        return self.overlap_batch(chroms, starts - distance, ends + distance)
+
+    def starting_in(self, chrom, lo, hi):
+        """Rows whose start lies in [lo, hi], in start order"""
+        idx = self._by_chrom.get(chrom)
+        if idx is None:
+            return np.empty(0, dtype=np.int64)
+        a = np.searchsorted(idx['start'], lo, side='left')
+        b = np.searchsorted(idx['start'], hi, side='right')
+        return idx['rows'][a:b]
+
+    def nearest_batch(self, chroms, starts, ends):
+        """Closest row to each query and the gap in bp between them (0 = overlapping).
+        Queries on chromosomes without intervals get row -1 and distance -1."""
+        chroms, starts, ends = _as_query(chroms, starts, ends)
+        best_row = np.full(len(starts), -1, dtype=np.int64)
+        best_dist = np.full(len(starts), -1, dtype=np.int64)
+        for chrom, q in _group_queries(chroms):
+            idx = self._by_chrom.get(chrom)
+            if idx is None: continue
+            qs, qe = starts[q], ends[q]
+            n = len(idx['start'])
+            hi = np.searchsorted(idx['start'], qe, side='right')   # rows [0, hi) start at or before q_end
+
+            # Left/overlapping candidate: the furthest-reaching row among those starting before q_end
+            left_pos = np.maximum(hi - 1, 0)
+            left_end = idx['prefix_max_end'][left_pos]
+            left_dist = np.where(hi > 0, np.maximum(qs - left_end - 1, 0), np.iinfo(np.int64).max)
+            left_row = idx['prefix_max_at'][left_pos]
+
+            # Right candidate: the first row starting after q_end
+            right_pos = np.minimum(hi, n - 1)
+            right_dist = np.where(hi < n, idx['start'][right_pos] - qe - 1, np.iinfo(np.int64).max)
+
+            use_right = right_dist < left_dist
+            best_row[q] = idx['rows'][np.where(use_right, right_pos, left_row)]
+            best_dist[q] = np.where(use_right, right_dist, left_dist)
+        return best_row, best_dist
+
+
+def read_intervals(path):
+    """(chroms, starts, ends) from a BED file (0-based, half-open) or the motif_scanner
+    TSV (1-based, with a header row), returned 1-based inclusive"""
+    chroms, starts, ends = [], [], []
+    one_based = False
+    with open(path) as f:
+        for line in f:
+            if line.startswith(('#', 'track', 'browser')) or not line.strip(): continue
+            parts = line.rstrip('\n').split('\t')
+            if parts[:3] == ['chrom', 'start', 'end']:
+                one_based = True
+                continue
+            chroms.append(parts[0])
+            starts.append(int(parts[1]) + (0 if one_based else 1))
+            ends.append(int(parts[2]))
+    return chroms, starts, ends
+
+
+def _as_query(chroms, starts, ends):
+    return (np.asarray(chroms, dtype=object), np.asarray(starts, dtype=np.int64),
+            np.asarray(ends, dtype=np.int64))
+
+
+def _group_queries(chroms):
+    """Yields (chrom, positions) for each distinct chromosome, positions in input order"""
+    if len(chroms) == 0:
+        return
+    names, inverse = np.unique(chroms.astype(str), return_inverse=True)
+    order = np.argsort(inverse, kind='stable')
+    bounds = np.searchsorted(inverse[order], np.arange(len(names) + 1))
+    for i, name in enumerate(names.tolist()):
+        yield name, order[bounds[i]:bounds[i + 1]]
+
+
+def _max_end_tree(ends):
+    """(depth, tree): implicit binary tree over the start-sorted rows, tree[i] the largest
+    end below node i (root 1, children 2i and 2i+1, leaves from 1 << depth)"""
+    depth = (len(ends) - 1).bit_length()
+    width = 1 << depth
+    tree = np.full(2 * width, np.iinfo(np.int64).min, dtype=np.int64)
+    tree[width:width + len(ends)] = ends
+    for d in range(depth - 1, -1, -1):
+        a = 1 << d
+        tree[a:2 * a] = np.maximum(tree[2 * a:4 * a:2], tree[2 * a + 1:4 * a:2])
+    return depth, tree
+
+
+def _reaching(idx, q, starts, lo):
+    """(query, position) pairs for rows at positions below lo[i] whose end is >= starts[q[i]].
+    The max-end tree is walked one level at a time for the whole batch, down to blocks of
+    LEAF_BLOCK rows, which are then checked directly."""
+    depth, tree = idx['depth'], idx['max_end_tree']
+    stop = max(depth - LEAF_BLOCK.bit_length() + 1, 0)
+    live = lo > 0
+    qi, bound = q[live], lo[live]
+    node = np.ones(len(qi), dtype=np.int64)
+    for d in range(stop + 1):
+        first = (node - (1 << d)) << (depth - d)   # first position under the node
+        keep = (tree[node] >= starts[qi]) & (first < bound)
+        qi, bound, node, first = qi[keep], bound[keep], node[keep], first[keep]
+        if d < stop:
+            qi, bound = np.repeat(qi, 2), np.repeat(bound, 2)
+            node = 2 * np.repeat(node, 2) + np.tile([0, 1], len(node))
+    qi, pos = _expand_ranges(qi, first, np.minimum(first + (1 << (depth - stop)), bound))
+    ok = idx['end'][pos] >= starts[qi]
+    return qi[ok], pos[ok]
+
+
+def _expand_ranges(q, lo, hi):
+    """For each query q[i], emit (q[i], j) for j in [lo[i], hi[i])"""
+    counts = np.maximum(hi - lo, 0)
+    total = int(counts.sum())
+    qi = np.repeat(q, counts)
+    offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    return qi, np.repeat(lo, counts) + offsets
+
+
+def _concat(parts):
+    return np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
@@ -0,0 +1,182 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from packed_genome import PackedGenome, open_genome
+
+# =================================================
+# Batched intron derivation and splice-site tallying over a GTFStore.
+# All introns are computed at once from exon arrays sorted by (transcript, start);
+# donor/acceptor dinucleotides are read with fancy indexing into the memory-mapped
+# genome and reverse-complemented through a 256-entry lookup table.
+# tally_by_chromosome() walks the genome one chromosome at a time (optionally in a
+# process pool) and merges the per-chromosome motif counts.
+# =================================================
+
+MINUS = 1   # gtf_store strand code for '-'
+
+# Same mapping as get_reverse_complement: upper-case, then complement ACGTN (other symbols kept)
+RC_TABLE = np.frombuffer(bytes(range(256)).upper(), dtype=np.uint8).copy()
+for _base, _comp in zip(b"ACGTN", b"TGCAN"):
+    RC_TABLE[_base] = _comp
+    RC_TABLE[ord(chr(_base).lower())] = _comp
+
+
+def derive_introns(store):
+    """Returns a dict of per-intron arrays (transcript, seqid, strand, start, end, length).
+
+    Transcripts are ordered by their first exon line and introns by position, as in the
+    original per-transcript loop; each transcript takes chrom/strand from its leftmost exon."""
+    rows = np.flatnonzero(store.feature_mask('exon') & (store.gene >= 0) & (store.transcript >= 0))
+    tx = store.transcript[rows]
+
+    # Rank transcripts by first appearance, then sort exons by (rank, start); lexsort is stable
+    codes, first_row = np.unique(tx, return_index=True)
+    rank = np.empty(len(store.transcript_ids), dtype=np.int64)
+    rank[codes[np.argsort(first_row, kind='stable')]] = np.arange(len(codes))
+    order = rows[np.lexsort((store.start[rows], rank[tx]))]
+
+    tr = store.transcript[order]
+    starts, ends = store.start[order], store.end[order]
+    group_first = np.flatnonzero(np.r_[True, tr[1:] != tr[:-1]])
+    lead = np.repeat(order[group_first], np.diff(np.r_[group_first, len(order)]))
+
+    intron_start = ends[:-1] + 1
+    intron_end = starts[1:] - 1
+    length = intron_end - intron_start + 1
+    keep = (tr[1:] == tr[:-1]) & (length >= 1)
+
+    return {
+        'n_transcripts': len(codes),
+        'transcript': tr[1:][keep],
+        'seqid': store.seqid[lead[1:]][keep],
+        'strand': store.strand[lead[1:]][keep],
+        'start': intron_start[keep],
+        'end': intron_end[keep],
+        'length': length[keep],
+    }
+
+
+def transcript_genes(store):
+    """Per transcript code: gene code of its last exon line (-1 if none)"""
+    rows = np.flatnonzero(store.feature_mask('exon') & (store.gene >= 0) & (store.transcript >= 0))
+    genes = np.full(len(store.transcript_ids), -1, dtype=np.int64)
+    genes[store.transcript[rows]] = store.gene[rows]   # later rows overwrite earlier ones
+    return genes
+
+
+def gene_names_by_gene(store):
+    """Per gene code: gene_name code from the last line carrying both attributes (-1 if none)"""
+    rows = np.flatnonzero((store.gene >= 0) & (store.gene_name >= 0))
+    names = np.full(len(store.gene_ids), -1, dtype=np.int64)
+    names[store.gene[rows]] = store.gene_name[rows]
+    return names
+
+
+def _site_partition(genome, store, introns):
+    """Per intron: index of its sequence in `genome` (-1 if absent); plus the introns that can be
+    read vectorially and those that need the scalar fallback (1 bp introns and introns running
+    off the end of the sequence)"""
+    name_to_idx = {name: i for i, name in enumerate(genome.names)}
+    lookup = np.array([name_to_idx.get(n, -1) for n in store.seqid_names], dtype=np.int64)
+    gidx = lookup[introns['seqid']] if len(lookup) else np.empty(0, dtype=np.int64)
+    chrom_len = np.array([genome.lengths[n] for n in genome.names], dtype=np.int64)
+
+    present = gidx >= 0
+    in_range = present & (introns['length'] >= 2) & (introns['end'] <= chrom_len[np.maximum(gidx, 0)])
+    return gidx, np.flatnonzero(in_range), np.flatnonzero(present & ~in_range)
+
+
+def read_sites(genome, gidx, start, end, strand):
+    """(n, 4) uint8 donor+acceptor bases of introns [start, end] (1-based), on the transcript strand"""
+    s0, e0 = start - 1, end - 1
+    bases = np.column_stack([genome.bases_at(gidx, s0), genome.bases_at(gidx, s0 + 1),
+                             genome.bases_at(gidx, e0 - 1), genome.bases_at(gidx, e0)])
+    minus = strand == MINUS
+    bases[minus] = RC_TABLE[bases[minus][:, ::-1]]
+    return bases
+
+
+def splice_motif_codes(genome, store, introns):
+    """Reads the 4 splice-site bases of every intron on a sequence present in `genome`.
+
+    Returns (fast, bases, fallback): intron indices read vectorially, their (n, 4) uint8
+    donor+acceptor bases on the transcript strand, and the intron indices that need the
+    scalar fallback (1 bp introns and introns running off the end of the sequence)."""
+    if not genome.names:
+        return np.empty(0, dtype=np.int64), np.empty((0, 4), dtype=np.uint8), np.empty(0, dtype=np.int64)
+    gidx, fast, fallback = _site_partition(genome, store, introns)
+    bases = read_sites(genome, gidx[fast], introns['start'][fast], introns['end'][fast], introns['strand'][fast])
+    return fast, bases, fallback
+
+
+# --- Chromosome-partitioned tally -----------------------------------------------
+
+_worker_genome = None
+
+
+def _init_site_worker(fasta_path, packed):
+    global _worker_genome
+    _worker_genome = open_genome(fasta_path, packed)
+
+
+def _chromosome_tally(job, genome=None):
+    """Motif tally of one chromosome's introns: [(motif, count, first intron index)].
+    The chromosome's pages are released afterwards."""
+    genome = genome or _worker_genome
+    g, idx, start, end, strand = job
+    bases = read_sites(genome, np.full(len(idx), g, dtype=np.int64), start, end, strand)
+    genome.release(genome.names[g])
+    return [(motif, count, int(idx[first])) for motif, count, first in tally_motifs(bases)]
+
+
+def tally_by_chromosome(genome, store, introns, workers=1):
+    """Splice motif tally computed one chromosome at a time, so at most one chromosome is
+    resident per process; with workers > 1 chromosomes are spread over a process pool,
+    each worker opening the genome itself.
+
+    Returns ({motif: [count, first intron index]}, fallback intron indices); the partial
+    tallies merge to exactly what tally_motifs gives over the whole genome."""
+    if not genome.names:
+        return {}, np.empty(0, dtype=np.int64)
+    gidx, fast, fallback = _site_partition(genome, store, introns)
+
+    order = fast[np.argsort(gidx[fast], kind='stable')]   # by chromosome, intron order kept within
+    bounds = np.flatnonzero(np.r_[True, gidx[order][1:] != gidx[order][:-1], True]) if len(order) else [0]
+    jobs = [(int(gidx[order[a]]), order[a:b], introns['start'][order[a:b]], introns['end'][order[a:b]],
+             introns['strand'][order[a:b]]) for a, b in zip(bounds[:-1], bounds[1:])]
+
+    if workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs)), initializer=_init_site_worker,
+                                 initargs=(genome.fasta_path, isinstance(genome, PackedGenome))) as pool:
+            partials = list(pool.map(_chromosome_tally, jobs))
+    else:
+        partials = [_chromosome_tally(job, genome) for job in jobs]
+
+    merged = {}
+    for partial in partials:
+        for motif, count, first in partial:
+            entry = merged.setdefault(motif, [0, first])
+            entry[0] += count
+            entry[1] = min(entry[1], first)
+    return merged, fallback
+
+
+def tally_motifs(bases):
+    """Counts distinct 4-base motifs with bincount.
+    Returns [(motif, count, first row)] in order of first occurrence."""
+    if len(bases) == 0:
+        return []
+    alphabet, idx = np.unique(bases, return_inverse=True)
+    idx = idx.reshape(bases.shape)
+    k = len(alphabet)
+    code = ((idx[:, 0] * k + idx[:, 1]) * k + idx[:, 2]) * k + idx[:, 3]
+    counts = np.bincount(code, minlength=k ** 4)
+    seen, first = np.unique(code, return_index=True)
+
+    tally = []
+    for i in np.argsort(first).tolist():
+        c = int(seen[i])
+        b = alphabet[[c // k ** 3, c // k ** 2 % k, c // k % k, c % k]].tobytes().decode('latin-1')
+        tally.append((f"{b[:2]}-{b[2:]}", int(counts[c]), int(first[i])))
+    return tally
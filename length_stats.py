@@ -0,0 +1,80 @@
+import numpy as np
+
+# =================================================
+# Online summary of integer lengths (introns, elements, contigs).
+# Values arrive in chunks: count, exact sum, min/max and a running mean/variance
+# (Chan et al. pairwise update) are kept, plus one counter per distinct length,
+# which gives the exact median and histogram without holding the values.
+# Memory is bounded by the longest length, not by how many values were seen.
+# =================================================
+
+
+class LengthStats:
+    """Streaming count / mean / variance / median / histogram of non-negative integers"""
+
+    def __init__(self):
+        self.n = 0
+        self.total = 0        # exact integer sum, so mean matches statistics.mean
+        self.min = self.max = None
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._counts = np.zeros(0, dtype=np.int64)
+
+    @classmethod
+    def of(cls, values):
+        stats = cls()
+        stats.update(values)
+        return stats
+
+    def update(self, chunk):
+        chunk = np.asarray(chunk, dtype=np.int64)
+        if not len(chunk):
+            return
+        n = len(chunk)
+        mean = chunk.mean()
+        m2 = float(((chunk - mean) ** 2).sum())
+        delta = mean - self._mean
+        total_n = self.n + n
+        self._mean += delta * n / total_n
+        self._m2 += m2 + delta * delta * self.n * n / total_n
+        self.n = total_n
+        self.total += int(chunk.sum())
+
+        lo, hi = int(chunk.min()), int(chunk.max())
+        self.min = lo if self.min is None else min(self.min, lo)
+        self.max = hi if self.max is None else max(self.max, hi)
+        if hi >= len(self._counts):
+            self._counts = np.concatenate([self._counts, np.zeros(hi + 1 - len(self._counts), dtype=np.int64)])
+        self._counts[:hi + 1] += np.bincount(chunk, minlength=hi + 1)
+
+    @property
+    def mean(self):
+        return self.total / self.n
+
+    @property
+    def variance(self):
+        """Sample variance (n - 1), as statistics.variance"""
+        return self._m2 / (self.n - 1) if self.n > 1 else 0.0
+
+    @property
+    def stdev(self):
+        return self.variance ** 0.5
+
+    def _kth(self, k):
+        """k-th smallest value (0-based)"""
+        return int(np.searchsorted(np.cumsum(self._counts), k, side='right'))
+
+    @property
+    def median(self):
+        """Middle value, or the mean of the two middle values for an even count (as statistics.median)"""
+        mid = self.n // 2
+        if self.n % 2:
+            return self._kth(mid)
+        return (self._kth(mid - 1) + self._kth(mid)) / 2
+
+    def histogram(self, bins):
+        """Same counts and edges as np.histogram(values, bins) over everything seen"""
+        values = np.arange(self.min, self.max + 1)
+        counts, edges = np.histogram(values, bins=bins, range=(self.min, self.max),
+                                     weights=self._counts[self.min:self.max + 1])
+        return counts.astype(np.int64), edges
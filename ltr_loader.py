@@ -0,0 +1,89 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from sidecar import atomic_write
+
+# =================================================
+# Shared loader for the LTRharvest tabular output (ltrs.gff3) used by
+# retrotransposon_analysis.py and retrotransposon_stats.py.
+# Columns: s(ret) e(ret) l(ret) s(lLTR) e(lLTR) l(lLTR) s(rLTR) e(rLTR) l(rLTR) sim(LTRs) seq-nr
+# =================================================
+
+LTR_FILE = "ltrs.gff3"
+CHROM_MAP = {0: 'ChrI', 1: 'ChrII', 2: 'ChrIII', 3: 'ChrIV', 4: 'ChrV', 5: 'ChrVI'}
+
+# tabout column -> (name, dtype)
+LTR_COLUMNS = {
+    0: ('Start', np.int32),
+    1: ('End', np.int32),
+    2: ('Length', np.int32),
+    5: ('L_LTR_Len', np.int32),   # Length of Left LTR
+    8: ('R_LTR_Len', np.int32),   # Length of Right LTR
+    9: ('Similarity', np.float32),
+    10: ('Seq_Nr', np.int32),
+}
+
+
+# Fields read per row; only columns 0-10 are used and any trailing fields (e.g. the
+# TSD/motif columns of LTRharvest's long output) are ignored
+TABLE_WIDTH = 64
+
+
+def _split_rows(path):
+    """Line-by-line fallback for rows wider than TABLE_WIDTH: first 11 fields of every row"""
+    with open(path) as f:
+        rows = [line.split('#', 1)[0].split()[:11] for line in f]
+    raw = pd.DataFrame([r + [None] * (11 - len(r)) for r in rows if r], columns=range(11))
+    return raw[list(LTR_COLUMNS)]
+
+
+def _read_table(path):
+    try:
+        raw = pd.read_csv(path, sep=r'\s+', comment='#', header=None, names=range(TABLE_WIDTH),
+                          usecols=list(LTR_COLUMNS), dtype=str, engine='c')
+    except pd.errors.EmptyDataError:
+        raw = pd.DataFrame(columns=list(LTR_COLUMNS))
+    except pd.errors.ParserError:
+        raw = _split_rows(path)
+    numeric = raw.apply(pd.to_numeric, errors='coerce')
+
+    # Drop short/malformed rows in bulk: every field present, integer fields integral
+    int_cols = [c for c, (_, dtype) in LTR_COLUMNS.items() if dtype is np.int32]
+    valid = numeric.notna().all(axis=1) & (numeric[int_cols] % 1 == 0).all(axis=1)
+    numeric = numeric[valid]
+
+    df = pd.DataFrame({name: numeric[c].to_numpy().astype(dtype) for c, (name, dtype) in LTR_COLUMNS.items()})
+
+    # Chromosome from seq-nr (unmapped sequences follow the ChrN numbering), then Chr:Start-End keys
+    seq_nr = df['Seq_Nr']
+    fallback = "Chr" + (seq_nr + 1).astype(str)
+    df['Chromosome'] = seq_nr.map(CHROM_MAP).fillna(fallback)
+    df['Key'] = df['Chromosome'] + ":" + df['Start'].astype(str) + "-" + df['End'].astype(str)
+    return df
+
+
+def load_ltrs(path=LTR_FILE, use_cache=True):
+    """Reads ltrs.gff3 into a typed DataFrame (int32 coordinates, float32 similarity).
+
+    With pyarrow installed the result is cached as <path>.feather and reused while it is
+    newer than the source. Raises FileNotFoundError when `path` does not exist."""
+    cache_path = path + ".feather"
+    if use_cache and os.path.exists(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(path):
+        try:
+            return pd.read_feather(cache_path)
+        except (ImportError, OSError, ValueError):
+            pass
+
+    if not os.path.exists(path):
+        raise FileNotFoundError(path)
+    df = _read_table(path)
+
+    if use_cache:
+        try:
+            with atomic_write(cache_path) as f:
+                df.to_feather(f)
+        except (ImportError, OSError):
+            pass   # pyarrow missing or read-only location: run uncached
+    return df
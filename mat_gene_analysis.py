@@ -1,63 +1,80 @@
+import argparse
+
 import pandas as pd
 
-def analyze_blast_results(filename):
-    columns = ["qseqid", "sseqid", "pident", "length", "mismatch", "gapopen", "qstart", "qend", "sstart", "send", "evalue", "bitscore"]
+from blast_hits import CHUNK_ROWS, MAT_CATEGORIES, parse_categories, stream_hits
+from profiling import stage
+
+SYNTENY_FILE = "mat_synteny.tsv"
 
+def analyze_blast_results(filename, categories=MAT_CATEGORIES, anchor='SLA2', targets=('MAT',),
+                          max_distance=None, synteny_file=SYNTENY_FILE, chunksize=CHUNK_ROWS,
+                          max_evalue=None, min_bitscore=None, max_targets=None):
     try:
-        df = pd.read_csv(filename, sep='\t', names=columns)
+        # Streamed in typed chunks: only per-scaffold anchor hits and target hits stay in memory
+        with stage("stream_hits") as s:
+            store = stream_hits(filename, categories, anchor, targets, chunksize, max_evalue, min_bitscore, max_targets)
+            s.count = len(store)
         
-        unique_queries = df['qseqid'].unique()
+        unique_queries = pd.Series(store.queries).unique()
         print(f"Queries found: {unique_queries}\n")
         
         # Separate Hits
-        sla2_hits = df[df['qseqid'].str.contains("Sla2", case=False)]
-        mat_hits = df[df['qseqid'].str.contains("mat|HMG|alpha", case=False)]
-        
-        if sla2_hits.empty:
-            print("No SLA2 hits found")
+        if store.category(anchor).empty:
+            print(f"No {anchor} hits found")
             return
         
-        if mat_hits.empty:
-            print("No MAT/HMG/Alpha hits found")
+        if all(store.category(t).empty for t in targets):
+            print("No MAT/HMG/Alpha hits found" if tuple(targets) == ('MAT',) else f"No {'/'.join(targets)} hits found")
             return
 
-        # Synteny search
-        sla2_scaffolds = sla2_hits['sseqid'].unique()
-        
-        synteny_found = False
+        # Synteny search: target hits on every scaffold that carries an anchor hit
+        with stage("synteny_table") as s:
+            table = store.synteny_table(anchor, targets, max_distance)
+            s.count = len(table)
         
-        for scaffold in sla2_scaffolds:
-            # MAT hits
-            mats_on_scaffold = mat_hits[mat_hits['sseqid'] == scaffold]
+        for scaffold, group in table.groupby('sseqid', sort=False):
+            print(f"\n Match found on scaffold: {scaffold}")
             
-            if not mats_on_scaffold.empty:
-                synteny_found = True
-                print(f"\n Match found on scaffold: {scaffold}")
-                
-                # Best SLA2 hit
-                best_sla2 = sla2_hits[sla2_hits['sseqid'] == scaffold].sort_values('bitscore', ascending=False).iloc[0]
-                sla2_start = best_sla2['sstart']
-                sla2_end = best_sla2['send']
-                print(f"SLA2 Location: {sla2_start} - {sla2_end} (Bitscore: {best_sla2['bitscore']})")
-                
-                # List all MAT hits & distance
-                for idx, row in mats_on_scaffold.iterrows():
-                    mat_start = row['sstart']
-                    mat_end = row['send']
-                    
-                    distance = max(0, min(mat_start, mat_end) - max(sla2_start, sla2_end), min(sla2_start, sla2_end) - max(mat_start, mat_end))
-                    
-                    print(f"MAT Hit ({row['qseqid']}): {mat_start} - {mat_end}")
-                    print(f"-> Distance to SLA2: {distance} bp")
-                    print(f"-> E-value: {row['evalue']}")
-                    print(f"-> Identity: {row['pident']}%")
-
-        if not synteny_found:
-            print("\n No scaffolds found containing both SLA2 and MAT hits.")
-
-    except Exception as e:
+            best = group.iloc[0]
+            print(f"{anchor} Location: {best['anchor_sstart']} - {best['anchor_send']} (Bitscore: {best['anchor_bitscore']})")
+            
+            # List all target (MAT) hits & distance
+            for row in group.itertuples(index=False):
+                print(f"{row.target_category} Hit ({row.qseqid}): {row.sstart} - {row.send}")
+                print(f"-> Distance to {anchor}: {row.distance} bp")
+                print(f"-> E-value: {row.evalue}")
+                print(f"-> Identity: {row.pident}%")
+
+        if table.empty:
+            print(f"\n No scaffolds found containing both {anchor} and {'/'.join(targets)} hits.")
+        elif synteny_file:
+            table.to_csv(synteny_file, sep='\t', index=False)
+            print(f"\n Saved synteny table to {synteny_file}")
+
+    except FileNotFoundError:
+        print(f"Error processing file: {filename} not found")
+    except (pd.errors.ParserError, pd.errors.EmptyDataError, ValueError, KeyError) as e:
         print(f"Error processing file: {e}")
 
 if __name__ == "__main__":
-    filename = 'mat_search.txt' #output from tblastn 
-    analyze_blast_results(filename)
+    parser = argparse.ArgumentParser(description="MAT locus synteny from tBLASTn outfmt 6 hits.")
+    parser.add_argument("blast", nargs='?', default='mat_search.txt', help="tBLASTn outfmt 6 output")
+    parser.add_argument("--category", action='append', default=[], metavar="NAME=REGEX",
+                        help="Query category (regex on qseqid); default SLA2=Sla2, MAT=mat|HMG|alpha")
+    parser.add_argument("--anchor", default='SLA2')
+    parser.add_argument("--target", action='append', default=None)
+    parser.add_argument("--max-distance", type=int, default=None, help="Only report targets within D bp of the anchor")
+    parser.add_argument("-o", "--synteny-table", default=SYNTENY_FILE)
+    parser.add_argument("--chunksize", type=int, default=CHUNK_ROWS, help="Rows per streamed chunk")
+    parser.add_argument("--max-evalue", type=float, default=None, help="Drop hits above this e-value while reading")
+    parser.add_argument("--min-bitscore", type=float, default=None, help="Drop hits below this bitscore while reading")
+    parser.add_argument("--max-targets", type=int, default=None,
+                        help="Keep only the N best-scoring target hits per scaffold, bounding memory "
+                             "(default: all, memory grows with the target hits; drops are reported)")
+    args = parser.parse_args()
+
+    categories = parse_categories(args.category) if args.category else MAT_CATEGORIES
+    analyze_blast_results(args.blast, categories, args.anchor, args.target or ['MAT'],
+                          args.max_distance, args.synteny_table, args.chunksize,
+                          args.max_evalue, args.min_bitscore, args.max_targets)
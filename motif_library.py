@@ -0,0 +1,278 @@
+import argparse
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from genome_index import GenomeIndex
+from motif_scanner import BASE_COMPLEMENT, CHUNK_SIZE, iter_chunks
+from packed_genome import ENCODE, load_packed_genome, open_genome
+
+# =================================================
+# Many IUPAC motifs, both strands, one pass over the genome.
+# A motif library is a TSV of `name  definition`, where a definition is IUPAC
+# elements separated by bounded spacers:
+#
+#   CDE_classic   RTCACRTG  N{70,120}  TGTWKGKT
+#   telomere      TGTGGGTGTGGTG
+#
+# Each motif (and its reverse complement) is anchored on its leading element,
+# whose IUPAC expansions become 2-bit k-mer codes. Per chunk, one rolling 2-bit
+# code screened through a direct lookup table of anchor prefixes (<= 10 bp), then
+# a sorted lookup of the full k-mers, finds the anchor hits of every motif at
+# once; only those positions are verified with the motif's regex, so the spacers
+# are checked in a bounded window. Matching is
+# case-insensitive, and every verified start is reported (overlapping hits too).
+# =================================================
+
+IUPAC = {'A': 'A', 'C': 'C', 'G': 'G', 'T': 'T', 'R': 'AG', 'Y': 'CT', 'S': 'CG', 'W': 'AT',
+         'K': 'GT', 'M': 'AC', 'B': 'CGT', 'D': 'AGT', 'H': 'ACT', 'V': 'ACG', 'N': 'ACGT'}
+ELEMENT_RE = re.compile(r'^[ACGTRYSWKMBDHVN]+$')
+SPACER_RE = re.compile(r'^N\{(\d+)(?:,(\d+))?\}$')
+MAX_ANCHOR_KMERS = 4096   # IUPAC expansions kept per anchor; longer/vaguer anchors are cut to a prefix
+MAX_ANCHOR_LEN = 31       # k-mers are packed 2 bits per base into uint64
+DIRECT_K = 10             # anchor prefixes of up to 10 bp are screened through a 4**k lookup table (1 MB)
+DEFAULT_LIBRARY = [("CDE", "RTCACRTG N{70,120} TGTWKGKT")]   # motif_scanner.CENTROMERE_PATTERN
+
+
+def parse_definition(definition):
+    """[('element', 'RTCACRTG'), ('spacer', (70, 120)), ...]; starts and ends with an element"""
+    tokens = []
+    for token in definition.upper().split():
+        spacer = SPACER_RE.match(token)
+        if spacer:
+            lo = int(spacer.group(1))
+            hi = int(spacer.group(2)) if spacer.group(2) is not None else lo
+            if hi < lo:
+                raise ValueError(f"Spacer {token} has max < min in {definition!r}")
+            tokens.append(('spacer', (lo, hi)))
+        elif ELEMENT_RE.match(token):
+            tokens.append(('element', token))
+        else:
+            raise ValueError(f"Not an IUPAC element or N{{min,max}} spacer: {token!r} in {definition!r}")
+    if not tokens or tokens[0][0] != 'element' or tokens[-1][0] != 'element':
+        raise ValueError(f"Motif must start and end with an element: {definition!r}")
+    return tokens
+
+
+def reverse_complement_tokens(tokens):
+    return [(kind, ''.join(BASE_COMPLEMENT[b] for b in reversed(value)) if kind == 'element' else value)
+            for kind, value in reversed(tokens)]
+
+
+def tokens_regex(tokens):
+    parts = []
+    for kind, value in tokens:
+        if kind == 'element':
+            parts.append(''.join(b if len(IUPAC[b]) == 1 else f"[{IUPAC[b]}]" for b in value))
+        else:
+            parts.append(f"[ACGTN]{{{value[0]},{value[1]}}}")
+    return ''.join(parts)
+
+
+def max_length(tokens):
+    return sum(len(v) if kind == 'element' else v[1] for kind, v in tokens)
+
+
+def anchor_kmers(element):
+    """(k, codes): the longest prefix of `element` within the anchor limits, and the
+    2-bit codes of all its IUPAC expansions"""
+    codes, k = np.zeros(1, dtype=np.uint64), 0
+    for base in element[:MAX_ANCHOR_LEN]:
+        options = np.array(['ACGT'.index(b) for b in IUPAC[base]], dtype=np.uint64)
+        if len(codes) > 1 and len(codes) * len(options) > MAX_ANCHOR_KMERS:
+            break
+        codes = ((codes[:, None] << np.uint64(2)) | options[None, :]).ravel()
+        k += 1
+    return k, codes
+
+
+def read_library(path):
+    """[(name, definition)] from a TSV of `name<TAB>definition`; '#' comments and blank lines are skipped.
+    Raises ValueError naming the file and line of a malformed entry."""
+    motifs = []
+    with open(path) as f:
+        for lineno, line in enumerate(f, 1):
+            if not line.strip() or line.startswith('#'):
+                continue
+            fields = line.strip().split(None, 1)
+            if len(fields) < 2:
+                raise ValueError(f"{path}:{lineno}: expected name<TAB>definition")
+            name, definition = fields[0], fields[1].strip()
+            try:
+                parse_definition(definition)
+            except ValueError as e:
+                raise ValueError(f"{path}:{lineno}: {e}")
+            motifs.append((name, definition))
+    return motifs
+
+
+class MotifLibrary:
+    """Compiled motifs: per (motif, strand) a verification regex, and per anchor length
+    the sorted anchor k-mer codes with the (motif, strand) each belongs to"""
+
+    def __init__(self, motifs):
+        self.names = [name for name, _ in motifs]
+        if len(set(self.names)) != len(self.names):
+            raise ValueError("Motif names must be unique")
+        self.probes = []          # (motif index, strand, compiled regex)
+        by_k = {}
+        self.overlap = 0
+        for m, (name, definition) in enumerate(motifs):
+            tokens = parse_definition(definition)
+            self.overlap = max(self.overlap, max_length(tokens))
+            strands = [('+', tokens)]
+            reverse = reverse_complement_tokens(tokens)
+            if reverse != tokens:   # palindromes are reported once, on '+'
+                strands.append(('-', reverse))
+            for strand, toks in strands:
+                k, codes = anchor_kmers(toks[0][1])
+                probe = len(self.probes)
+                self.probes.append((m, strand, re.compile(tokens_regex(toks))))
+                by_k.setdefault(k, []).append((codes, np.full(len(codes), probe, dtype=np.int64)))
+        self.anchors = {}         # k -> (prefix length, prefix table, sorted k-mer codes, owning probes)
+        for k, parts in sorted(by_k.items()):
+            codes = np.concatenate([c for c, _ in parts])
+            owners = np.concatenate([o for _, o in parts])
+            order = np.lexsort((owners, codes))
+            p = min(k, DIRECT_K)
+            table = np.zeros(4 ** p, dtype=bool)
+            table[(codes >> np.uint64(2 * (k - p))).astype(np.int64)] = True
+            self.anchors[k] = (p, table, codes[order], owners[order])
+
+    def scan(self, seq, limit=None):
+        """(probe, start, end) of every verified hit in `seq` (0-based, half-open) starting before `limit`"""
+        text = seq.upper()
+        n = len(text) if limit is None else min(len(text), limit)
+        if n <= 0 or not self.anchors:
+            return []
+        codes = ENCODE[np.frombuffer(text.encode('ascii'), dtype=np.uint8)]
+        pad = max(self.anchors)   # windows running off the end count as invalid
+        is_invalid = np.r_[codes == 255, np.ones(pad, dtype=bool)]
+        invalid = np.r_[0, np.cumsum(is_invalid)]
+        values = np.r_[np.where(codes == 255, 0, codes), np.zeros(pad, dtype=np.uint8)]
+
+        positions, probes = [], []
+        rolling, built = np.zeros(n, dtype=np.uint32), 0   # code of the first `built` bases at each position
+        for k, (p, table, kmers, owners) in self.anchors.items():
+            while built < p:
+                rolling = (rolling << np.uint32(2)) | values[built:built + n]
+                built += 1
+            cand = np.flatnonzero(table[rolling])
+            cand = cand[invalid[cand + k] == invalid[cand]]   # no N inside the k-mer
+            full = rolling[cand].astype(np.uint64)
+            for j in range(p, k):
+                full = (full << np.uint64(2)) | values[cand + j]
+            lo = np.searchsorted(kmers, full, 'left')
+            hi = np.searchsorted(kmers, full, 'right')
+            hit = cand[hi > lo]
+            lo, hi = lo[hi > lo], hi[hi > lo]
+            # one candidate per (position, owning probe); a k-mer may anchor several probes
+            repeats = hi - lo
+            first = np.repeat(lo - np.r_[0, np.cumsum(repeats)[:-1]], repeats)
+            positions.append(np.repeat(hit, repeats))
+            probes.append(owners[first + np.arange(int(repeats.sum()))])
+        if not positions:
+            return []
+
+        positions, probes = np.concatenate(positions), np.concatenate(probes)
+        order = np.lexsort((probes, positions))
+        hits = []
+        for pos, probe in zip(positions[order].tolist(), probes[order].tolist()):
+            match = self.probes[probe][2].match(text, pos)
+            if match:
+                hits.append((probe, pos, match.end()))
+        return hits
+
+
+# --- Chunk worker ------------------------------------------------------------
+_worker_genome = None
+_worker_library = None
+
+
+def _init_worker(fasta_path, motifs, packed=False):
+    global _worker_genome, _worker_library
+    _worker_genome = open_genome(fasta_path, packed)
+    _worker_library = MotifLibrary(motifs)
+
+
+def _scan_chunk(chunk):
+    """Hits starting inside [start, end); the overlap tail lets a motif cross the boundary"""
+    chrom, start, end = chunk
+    seq = _worker_genome.fetch(chrom, start + 1, end + _worker_library.overlap)
+    hits = []
+    for probe, s, e in _worker_library.scan(seq, end - start):
+        m, strand, _ = _worker_library.probes[probe]
+        hits.append((_worker_library.names[m], chrom, start + s + 1, start + e, strand))
+    return hits
+
+
+def scan_library(fasta_path, motifs=DEFAULT_LIBRARY, chunk_size=CHUNK_SIZE, workers=None,
+                 include_mito=False, packed=False):
+    """Yields (motif, chrom, start, end, strand) hits, 1-based inclusive, in genome order.
+    `motifs` is a list of (name, definition); all of them are found in the same pass."""
+    MotifLibrary(motifs)   # validate before starting workers
+    with GenomeIndex(fasta_path) as genome:
+        chunks = list(iter_chunks(genome, chunk_size, include_mito))
+    if packed:
+        load_packed_genome(fasta_path)
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(chunks) == 1:
+        _init_worker(fasta_path, motifs, packed)
+        for chunk in chunks:
+            yield from _scan_chunk(chunk)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(fasta_path, motifs, packed)) as pool:
+        for hits in pool.map(_scan_chunk, chunks):
+            yield from hits
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scan a FASTA for a library of IUPAC motifs on both strands in one pass.")
+    parser.add_argument("fasta", help="Assembly to scan")
+    parser.add_argument("--motifs", default=None,
+                        help="TSV of name<TAB>definition, e.g. 'CDE  RTCACRTG N{70,120} TGTWKGKT' (default: that one motif)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--format", choices=['tsv', 'bed'], default='tsv')
+    parser.add_argument("--include-mito", action='store_true')
+    parser.add_argument("--packed", action='store_true', help="Scan from the 2-bit packed genome (<fasta>.2bit.npz)")
+    parser.add_argument("-o", "--output", default=None, help="Output file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    try:
+        motifs = read_library(args.motifs) if args.motifs else DEFAULT_LIBRARY
+        MotifLibrary(motifs)
+    except OSError as e:
+        parser.error(f"cannot read --motifs: {e}")
+    except ValueError as e:
+        parser.error(str(e))
+    with GenomeIndex(args.fasta) as genome:
+        offsets = dict(genome.offsets)
+
+    out = open(args.output, 'w') if args.output else sys.stdout
+    counts = dict.fromkeys([name for name, _ in motifs], 0)
+    try:
+        if args.format == 'tsv':
+            out.write("motif\tchrom\tstart\tend\tstrand\tglobal_start\tglobal_end\n")
+        for name, chrom, start, end, strand in scan_library(args.fasta, motifs, args.chunk_size, args.workers,
+                                                            args.include_mito, args.packed):
+            if args.format == 'bed':
+                out.write(f"{chrom}\t{start - 1}\t{end}\t{name}\t0\t{strand}\n")
+            else:
+                out.write(f"{name}\t{chrom}\t{start}\t{end}\t{strand}\t{offsets[chrom] + start}\t{offsets[chrom] + end}\n")
+            counts[name] += 1
+    finally:
+        if args.output:
+            out.close()
+    for name, n in counts.items():
+        print(f"{name}: {n} hits", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+import argparse
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from genome_index import GenomeIndex
+from packed_genome import load_packed_genome, open_genome
+
+# =================================================
+CENTROMERE_PATTERN = r"([AG]TCAC[AG]TG)([ATCGN]{70,120})(TGT[AT][TG]G[TG]T)"
+MOTIF_OVERLAP = 136          # 8 bp CDEI + 120 bp max spacer + 8 bp CDEIII
+CHUNK_SIZE = 1_000_000
+# =================================================
+
+BASE_COMPLEMENT = {'A': 'T', 'C': 'G', 'G': 'C', 'T': 'A', 'N': 'N',
+                   'R': 'Y', 'Y': 'R', 'S': 'S', 'W': 'W', 'K': 'M', 'M': 'K',
+                   'B': 'V', 'V': 'B', 'D': 'H', 'H': 'D', '.': '.'}
+
+
+def is_mitochondrial(chrom):
+    return "Mito" in chrom or "ChrM" in chrom or "mt" in chrom.lower()
+
+
+def iter_chunks(genome, chunk_size=CHUNK_SIZE, include_mito=False):
+    for chrom in genome.names:
+        if not include_mito and is_mitochondrial(chrom):
+            continue
+        length = genome.lengths[chrom]
+        for start in range(0, length, chunk_size):
+            yield chrom, start, min(start + chunk_size, length)
+
+
+def _view(genome, chrom, strand, start, end):
+    """[start, end) of the scanned strand (0-based): forward coordinates for '+', coordinates
+    along the reverse complement of the whole chromosome for '-'"""
+    if strand == '+':
+        return genome.fetch(chrom, start + 1, end)
+    length = genome.lengths[chrom]
+    return genome.fetch(chrom, length - min(end, length) + 1, length - start, '-')
+
+
+def _to_forward(genome, chrom, strand, start, end):
+    """1-based inclusive forward coordinates of a [start, end) hit on the scanned strand"""
+    if strand == '+':
+        return start + 1, end
+    length = genome.lengths[chrom]
+    return length - end + 1, length - start
+
+
+# --- Chunk worker -----------------------------------------------------------
+# Each process opens its own memory map once; chunks only ship coordinates.
+_worker_genome = None
+_worker_regex = None
+_worker_overlap = MOTIF_OVERLAP
+
+
+def _init_worker(fasta_path, pattern, overlap, packed=False):
+    global _worker_genome, _worker_regex, _worker_overlap
+    _worker_genome = open_genome(fasta_path, packed)
+    _worker_regex = re.compile(pattern)
+    _worker_overlap = overlap
+
+
+def _scan_chunk(chunk):
+    """Scans [start, end) of one strand plus the overlap tail; keeps only hits that *start* inside
+    the chunk, so a motif spanning a boundary is found by the chunk that owns its start.
+    Hits are (start, end) on the scanned strand, 0-based half-open."""
+    chrom, strand, start, end = chunk
+    seq = _view(_worker_genome, chrom, strand, start, end + _worker_overlap)
+    hits = []
+    for match in _worker_regex.finditer(seq):
+        if match.start() >= end - start:
+            break
+        hits.append((start + match.start(), start + match.end()))
+    return hits
+
+
+def _resume(regex, genome, chunk, hits, resume, overlap):
+    """Hits of `chunk` as one finditer over the whole strand would report them, given that the
+    previous chunk's last match ends at `resume`. The chunk's own scan restarted at its start, so
+    matches it found before `resume` are dropped and the scan is redone from `resume` until it
+    meets a start the chunk also found; from there on both scans agree."""
+    chrom, strand, start, end = chunk
+    if not hits or hits[0][0] >= resume:
+        return hits
+    starts = {s: i for i, (s, _) in enumerate(hits)}
+    seq = _view(genome, chrom, strand, resume, end + overlap)
+    fixed, pos = [], 0
+    while True:
+        match = regex.search(seq, pos)
+        if match is None or resume + match.start() >= end:
+            return fixed
+        hit_start = resume + match.start()
+        if hit_start in starts:
+            return fixed + hits[starts[hit_start]:]
+        fixed.append((hit_start, resume + match.end()))
+        pos = max(match.end(), match.start() + 1)
+
+
+def _chromosome_jobs(genome, chunk_size, include_mito):
+    """Chunks per chromosome: all '+' chunks in order, then all '-' chunks in order along the
+    reverse complement"""
+    jobs = []
+    for chrom, start, end in iter_chunks(genome, chunk_size, include_mito):
+        if not jobs or jobs[-1][0] != chrom:
+            jobs.append((chrom, []))
+        jobs[-1][1].append((start, end))
+    return [(chrom, [(chrom, strand, s, e) for strand in '+-' for s, e in spans]) for chrom, spans in jobs]
+
+
+def scan_genome(fasta_path, pattern=CENTROMERE_PATTERN, chunk_size=CHUNK_SIZE,
+                overlap=MOTIF_OVERLAP, workers=None, include_mito=False, packed=False):
+    """Yields (chrom, start, end, strand) hits, 1-based inclusive, in genome order.
+
+    Each strand gets the result of one non-overlapping finditer over the whole chromosome
+    (the reverse strand over its reverse complement), as the original per-chromosome scan;
+    a '+' and a '-' hit may overlap. With packed=True each process holds the 2-bit genome
+    and decodes one chunk at a time."""
+    regex = re.compile(pattern)
+    with GenomeIndex(fasta_path) as genome:
+        jobs = _chromosome_jobs(genome, chunk_size, include_mito)
+    if packed:
+        load_packed_genome(fasta_path)   # build <fasta>.2bit.npz once, before the workers load it
+    genome = open_genome(fasta_path, packed)
+
+    def stitch(chrom, chunks, results):
+        hits, resume = [], {'+': 0, '-': 0}
+        for chunk, chunk_hits in zip(chunks, results):
+            strand = chunk[1]
+            chunk_hits = _resume(regex, genome, chunk, chunk_hits, resume[strand], overlap)
+            if chunk_hits:
+                resume[strand] = chunk_hits[-1][1]
+            hits += [(chrom, *_to_forward(genome, chrom, strand, s, e), strand) for s, e in chunk_hits]
+        return sorted(hits, key=lambda h: (h[1], h[2], h[3]))
+
+    n_chunks = sum(len(chunks) for _, chunks in jobs)
+    workers = workers or os.cpu_count() or 1
+    try:
+        if workers == 1 or n_chunks == 1:
+            _init_worker(fasta_path, pattern, overlap, packed)
+            for chrom, chunks in jobs:
+                yield from stitch(chrom, chunks, [_scan_chunk(c) for c in chunks])
+            return
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(fasta_path, pattern, overlap, packed)) as pool:
+            pending = [(chrom, chunks, pool.map(_scan_chunk, chunks)) for chrom, chunks in jobs]
+            for chrom, chunks, results in pending:
+                yield from stitch(chrom, chunks, list(results))
+    finally:
+        genome.close()
+
+
+def reference_scan(fasta_path, pattern=CENTROMERE_PATTERN, include_mito=False):
+    """The original find_centromeres scan: finditer over each whole chromosome and over its
+    reverse complement. Slow and memory-hungry; used by --check to validate scan_genome."""
+    regex = re.compile(pattern)
+    hits = []
+    with GenomeIndex(fasta_path) as genome:
+        for chrom in genome.names:
+            if not include_mito and is_mitochondrial(chrom):
+                continue
+            length = genome.lengths[chrom]
+            for strand in '+-':
+                seq = genome.fetch(chrom, 1, length, strand)
+                hits += [(chrom, *_to_forward(genome, chrom, strand, m.start(), m.end()), strand)
+                         for m in regex.finditer(seq)]
+    return hits
+
+
+def write_hits(hits, out, fmt='tsv', offsets=None, name='motif', header=True):
+    """Streams hits to an open handle as TSV (with global coordinates when offsets are given) or BED6"""
+    if fmt == 'tsv' and header:
+        out.write("chrom\tstart\tend\tstrand" + ("\tglobal_start\tglobal_end" if offsets else "") + "\n")
+    count = 0
+    for chrom, start, end, strand in hits:
+        if fmt == 'bed':
+            out.write(f"{chrom}\t{start - 1}\t{end}\t{name}\t0\t{strand}\n")
+        elif offsets:
+            out.write(f"{chrom}\t{start}\t{end}\t{strand}\t{offsets[chrom] + start}\t{offsets[chrom] + end}\n")
+        else:
+            out.write(f"{chrom}\t{start}\t{end}\t{strand}\n")
+        count += 1
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Chunked, two-strand, multi-core motif scan of a FASTA assembly.")
+    parser.add_argument("fasta", nargs='+', help="One or more assemblies to scan")
+    parser.add_argument("--pattern", default=CENTROMERE_PATTERN, help="Nucleotide regex (default: CDEI..CDEIII)")
+    parser.add_argument("--overlap", type=int, default=MOTIF_OVERLAP, help="Chunk overlap; must be >= longest possible match")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--format", choices=['tsv', 'bed'], default='tsv')
+    parser.add_argument("--include-mito", action='store_true')
+    parser.add_argument("--packed", action='store_true', help="Scan from the 2-bit packed genome (<fasta>.2bit.npz)")
+    parser.add_argument("-o", "--output", default=None, help="Output file (default: stdout)")
+    parser.add_argument("--check", action='store_true',
+                        help="Also run the original whole-chromosome scan and report any difference")
+    args = parser.parse_args(argv)
+
+    out = open(args.output, 'w') if args.output else sys.stdout
+    failed = False
+    try:
+        for i, fasta in enumerate(args.fasta):
+            with GenomeIndex(fasta) as genome:
+                offsets = dict(genome.offsets)
+            if len(args.fasta) > 1:
+                out.write(f"# {fasta}\n")
+            hits = scan_genome(fasta, args.pattern, args.chunk_size, args.overlap, args.workers, args.include_mito, args.packed)
+            if args.check:
+                hits = list(hits)
+                reference = set(reference_scan(fasta, args.pattern, args.include_mito))
+                missing, extra = reference - set(hits), set(hits) - reference
+                print(f"{fasta}: check {'OK' if not missing and not extra else 'FAILED'} "
+                      f"({len(missing)} missing, {len(extra)} extra vs. the whole-chromosome scan)", file=sys.stderr)
+                for hit in sorted(missing | extra):
+                    print(f"  {'missing' if hit in missing else 'extra'}: {hit}", file=sys.stderr)
+                failed = failed or bool(missing or extra)
+            n = write_hits(hits, out, args.format, offsets if args.format == 'tsv' else None, header=(i == 0))
+            print(f"{fasta}: {n} motif hits", file=sys.stderr)
+    finally:
+        if args.output:
+            out.close()
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
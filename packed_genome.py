@@ -0,0 +1,238 @@
+import os
+import zipfile
+
+import numpy as np
+
+from genome_index import GenomeIndex
+from sidecar import atomic_write, file_stamp
+
+# =================================================
+# 2-bit packed genome with the same interface as genome_index.GenomeIndex.
+# A/C/G/T are stored 4 bases per byte over the concatenated genome; every other
+# symbol (N gaps, IUPAC codes) is kept as runs of (start, end, byte), and soft-
+# masking as runs of lower-case positions. Decoding is table-driven over NumPy
+# arrays, and text is only produced for the slices a caller asks for (e.g. a
+# regex chunk). The packed arrays are cached next to the FASTA as <fasta>.2bit.npz.
+# =================================================
+
+CACHE_VERSION = 1
+BUILD_BLOCK = 1 << 23        # bases read per step while packing
+SHIFTS = np.array([6, 4, 2, 0], dtype=np.uint8)
+
+DECODE = np.frombuffer(b"ACGT", dtype=np.uint8)
+ENCODE = np.full(256, 255, dtype=np.uint8)          # upper-case ASCII -> 2-bit code, 255 = not ACGT
+ENCODE[DECODE] = np.arange(4, dtype=np.uint8)
+UPPER = np.frombuffer(bytes(range(256)).upper(), dtype=np.uint8)
+
+# Same mapping as genome_index.COMPLEMENT (case kept, other symbols unchanged)
+COMPLEMENT_TABLE = np.arange(256, dtype=np.uint8)
+for _base, _comp in zip(b"ACGTNacgtn", b"TGCANtgcan"):
+    COMPLEMENT_TABLE[_base] = _comp
+
+
+def reverse_complement(codes):
+    """Reverse complement of an ASCII uint8 array: one table lookup over a reversed view"""
+    return COMPLEMENT_TABLE[codes[::-1]]
+
+
+def _runs(values, base):
+    """(starts, ends, values) of the runs of equal non-zero values, shifted by `base`"""
+    change = np.flatnonzero(np.diff(values.astype(np.int16), prepend=0, append=0))
+    starts, ends = change[:-1], change[1:]
+    vals = values[starts]
+    keep = vals != 0
+    return starts[keep] + base, ends[keep] + base, vals[keep]
+
+
+def _concat_runs(parts):
+    """Concatenates per-block runs and joins those that touch and carry the same value
+    (runs split by block or sequence boundaries)"""
+    if not parts:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.uint8)
+    starts, ends, vals = (np.concatenate(column) for column in zip(*parts))
+    if len(starts) == 0:
+        return starts, ends, vals
+    new = np.r_[True, (starts[1:] != ends[:-1]) | (vals[1:] != vals[:-1])]
+    first = np.flatnonzero(new)
+    last = np.r_[first[1:], len(starts)] - 1
+    return starts[first], ends[last], vals[first]
+
+
+class PackedGenome:
+    """Packed, fully in-memory genome. Coordinates are 1-based and inclusive (GTF style)."""
+
+    ARRAYS = ('packed', 'exc_start', 'exc_end', 'exc_byte', 'low_start', 'low_end')
+
+    def __init__(self, fasta_path, names, lengths, arrays):
+        self.fasta_path = fasta_path
+        self.names = list(names)
+        self.lengths = {n: int(l) for n, l in zip(self.names, lengths)}
+        self.offsets = {}
+        total = 0
+        for n in self.names:
+            self.offsets[n] = total
+            total += self.lengths[n]
+        self.total_length = total
+        self._chrom_start = np.array([self.offsets[n] for n in self.names], dtype=np.int64)
+        for name in self.ARRAYS:
+            setattr(self, name, arrays[name])
+
+    # --- construction ------------------------------------------------------------
+    @classmethod
+    def from_fasta(cls, fasta_path, block=BUILD_BLOCK):
+        """Packs a FASTA in bounded-size blocks read through its .fai index"""
+        packed, exc, low = [], [], []
+        carry = np.empty(0, dtype=np.uint8)
+        pos = 0
+        with GenomeIndex(fasta_path) as genome:
+            for chrom in genome.names:
+                length = genome.lengths[chrom]
+                for start in range(1, length + 1, block):
+                    raw = np.frombuffer(genome.fetch(chrom, start, start + block - 1).encode('ascii'), dtype=np.uint8)
+                    upper = UPPER[raw]
+                    codes = ENCODE[upper]
+                    other = codes == 255
+                    exc.append(_runs(np.where(other, upper, 0).astype(np.uint8), pos))
+                    low.append(_runs((raw != upper).astype(np.uint8), pos))
+
+                    codes = np.concatenate([carry, np.where(other, 0, codes).astype(np.uint8)])
+                    n4 = len(codes) // 4 * 4
+                    packed.append(_pack(codes[:n4]))
+                    carry = codes[n4:]
+                    pos += len(raw)
+            names, lengths = list(genome.names), [genome.lengths[n] for n in genome.names]
+
+        if len(carry):
+            packed.append(_pack(np.concatenate([carry, np.zeros(4 - len(carry), dtype=np.uint8)])))
+        exc_start, exc_end, exc_byte = _concat_runs(exc)
+        low_start, low_end, _ = _concat_runs(low)
+        arrays = {
+            'packed': np.concatenate(packed) if packed else np.empty(0, dtype=np.uint8),
+            'exc_start': exc_start.astype(np.int64), 'exc_end': exc_end.astype(np.int64),
+            'exc_byte': exc_byte.astype(np.uint8),
+            'low_start': low_start.astype(np.int64), 'low_end': low_end.astype(np.int64),
+        }
+        return cls(fasta_path, names, lengths, arrays)
+
+    def save(self, cache_path, source_stat):
+        arrays = {name: getattr(self, name) for name in self.ARRAYS}
+        arrays['names'] = np.array(self.names, dtype=str)
+        arrays['lengths'] = np.array([self.lengths[n] for n in self.names], dtype=np.int64)
+        arrays['meta'] = np.array([CACHE_VERSION, source_stat[0], source_stat[1]], dtype=np.int64)
+        with atomic_write(cache_path) as f:
+            np.savez(f, **arrays)
+
+    @classmethod
+    def load_cached(cls, fasta_path, cache_path, source_stat):
+        with np.load(cache_path, allow_pickle=False) as data:
+            meta = data['meta']
+            if meta[0] != CACHE_VERSION or meta[1] != source_stat[0] or meta[2] != source_stat[1]:
+                return None
+            return cls(fasta_path, data['names'].tolist(), data['lengths'].tolist(),
+                       {name: data[name] for name in cls.ARRAYS})
+
+    # --- GenomeIndex interface ---------------------------------------------------
+    def __contains__(self, chrom):
+        return chrom in self.lengths
+
+    def __len__(self):
+        return len(self.names)
+
+    def close(self):
+        pass
+
+    def release(self, chrom):
+        pass   # fully in memory; nothing to drop
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def nbytes(self):
+        """Resident size of the packed arrays"""
+        return sum(getattr(self, name).nbytes for name in self.ARRAYS)
+
+    def codes(self, g0, g1):
+        """ASCII codes (uint8) of global 0-based positions [g0, g1)"""
+        b0, b1 = g0 >> 2, (g1 + 3) >> 2
+        two_bit = ((self.packed[b0:b1, None] >> SHIFTS) & 3).ravel()[g0 - 4 * b0:g1 - 4 * b0]
+        out = DECODE[two_bit]
+        for i, a, b in _overlapping(self.exc_start, self.exc_end, g0, g1):
+            out[a:b] = self.exc_byte[i]
+        for _, a, b in _overlapping(self.low_start, self.low_end, g0, g1):
+            out[a:b] |= 0x20   # soft-masked: lower-case
+        return out
+
+    def fetch(self, chrom, start=1, end=None, strand='+'):
+        """Returns chrom[start..end] (1-based, inclusive); reverse-complemented when strand is '-'.
+        Out-of-range coordinates are clipped, matching Python slice semantics."""
+        length = self.lengths[chrom]
+        end = length if end is None else min(end, length)
+        start = max(start, 1)
+        if end < start:
+            return ""
+        seq = self.codes(self.offsets[chrom] + start - 1, self.offsets[chrom] + end)
+        if strand == '-':
+            seq = reverse_complement(seq)
+        return seq.tobytes().decode('ascii')
+
+    def bases_at(self, chrom_idx, pos0):
+        """Vectorised single-base lookup: ASCII codes (uint8) of base `pos0` (0-based)
+        on sequence `self.names[chrom_idx]`"""
+        g = self._chrom_start[chrom_idx] + np.asarray(pos0, dtype=np.int64)
+        out = DECODE[(self.packed[g >> 2] >> (6 - 2 * (g & 3)).astype(np.uint8)) & 3]
+        i = np.searchsorted(self.exc_start, g, side='right') - 1
+        hit = (i >= 0) & (g < self.exc_end[np.maximum(i, 0)]) if len(self.exc_start) else np.zeros(g.shape, dtype=bool)
+        out[hit] = self.exc_byte[i[hit]]
+        i = np.searchsorted(self.low_start, g, side='right') - 1
+        hit = (i >= 0) & (g < self.low_end[np.maximum(i, 0)]) if len(self.low_start) else np.zeros(g.shape, dtype=bool)
+        out[hit] |= 0x20
+        return out
+
+    def global_coord(self, chrom, pos):
+        return self.offsets[chrom] + pos
+
+
+def _overlapping(starts, ends, g0, g1):
+    """(run index, slice start, slice end) of the sorted runs overlapping [g0, g1), relative to g0"""
+    i0 = np.searchsorted(ends, g0, side='right')
+    i1 = np.searchsorted(starts, g1, side='left')
+    for i in range(i0, i1):
+        yield i, max(int(starts[i]), g0) - g0, min(int(ends[i]), g1) - g0
+
+
+def _pack(codes):
+    c = codes.reshape(-1, 4)
+    return (c[:, 0] << 6) | (c[:, 1] << 4) | (c[:, 2] << 2) | c[:, 3]
+
+
+def load_packed_genome(fasta_path, use_cache=True):
+    """Returns a PackedGenome for `fasta_path`, reusing <fasta>.2bit.npz while the FASTA is unchanged.
+    Raises FileNotFoundError if the FASTA does not exist."""
+    stat = file_stamp(fasta_path)
+    if stat is None:
+        raise FileNotFoundError(fasta_path)
+    cache_path = fasta_path + ".2bit.npz"
+    if use_cache and os.path.exists(cache_path):
+        try:
+            genome = PackedGenome.load_cached(fasta_path, cache_path, stat)
+            if genome is not None:
+                return genome
+        except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+            pass   # unreadable/truncated/stale cache: rebuild
+
+    genome = PackedGenome.from_fasta(fasta_path)
+    if use_cache:
+        try:
+            genome.save(cache_path, stat)
+        except OSError:
+            pass   # read-only location; just skip caching
+    return genome
+
+
+def open_genome(fasta_path, packed=False):
+    """GenomeIndex (memory-mapped text) or PackedGenome (2-bit, in memory); same interface"""
+    return load_packed_genome(fasta_path) if packed else GenomeIndex(fasta_path)
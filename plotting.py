@@ -0,0 +1,20 @@
+import os
+
+# =================================================
+# Lazy, headless access to the plotting stack.
+# matplotlib takes most of a script's start-up time, so the scripts import it
+# through pyplot() only when a figure is actually drawn. The backend is
+# forced to the non-interactive Agg unless MPLBACKEND says otherwise, and
+# ANALYSIS_NO_PLOTS=1 (or a script's --no-plots flag) skips figures altogether.
+# =================================================
+
+PLOTS_ENABLED = os.environ.get("ANALYSIS_NO_PLOTS", "") in ("", "0")
+
+
+def pyplot():
+    """matplotlib.pyplot on a non-interactive backend; raises ImportError if matplotlib is missing"""
+    import matplotlib
+    if not os.environ.get("MPLBACKEND"):
+        matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
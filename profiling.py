@@ -0,0 +1,178 @@
+import atexit
+import contextlib
+import csv
+import io
+import json
+import os
+import resource
+import sys
+import time
+
+# =================================================
+# Per-stage timing for the analysis scripts.
+# Stages are marked with `with stage("splice_check", count=n):` (nested stages get
+# '/'-joined names) and record wall time, CPU time (including finished worker
+# processes), peak RSS and record counts. Nothing is written unless profiling is
+# switched on, either for a whole script through the environment:
+#
+#   ANALYSIS_PROFILE=profile.json python analyze_introns_w_len.py   (.tsv for a table)
+#   ANALYSIS_PROFILE_MODE=cprofile|tracemalloc                      (optional)
+#
+# or around a block of code with `session(path)` (used by batch_analysis.py).
+# cprofile mode also writes <report>.prof and lists the top functions; tracemalloc
+# mode adds the peak Python heap of every stage.
+# =================================================
+
+PROFILE_PATH = os.environ.get("ANALYSIS_PROFILE", "")
+PROFILE_MODE = os.environ.get("ANALYSIS_PROFILE_MODE", "")
+MODES = ("", "timers", "cprofile", "tracemalloc")   # "" = timers only
+TOP_FUNCTIONS = 25
+TSV_FIELDS = ['stage', 'wall_s', 'cpu_s', 'count', 'per_s', 'peak_rss_mb', 'rss_growth_mb', 'py_peak_mb']
+
+
+class Stage:
+    """Measurements of one stage; `count` may be set inside the `with` block"""
+    __slots__ = ('name', 'count', 'wall_s', 'cpu_s', 'peak_rss_mb', 'rss_growth_mb', 'py_peak_mb')
+
+    def __init__(self, name, count=None):
+        self.name = name
+        self.count = count
+        self.wall_s = self.cpu_s = self.peak_rss_mb = self.rss_growth_mb = self.py_peak_mb = None
+
+    def as_dict(self):
+        per_s = round(self.count / self.wall_s, 1) if self.count is not None and self.wall_s else None
+        return {'stage': self.name, 'wall_s': self.wall_s, 'cpu_s': self.cpu_s, 'count': self.count, 'per_s': per_s,
+                'peak_rss_mb': self.peak_rss_mb, 'rss_growth_mb': self.rss_growth_mb, 'py_peak_mb': self.py_peak_mb}
+
+
+class Profile:
+    """Collects the stages of one run and writes them as JSON or TSV"""
+
+    def __init__(self, path, mode=""):
+        if mode not in MODES:
+            raise ValueError(f"Unknown profile mode '{mode}' (expected one of: timers, cprofile, tracemalloc)")
+        self.path = path
+        self.mode = mode
+        self.stages = []
+        self._stack = []
+        self._t0 = time.perf_counter()
+        self._cpu0 = _cpu_seconds()
+        self._cprofile = None
+        # profiler modules are imported on demand to keep script start-up lean
+        if mode == "cprofile":
+            import cProfile
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+        elif mode == "tracemalloc":
+            import tracemalloc
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+
+    @contextlib.contextmanager
+    def stage(self, name, count=None):
+        record = Stage("/".join(self._stack + [name]), count)
+        self._stack.append(name)
+        rss0 = _peak_rss_mb()
+        if self.mode == "tracemalloc":
+            sys.modules['tracemalloc'].reset_peak()
+        cpu0, t0 = _cpu_seconds(), time.perf_counter()
+        try:
+            yield record
+        finally:
+            record.wall_s = round(time.perf_counter() - t0, 6)
+            record.cpu_s = round(_cpu_seconds() - cpu0, 6)
+            record.peak_rss_mb = _peak_rss_mb()
+            record.rss_growth_mb = round(record.peak_rss_mb - rss0, 1)
+            if self.mode == "tracemalloc":
+                record.py_peak_mb = round(sys.modules['tracemalloc'].get_traced_memory()[1] / 2 ** 20, 1)
+            self._stack.pop()
+            self.stages.append(record)
+
+    def report(self):
+        report = {
+            'script': os.path.basename(sys.argv[0]) if sys.argv and sys.argv[0] else None,
+            'mode': self.mode or 'timers',
+            'total_wall_s': round(time.perf_counter() - self._t0, 6),
+            'total_cpu_s': round(_cpu_seconds() - self._cpu0, 6),
+            'peak_rss_mb': _peak_rss_mb(),
+            'stages': [s.as_dict() for s in self.stages],
+        }
+        if self._cprofile is not None:
+            report['top_functions'] = _top_functions(self._cprofile)
+        return report
+
+    def write(self):
+        if self._cprofile is not None:
+            self._cprofile.disable()
+            self._cprofile.dump_stats(self.path + ".prof")
+        report = self.report()
+        if self.path.endswith(".tsv"):
+            with open(self.path, 'w', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=TSV_FIELDS, delimiter='\t', extrasaction='ignore')
+                writer.writeheader()
+                writer.writerows(report['stages'])
+                writer.writerow({'stage': 'TOTAL', 'wall_s': report['total_wall_s'],
+                                 'cpu_s': report['total_cpu_s'], 'peak_rss_mb': report['peak_rss_mb']})
+        else:
+            with open(self.path, 'w') as f:
+                json.dump(report, f, indent=2)
+        if self.mode == "tracemalloc":
+            sys.modules['tracemalloc'].stop()
+        return report
+
+
+_active = None
+
+
+@contextlib.contextmanager
+def stage(name, count=None):
+    """Times a stage when profiling is on; otherwise a no-op that still accepts `.count`"""
+    if _active is None:
+        yield Stage(name, count)
+        return
+    with _active.stage(name, count) as record:
+        yield record
+
+
+@contextlib.contextmanager
+def session(path, mode=""):
+    """Profiles the enclosed block into `path` (replaces any active profile meanwhile)"""
+    global _active
+    previous, _active = _active, Profile(path, mode)
+    try:
+        yield _active
+    finally:
+        _active.write()
+        _active = previous
+
+
+def enable(path, mode=""):
+    """Profiles the rest of the process; the report is written at exit"""
+    global _active
+    _active = Profile(path, mode)
+    atexit.register(_active.write)
+    return _active
+
+
+def _cpu_seconds():
+    own, workers = resource.getrusage(resource.RUSAGE_SELF), resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + workers.ru_utime + workers.ru_stime
+
+
+def _peak_rss_mb():
+    """Peak resident set size of this process so far (ru_maxrss is in KiB on Linux)"""
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def _top_functions(profiler, limit=TOP_FUNCTIONS):
+    import pstats
+    stats = pstats.Stats(profiler, stream=io.StringIO())
+    rows = []
+    for (filename, line, func), (_, ncalls, tottime, cumtime, _) in stats.stats.items():
+        rows.append({'function': f"{os.path.basename(filename)}:{line}({func})", 'calls': ncalls,
+                     'tottime_s': round(tottime, 6), 'cumtime_s': round(cumtime, 6)})
+    return sorted(rows, key=lambda r: r['cumtime_s'], reverse=True)[:limit]
+
+
+if PROFILE_PATH:
+    enable(PROFILE_PATH, PROFILE_MODE)
@@ -0,0 +1,130 @@
+import argparse
+import json
+import os
+import socket
+
+from sidecar import file_stamp
+
+# =================================================
+# Thin client for query_service.py (standard library only, plus sidecar.file_stamp).
+#
+#   from query_client import QueryClient
+#   with QueryClient() as qc:
+#       qc.fetch(["ChrI:1000-1100", "ChrII:500-560:-"])
+#       qc.introns(genes=["ACT1"])                       # with splice motifs
+#       qc.overlap("tes", genes=["ACT1"], distance=10000)
+#       qc.mat_distance()
+#       qc.splice_sites()                                # as analyze_introns_w_len.py --service
+#       qc.batch([{"op": "fetch", "regions": [...]}, {"op": "nearest", ...}])
+# =================================================
+
+SOCKET_PATH = ".analysis_service.sock"
+
+
+class QueryError(RuntimeError):
+    """The service answered with an error"""
+
+
+class QueryClient:
+    """One connection to the service; requests are newline-delimited JSON"""
+
+    def __init__(self, socket_path=SOCKET_PATH, port=None, timeout=60):
+        if port is not None:
+            self._sock = socket.create_connection(('127.0.0.1', port), timeout=timeout)
+        else:
+            self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._sock.settimeout(timeout)
+            self._sock.connect(socket_path)
+        self._file = self._sock.makefile('rwb')
+
+    def close(self):
+        self._file.close()
+        self._sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _send(self, payload):
+        self._file.write((json.dumps(payload) + "\n").encode())
+        self._file.flush()
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError("service closed the connection")
+        return json.loads(line)
+
+    def request(self, op, **args):
+        """Result of one query; raises QueryError if the service reports an error"""
+        response = self._send(dict(args, op=op))
+        if not response['ok']:
+            raise QueryError(response['error'])
+        return response['result']
+
+    def batch(self, requests):
+        """Raw responses ({'ok', 'result' | 'error'}) of several queries sent in one round trip"""
+        return self._send(list(requests))
+
+    # --- convenience ---------------------------------------------------------------
+    def fetch(self, regions=None, genes=None):
+        return self.request('fetch', regions=regions, genes=genes)
+
+    def introns(self, transcripts=None, genes=None, regions=None):
+        return self.request('introns', transcripts=transcripts, genes=genes, regions=regions)
+
+    def overlap(self, track, regions=None, genes=None, distance=0):
+        return self.request('overlap', track=track, regions=regions, genes=genes, distance=distance)
+
+    def nearest(self, track, regions=None, genes=None):
+        return self.request('nearest', track=track, regions=regions, genes=genes)
+
+    def mat_distance(self, anchor='SLA2', targets=('MAT',), max_distance=None):
+        return self.request('mat_distance', anchor=anchor, targets=list(targets), max_distance=max_distance)
+
+    def splice_sites(self):
+        return self.request('splice_sites')
+
+    def status(self):
+        return self.request('status')
+
+    def serves(self, dataset, *paths):
+        """True if the service has `dataset` loaded from exactly these files, unchanged since loading"""
+        info = self.status()['datasets'].get(dataset)
+        if not info or not info['loaded']:
+            return False
+        local = [file_stamp(p) for p in paths]
+        if None in local:
+            return False
+        return [os.path.abspath(p) for p in paths] == info['paths'][:len(paths)] and local == info['stamps'][:len(paths)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query a running query_service.py.")
+    parser.add_argument("op", help="status, reload, fetch, introns, overlap, nearest, mat_distance, splice_sites, "
+                                   "or a raw JSON request")
+    parser.add_argument("regions", nargs='*', help="Chr:start-end[:strand] windows")
+    parser.add_argument("--gene", action='append', default=None, help="Gene id or name (repeatable)")
+    parser.add_argument("--transcript", action='append', default=None, help="Transcript id (introns)")
+    parser.add_argument("--track", default='tes', help="genes, exons, introns or tes (overlap/nearest)")
+    parser.add_argument("--distance", type=int, default=0, help="Window padding in bp (overlap)")
+    parser.add_argument("--socket", default=SOCKET_PATH)
+    parser.add_argument("--port", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.op.lstrip().startswith(('{', '[')):
+        request = json.loads(args.op)
+    else:
+        request = {'op': args.op}
+        if args.regions:
+            request['regions'] = args.regions
+        if args.gene:
+            request['genes'] = args.gene
+        if args.transcript:
+            request['transcripts'] = args.transcript
+        if args.op in ('overlap', 'nearest'):
+            request['track'] = args.track
+        if args.op == 'overlap':
+            request['distance'] = args.distance
+    with QueryClient(args.socket, args.port) as client:
+        print(json.dumps(client.batch(request) if isinstance(request, list) else client._send(request), indent=2))
@@ -0,0 +1,474 @@
+import argparse
+import asyncio
+import json
+import os
+import re
+import signal
+import time
+
+import numpy as np
+import pandas as pd
+
+from analyze_introns_w_len import intron_motifs, splice_site_counts
+from blast_hits import HitStore
+from genome_index import GenomeIndex
+from gtf_store import STRANDS, load_annotation
+from interval_index import IntervalIndex
+from intron_engine import derive_introns, gene_names_by_gene, transcript_genes
+from ltr_loader import LTR_FILE, load_ltrs
+from sidecar import file_stamp
+from te_classification import CLS_FILE, join_classification, load_classification
+
+# =================================================
+# Resident query service for interactive curation.
+# The genome (.fai/mmap), annotation (GTFStore + derived introns), LTR table
+# (with GyDB classes) and tBLASTn hits are loaded once into indexed structures,
+# and queries are answered from memory over newline-delimited JSON on a Unix
+# socket (default) or a localhost TCP port. Each input is re-loaded when its
+# mtime or size changes. query_client.py is the matching client:
+#
+#   python query_service.py &
+#   python query_client.py fetch ChrI:1000-1100
+#
+# Request:  {"op": "overlap", "track": "tes", "genes": ["ACT1"], "distance": 10000}
+#           or a list of requests (batch); one JSON response line per request line.
+# Response: {"ok": true, "result": ...} or {"ok": false, "error": "..."}
+# =================================================
+
+SOCKET_PATH = ".analysis_service.sock"
+FASTA_FILE = "Schoenii_assembly.fa"
+GTF_FILE = "schoenii_annotation.gtf"
+BLAST_FILE = "mat_search.txt"
+RELOAD_INTERVAL = 2.0   # seconds between input file checks
+LINE_LIMIT = 1 << 24    # longest request line accepted (bytes)
+TRACKS = ('genes', 'exons', 'introns', 'tes')
+REGION_RE = re.compile(r'^(?P<chrom>[^:]+):(?P<start>[\d,]+)-(?P<end>[\d,]+)(?::(?P<strand>[+-]))?$')
+
+
+class QueryError(ValueError):
+    """A request the service cannot answer (bad op, argument or missing input)"""
+
+
+class Dataset:
+    """One input (one or more files) and the structure built from it; rebuilt when a file changes"""
+
+    def __init__(self, name, paths, build):
+        self.name = name
+        self.paths = [os.path.abspath(p) for p in paths if p]
+        self.build = build
+        self.stamps = None
+        self.value = None
+        self.error = None
+        self.loaded_at = None
+
+    def changed(self):
+        return [file_stamp(p) for p in self.paths] != self.stamps
+
+    def rebuild(self):
+        """(stamps, value, error) built from the files as they are now; the loaded data is untouched,
+        so this can run in a thread while queries are answered from the old value"""
+        stamps = [file_stamp(p) for p in self.paths]
+        t0 = time.perf_counter()
+        try:
+            value, error = self.build(*self.paths), None
+        except (FileNotFoundError, OSError, ValueError, KeyError, pd.errors.ParserError, pd.errors.EmptyDataError) as e:
+            value, error = None, f"{type(e).__name__}: {e}"
+        state = "loaded" if error is None else f"unavailable ({error})"
+        print(f"[{self.name}] {state} in {time.perf_counter() - t0:.2f} s")
+        return stamps, value, error
+
+    def install(self, stamps, value, error):
+        """Swaps in a rebuilt structure; stamps, value and error change together.
+        A failed build keeps the error and drops the stale value."""
+        self.stamps, self.value, self.error = stamps, value, error
+        self.loaded_at = time.time()
+
+    def load(self):
+        self.install(*self.rebuild())
+
+    def get(self):
+        if self.value is None:
+            raise QueryError(f"{self.name} is not loaded: {self.error or 'no input'}")
+        return self.value
+
+    def status(self):
+        return {'paths': self.paths, 'stamps': self.stamps, 'loaded': self.value is not None, 'error': self.error,
+                'loaded_at': self.loaded_at}
+
+
+# --- Builders ------------------------------------------------------------------
+
+def build_annotation(gtf_path):
+    """GTFStore plus gene spans, exons and introns as interval indexes"""
+    store = load_annotation(gtf_path)
+    seqids = np.array(store.seqid_names, dtype=object)
+    exon_rows = np.flatnonzero(store.feature_mask('exon') & (store.gene >= 0) & (store.transcript >= 0))
+
+    # Gene spans from their exons
+    order = exon_rows[np.argsort(store.gene[exon_rows], kind='stable')]
+    bounds = np.flatnonzero(np.r_[True, store.gene[order][1:] != store.gene[order][:-1]]) if len(order) else []
+    gene_code = store.gene[order[bounds]] if len(order) else np.empty(0, dtype=np.int64)
+    name_of = gene_names_by_gene(store)
+    genes = pd.DataFrame({
+        'gene_id': [store.gene_ids[g] for g in gene_code.tolist()],
+        'gene_name': [store.gene_names[n] if n >= 0 else None for n in name_of[gene_code].tolist()],
+        'chrom': seqids[store.seqid[order[bounds]]] if len(order) else [],
+        'start': np.minimum.reduceat(store.start[order], bounds) if len(order) else [],
+        'end': np.maximum.reduceat(store.end[order], bounds) if len(order) else [],
+        'strand': [STRANDS[s] for s in store.strand[order[bounds]].tolist()] if len(order) else [],
+    })
+    exons = pd.DataFrame({'transcript_id': [store.transcript_ids[t] for t in store.transcript[exon_rows].tolist()],
+                          'chrom': seqids[store.seqid[exon_rows]], 'start': store.start[exon_rows],
+                          'end': store.end[exon_rows],
+                          'strand': [STRANDS[s] for s in store.strand[exon_rows].tolist()]})
+
+    introns = derive_introns(store)
+    tx_gene = transcript_genes(store)[introns['transcript']]
+    intron_table = pd.DataFrame({
+        'transcript_id': [store.transcript_ids[t] for t in introns['transcript'].tolist()],
+        'gene_id': [store.gene_ids[g] if g >= 0 else None for g in tx_gene.tolist()],
+        'chrom': seqids[introns['seqid']], 'start': introns['start'], 'end': introns['end'],
+        'strand': [STRANDS[s] for s in introns['strand'].tolist()], 'length': introns['length']})
+
+    by_name = {}
+    for i, (gid, name) in enumerate(zip(genes['gene_id'], genes['gene_name'])):
+        by_name.setdefault(gid, []).append(i)
+        if name and name != gid:
+            by_name.setdefault(name, []).append(i)
+    return {'store': store, 'introns': introns, 'tables': {'genes': genes, 'exons': exons, 'introns': intron_table},
+            'index': {name: IntervalIndex(t['chrom'].to_numpy(), t['start'].to_numpy(), t['end'].to_numpy())
+                      for name, t in (('genes', genes), ('exons', exons), ('introns', intron_table))},
+            'genes_by_name': by_name,
+            'transcripts': set(store.transcript_ids),
+            'introns_by_transcript': intron_table.groupby('transcript_id').indices,
+            'introns_by_gene': intron_table.groupby('gene_id').indices}
+
+
+def build_tes(ltr_path, cls_path=None):
+    """LTR candidates with their GyDB classification (when available) and an interval index"""
+    df = load_ltrs(ltr_path)
+    try:
+        df = join_classification(df, load_classification(cls_path)) if cls_path else df
+    except FileNotFoundError:
+        pass
+    table = df.drop(columns=[c for c in ('Seq_Nr',) if c in df]).rename(
+        columns={'Chromosome': 'chrom', 'Start': 'start', 'End': 'end', 'Length': 'length',
+                 'Similarity': 'ltr_identity', 'Key': 'key'})
+    table['ltr_identity'] = table['ltr_identity'].astype('float64').round(2)
+    return {'table': table, 'index': IntervalIndex(table['chrom'].to_numpy(), table['start'].to_numpy(),
+                                                   table['end'].to_numpy())}
+
+
+# --- Service -------------------------------------------------------------------
+
+class QueryService:
+    """Datasets plus the query operations (op_<name>) run against them"""
+
+    def __init__(self, fasta_path=FASTA_FILE, gtf_path=GTF_FILE, ltr_path=LTR_FILE, cls_path=CLS_FILE,
+                 blast_path=BLAST_FILE):
+        self.datasets = {
+            'genome': Dataset('genome', [fasta_path], GenomeIndex),
+            'annotation': Dataset('annotation', [gtf_path], build_annotation),
+            'tes': Dataset('tes', [ltr_path, cls_path], build_tes),
+            'blast': Dataset('blast', [blast_path], HitStore.from_file),
+        }
+        self.started = time.time()
+        self._synteny = {}   # memoised mat_distance tables of the loaded hits
+        self._splice_sites = None
+
+    def load_all(self):
+        for dataset in self.datasets.values():
+            dataset.load()
+
+    def reload_changed(self):
+        """Re-loads every dataset whose files changed; returns their names"""
+        changed = [d for d in self.datasets.values() if d.changed()]
+        for dataset in changed:
+            self._swap(dataset, dataset.rebuild())
+        return [d.name for d in changed]
+
+    async def reload_changed_async(self):
+        """As reload_changed, building in a thread so queries keep being answered from the old data
+        (and status keeps reporting the old stamps) until the new structure is swapped in"""
+        changed = [d for d in self.datasets.values() if d.changed()]
+        for dataset in changed:
+            self._swap(dataset, await asyncio.to_thread(dataset.rebuild))
+        return [d.name for d in changed]
+
+    def _swap(self, dataset, built):
+        """Drops results memoised from the old data, installs the new one, closes the old genome"""
+        if dataset.name == 'blast':
+            self._synteny = {}
+        if dataset.name in ('genome', 'annotation'):
+            self._splice_sites = None
+        old = dataset.value
+        dataset.install(*built)
+        if isinstance(old, GenomeIndex) and old is not dataset.value:
+            old.close()
+
+    def handle(self, request):
+        """Response for one request (a dict) or a batch (a list of dicts)"""
+        if isinstance(request, list):
+            return [self.handle(r) for r in request]
+        try:
+            if not isinstance(request, dict) or 'op' not in request:
+                raise QueryError("request must be an object with an 'op' field")
+            args = dict(request)
+            op = getattr(self, f"op_{args.pop('op')}", None) if isinstance(request['op'], str) else None
+            if op is None:
+                raise QueryError(f"unknown op {request['op']!r}")
+            return {'ok': True, 'result': op(**args)}
+        except Exception as e:   # one bad request must not drop the connection or the rest of its batch
+            return {'ok': False, 'error': f"{type(e).__name__}: {e}"}
+
+    # --- helpers -----------------------------------------------------------------
+    def _regions(self, regions=None, genes=None):
+        """(labels, chroms, starts, ends, strands) of the query windows: 'Chr:start-end[:strand]'
+        strings, [chrom, start, end(, strand)] lists, or gene ids/names (their exon span)"""
+        labels, chroms, starts, ends, strands = [], [], [], [], []
+        for name, values in (('regions', regions), ('genes', genes)):
+            if values is not None and not isinstance(values, list):
+                raise QueryError(f"'{name}' must be a list")
+        for region in regions or []:
+            if isinstance(region, str):
+                m = REGION_RE.match(region.strip())
+                if not m:
+                    raise QueryError(f"region must look like Chr:start-end[:strand], got {region!r}")
+                chrom, start, end = m['chrom'], int(m['start'].replace(',', '')), int(m['end'].replace(',', ''))
+                strand = m['strand'] or '+'
+            elif isinstance(region, list) and len(region) in (3, 4):
+                chrom, start, end = str(region[0]), int(region[1]), int(region[2])
+                strand = region[3] if len(region) > 3 else '+'
+                if strand not in ('+', '-'):
+                    raise QueryError(f"region strand must be '+' or '-', got {strand!r}")
+            else:
+                raise QueryError(f"region must be 'Chr:start-end[:strand]' or [chrom, start, end(, strand)], got {region!r}")
+            labels.append(region if isinstance(region, str) else f"{chrom}:{start}-{end}")
+            chroms.append(chrom)
+            starts.append(start)
+            ends.append(end)
+            strands.append(strand)
+        if genes:
+            annotation = self.datasets['annotation'].get()
+            table = annotation['tables']['genes']
+            for gene in genes:
+                rows = annotation['genes_by_name'].get(gene)
+                if not rows:
+                    raise QueryError(f"unknown gene {gene!r}")
+                for r in rows:
+                    labels.append(gene)
+                    chroms.append(table['chrom'].iat[r])
+                    starts.append(int(table['start'].iat[r]))
+                    ends.append(int(table['end'].iat[r]))
+                    strands.append(table['strand'].iat[r])
+        if not labels:
+            raise QueryError("give 'regions' and/or 'genes'")
+        return labels, chroms, starts, ends, strands
+
+    def _track(self, track):
+        if track == 'tes':
+            tes = self.datasets['tes'].get()
+            return tes['table'], tes['index']
+        if track not in TRACKS:
+            raise QueryError(f"unknown track {track!r} (expected one of: {', '.join(TRACKS)})")
+        annotation = self.datasets['annotation'].get()
+        return annotation['tables'][track], annotation['index'][track]
+
+    def _grouped(self, table, groups, motifs=False):
+        """[(label, rows)] -> [(label, records)], converting all rows in one go; intron records
+        get their splice motif (read from the current genome, if loaded)"""
+        rows = np.concatenate([np.asarray(r, dtype=np.int64) for _, r in groups] or [np.empty(0, dtype=np.int64)])
+        records = _records(table.iloc[rows])
+        genome = self.datasets['genome'].value
+        if motifs and len(rows) and genome is not None:
+            annotation = self.datasets['annotation'].get()
+            subset = {k: annotation['introns'][k][rows] for k in ('seqid', 'start', 'end', 'strand', 'length')}
+            for record, motif in zip(records, intron_motifs(genome, annotation['store'], subset)):
+                record['motif'] = motif or None
+        bounds = np.cumsum([0] + [len(r) for _, r in groups]).tolist()
+        return [(label, records[a:b]) for (label, _), a, b in zip(groups, bounds, bounds[1:])]
+
+    # --- operations --------------------------------------------------------------
+    def op_status(self):
+        return {'uptime_s': round(time.time() - self.started, 1),
+                'datasets': {name: d.status() for name, d in self.datasets.items()}}
+
+    def op_reload(self):
+        return {'reloaded': self.reload_changed()}
+
+    def op_splice_sites(self):
+        """Splice motif -> intron count over the whole annotation, in order of first occurrence
+        (analyze_introns_w_len.splice_site_counts on the loaded genome and annotation)"""
+        if self._splice_sites is None:
+            annotation = self.datasets['annotation'].get()
+            self._splice_sites = splice_site_counts(self.datasets['genome'].get(), annotation['store'],
+                                                    annotation['introns'])
+        return self._splice_sites
+
+    def op_fetch(self, regions=None, genes=None):
+        """Sequence of every region (reverse-complemented for '-' regions)"""
+        genome = self.datasets['genome'].get()
+        labels, chroms, starts, ends, strands = self._regions(regions, genes)
+        out = []
+        for label, chrom, start, end, strand in zip(labels, chroms, starts, ends, strands):
+            if chrom not in genome:
+                raise QueryError(f"unknown sequence {chrom!r}")
+            out.append({'region': label, 'sequence': genome.fetch(chrom, start, end, strand)})
+        return out
+
+    def op_introns(self, transcripts=None, genes=None, regions=None):
+        """Introns (with splice motifs) of transcripts, of genes, or overlapping regions"""
+        annotation = self.datasets['annotation'].get()
+        table = annotation['tables']['introns']
+        groups = []
+        for tx in transcripts or []:
+            if tx not in annotation['transcripts']:
+                raise QueryError(f"unknown transcript {tx!r}")
+            groups.append((tx, annotation['introns_by_transcript'].get(tx, [])))
+        for gene in genes or []:
+            rows = annotation['genes_by_name'].get(gene)
+            if not rows:
+                raise QueryError(f"unknown gene {gene!r}")
+            by_gene = annotation['introns_by_gene']
+            ids = annotation['tables']['genes']['gene_id'].iloc[rows]
+            rows = np.sort(np.concatenate([by_gene[g] for g in ids if g in by_gene] or [np.empty(0, dtype=np.int64)]))
+            groups.append((gene, rows))
+        if regions:
+            labels, chroms, starts, ends, _ = self._regions(regions)
+            q, r = annotation['index']['introns'].overlap_batch(chroms, starts, ends)
+            groups += _by_query(labels, q, r)
+        if not groups:
+            raise QueryError("give 'transcripts', 'genes' and/or 'regions'")
+        return [{'query': label, 'introns': records} for label, records in self._grouped(table, groups, motifs=True)]
+
+    def op_overlap(self, track, regions=None, genes=None, distance=0):
+        """Features of `track` within `distance` bp of each query window"""
+        table, index = self._track(track)
+        labels, chroms, starts, ends, _ = self._regions(regions, genes)
+        q, r = index.within_batch(chroms, starts, ends, int(distance))
+        return [{'query': label, 'hits': records} for label, records in self._grouped(table, _by_query(labels, q, r))]
+
+    def op_nearest(self, track, regions=None, genes=None):
+        """Closest feature of `track` to each query window and the gap in bp (0 = overlapping)"""
+        table, index = self._track(track)
+        labels, chroms, starts, ends, _ = self._regions(regions, genes)
+        rows, dist = index.nearest_batch(chroms, starts, ends)
+        found = self._grouped(table, [(label, [row] if row >= 0 else []) for label, row in zip(labels, rows.tolist())])
+        return [{'query': label, 'distance': int(d) if records else None, 'hit': records[0] if records else None}
+                for (label, records), d in zip(found, dist.tolist())]
+
+    def op_mat_distance(self, anchor='SLA2', targets=('MAT',), max_distance=None):
+        """MAT-SLA2 synteny: target hits on every scaffold with an anchor hit and their distance"""
+        store = self.datasets['blast'].get()
+        if anchor not in store.categories or any(t not in store.categories for t in targets):
+            raise QueryError(f"categories are: {', '.join(store.categories)}")
+        key = (anchor, tuple(targets), max_distance)
+        if key not in self._synteny:   # cleared when the hits are reloaded
+            self._synteny[key] = _records(store.synteny_table(anchor, list(targets), max_distance))
+        return self._synteny[key]
+
+
+def _by_query(labels, q, r):
+    """(query, row) pairs from a batch lookup as [(label, rows in table order)]"""
+    order = np.lexsort((r, q))
+    q, r = q[order], r[order]
+    bounds = np.searchsorted(q, np.arange(len(labels) + 1))
+    return [(label, r[a:b]) for label, a, b in zip(labels, bounds[:-1].tolist(), bounds[1:].tolist())]
+
+
+def _records(df):
+    """DataFrame rows as JSON-ready dicts (NaN -> None)"""
+    return json.loads(df.to_json(orient='records'))
+
+
+# --- Server --------------------------------------------------------------------
+
+async def _skip_line(reader, consumed):
+    """Discards the rest of an over-long request line without buffering it"""
+    while True:
+        await reader.readexactly(consumed)
+        try:
+            await reader.readuntil(b"\n")
+            return
+        except asyncio.LimitOverrunError as e:
+            consumed = e.consumed
+
+
+async def _serve_client(service, reader, writer):
+    try:
+        while True:
+            try:
+                line = await reader.readuntil(b"\n")
+            except asyncio.IncompleteReadError as e:   # EOF, possibly after a last unterminated line
+                line = e.partial
+            except asyncio.LimitOverrunError as e:
+                await _skip_line(reader, e.consumed)
+                line = None
+            if line == b"":
+                break
+            if line is None:
+                response = {'ok': False, 'error': f"request longer than {LINE_LIMIT} bytes"}
+            else:
+                try:
+                    response = service.handle(json.loads(line))
+                except ValueError as e:   # JSONDecodeError, UnicodeDecodeError
+                    response = {'ok': False, 'error': f"invalid JSON: {e}"}
+            writer.write((json.dumps(response) + "\n").encode())
+            await writer.drain()
+    except (ConnectionResetError, BrokenPipeError, asyncio.IncompleteReadError):   # client gone mid-request
+        pass
+    finally:
+        writer.close()
+
+
+async def _watch(service, interval):
+    while True:
+        await asyncio.sleep(interval)
+        await service.reload_changed_async()
+
+
+async def serve(service, socket_path=SOCKET_PATH, port=None, reload_interval=RELOAD_INTERVAL):
+    """Runs until cancelled; a TCP port binds to 127.0.0.1 only"""
+    def handler(reader, writer):
+        return _serve_client(service, reader, writer)
+
+    if port is not None:
+        server = await asyncio.start_server(handler, host='127.0.0.1', port=port, limit=LINE_LIMIT)
+        where = f"127.0.0.1:{port}"
+    else:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)   # left over from a previous run
+        server = await asyncio.start_unix_server(handler, path=socket_path, limit=LINE_LIMIT)
+        where = socket_path
+    print(f"Serving queries on {where} (Ctrl-C to stop)")
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    watcher = asyncio.create_task(_watch(service, reload_interval)) if reload_interval else None
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        if watcher:
+            watcher.cancel()
+        if port is None and os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resident genome/annotation/TE/BLAST query service.")
+    parser.add_argument("--fasta", default=FASTA_FILE)
+    parser.add_argument("--gtf", default=GTF_FILE)
+    parser.add_argument("--ltrs", default=LTR_FILE)
+    parser.add_argument("--cls", default=CLS_FILE, help="GyDB classification joined onto the LTR table")
+    parser.add_argument("--blast", default=BLAST_FILE, help="tBLASTn outfmt 6 hits for mat_distance")
+    parser.add_argument("--socket", default=SOCKET_PATH, help="Unix socket path")
+    parser.add_argument("--port", type=int, default=None, help="Serve on 127.0.0.1:PORT instead of a Unix socket")
+    parser.add_argument("--reload-interval", type=float, default=RELOAD_INTERVAL,
+                        help="Seconds between input file checks (0 = never reload)")
+    args = parser.parse_args()
+
+    service = QueryService(args.fasta, args.gtf, args.ltrs, args.cls, args.blast)
+    service.load_all()
+    try:
+        asyncio.run(serve(service, args.socket, args.port, args.reload_interval))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
@@ -0,0 +1,177 @@
+import contextlib
+import hashlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from sidecar import atomic_write, file_stamp
+
+# =================================================
+# Content-addressed cache for whole analysis stages.
+# A stage's key is the SHA-256 of its name, the contents of its input files
+# (data and the source modules it runs), and its parameters (e.g. CULPRIT_KEYWORDS,
+# the centromere regex). On a hit the stored output files are copied back and the
+# captured stdout is replayed; on a miss the stage runs and its outputs are stored.
+# Entries are evicted least-recently-used first once the cache exceeds its budget.
+# =================================================
+
+CACHE_DIR = os.environ.get("ANALYSIS_CACHE_DIR", ".analysis_cache")   # "" disables caching
+CACHE_BUDGET_MB = int(os.environ.get("ANALYSIS_CACHE_MB", "2048"))
+CACHE_VERSION = 1
+HASH_BLOCK = 1 << 20
+
+
+class ResultCache:
+    def __init__(self, cache_dir=CACHE_DIR, budget_mb=CACHE_BUDGET_MB):
+        self.cache_dir = cache_dir
+        self.budget = budget_mb * 1024 * 1024
+        os.makedirs(cache_dir, exist_ok=True)
+        self._hash_index_path = os.path.join(cache_dir, "file_hashes.json")
+        try:
+            with open(self._hash_index_path) as f:
+                self._hash_index = json.load(f)
+        except (OSError, ValueError):
+            self._hash_index = {}
+
+    # --- keys ----------------------------------------------------------------
+    def file_digest(self, path):
+        """SHA-256 of a file, memoised on its stamp (mtime_ns, size) so unchanged inputs are not re-read"""
+        stamp = file_stamp(path)
+        if stamp is None:
+            raise FileNotFoundError(path)
+        path = os.path.abspath(path)
+        known = self._hash_index.get(path)
+        if known and known[:2] == stamp:
+            return known[2]
+        h = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(HASH_BLOCK), b''):
+                h.update(block)
+        self._hash_index[path] = stamp + [h.hexdigest()]
+        _write_json(self._hash_index_path, self._hash_index)
+        return h.hexdigest()
+
+    def key(self, stage, inputs, params=None, outputs=()):
+        """Output paths are part of the key because the stages echo them in their reports"""
+        h = hashlib.sha256()
+        h.update(f"{CACHE_VERSION}\0{stage}\0".encode())
+        for path in inputs:
+            h.update(self.file_digest(path).encode())
+        h.update(json.dumps([params or {}, list(outputs)], sort_keys=True, default=str).encode())
+        return h.hexdigest()
+
+    # --- entries -------------------------------------------------------------
+    def _entry(self, key):
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def lookup(self, key):
+        """Entry metadata (stdout, outputs) or None; a hit marks the entry as recently used"""
+        meta_path = os.path.join(self._entry(key), "meta.json")
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        os.utime(meta_path)
+        return meta
+
+    def restore(self, key, meta, outputs):
+        for i, out_path in enumerate(outputs):
+            if not meta['written'][i]: continue
+            directory = os.path.dirname(out_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            shutil.copyfile(os.path.join(self._entry(key), f"out{i}"), out_path)
+
+    def store(self, key, stage, stdout, outputs):
+        """Copies the `outputs` the stage wrote into a new entry (created atomically), then evicts"""
+        written = [os.path.exists(p) for p in outputs]
+        os.makedirs(os.path.dirname(self._entry(key)), exist_ok=True)
+        tmp = tempfile.mkdtemp(dir=os.path.dirname(self._entry(key)))
+        for i, path in enumerate(outputs):
+            if written[i]:
+                shutil.copyfile(path, os.path.join(tmp, f"out{i}"))
+        _write_json(os.path.join(tmp, "meta.json"),
+                    {'stage': stage, 'created': time.time(), 'stdout': stdout, 'written': written})
+        try:
+            os.rename(tmp, self._entry(key))
+        except OSError:
+            shutil.rmtree(tmp, ignore_errors=True)   # another process stored the same key first
+        self.evict()
+
+    def evict(self):
+        """Drops least-recently-used entries until the cache fits its budget"""
+        entries = []
+        for prefix in os.listdir(self.cache_dir):
+            prefix_dir = os.path.join(self.cache_dir, prefix)
+            if not os.path.isdir(prefix_dir): continue
+            for key in os.listdir(prefix_dir):
+                entry = os.path.join(prefix_dir, key)
+                meta_path = os.path.join(entry, "meta.json")
+                if not os.path.exists(meta_path): continue
+                size = sum(os.path.getsize(os.path.join(entry, name)) for name in os.listdir(entry))
+                entries.append((os.path.getmtime(meta_path), size, entry))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries):
+            if total <= self.budget: break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+
+
+class _Tee(io.TextIOBase):
+    def __init__(self, *streams):
+        self.streams = streams
+
+    def write(self, text):
+        for s in self.streams:
+            s.write(text)
+        return len(text)
+
+    def flush(self):
+        for s in self.streams:
+            s.flush()
+
+
+def run_cached(stage, func, inputs, outputs, params=None, cache_dir=CACHE_DIR, args=(), kwargs=None):
+    """Runs func(*args, **kwargs) unless an identical run is cached.
+
+    inputs: files the result depends on (data files and the source modules involved).
+    outputs: files the stage writes; they are restored on a hit.
+    Caching is bypassed when cache_dir is empty or an input file is missing
+    (the stage then reports the missing file itself).
+    Returns func's result, or None when the run was replayed from the cache."""
+    kwargs = kwargs or {}
+    if not cache_dir or not all(os.path.exists(p) for p in inputs):
+        return func(*args, **kwargs)
+
+    cache = ResultCache(cache_dir)
+    key = cache.key(stage, inputs, params, outputs)
+    meta = cache.lookup(key)
+    if meta is not None:
+        try:
+            cache.restore(key, meta, outputs)
+            sys.stdout.write(meta['stdout'])
+            return None
+        except OSError:
+            pass   # entry damaged or evicted meanwhile: recompute
+
+    captured = io.StringIO()
+    with contextlib.redirect_stdout(_Tee(sys.stdout, captured)):
+        result = func(*args, **kwargs)
+    cache.store(key, stage, captured.getvalue(), outputs)
+    return result
+
+
+def source_files(*module_names):
+    """Paths of already-imported modules, to make code changes part of a stage's key"""
+    return [sys.modules[name].__file__ for name in module_names]
+
+
+def _write_json(path, data):
+    with atomic_write(path, 'w') as f:
+        json.dump(data, f)
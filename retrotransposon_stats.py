@@ -1,55 +1,45 @@
 import pandas as pd
 import numpy as np
-import sys
+import os
 
-def analyze_retrotransposons():
-    ltr_data = []
+from ltr_loader import LTR_FILE, load_ltrs
+from interval_index import IntervalIndex, read_intervals
+from te_classification import CLS_FILE, join_classification, load_classification
+from result_cache import run_cached, source_files
+from profiling import stage
+
+CENTROMERE_HITS_FILE = "centromere_hits.bed"   # optional: motif_scanner.py output
+CEN_FLANK = 10000
+OUTPUT_CSV = "FINAL_TE_DATASET.csv"
+
+def analyze_retrotransposons(ltr_path=LTR_FILE, cls_path=CLS_FILE, hits_path=CENTROMERE_HITS_FILE,
+                             output_csv=OUTPUT_CSV):
     try:
-        with open("ltrs.gff3", "r") as f:
-            for line in f:
-                if line.startswith("#"): continue
-                parts = line.split()
-                if len(parts) < 11: continue
-                try:
-                    start = int(parts[0])
-                    end = int(parts[1])
-                    length = int(parts[2])
-                    similarity = float(parts[9])
-                    seq_nr = int(parts[10])
-                    
-                    # Map seq_nr to chromosome
-                    chr_map = {0: 'ChrI', 1: 'ChrII', 2: 'ChrIII', 3: 'ChrIV', 4: 'ChrV', 5: 'ChrVI'}
-                    chrom = chr_map.get(seq_nr, f"Chr{seq_nr+1}")
-                    
-                    # Create Chr:Start-End
-                    key = f"{chrom}:{start}-{end}"
-                    
-                    ltr_data.append({
-                        "Key": key,
-                        "Chromosome": chrom,
-                        "Start": start,
-                        "End": end,
-                        "Length_bp": length,
-                        "LTR_Identity": similarity
-                    })
-                except ValueError: continue
+        with stage("load_ltrs") as s:
+            df_ltr = load_ltrs(ltr_path)
+            s.count = len(df_ltr)
     except FileNotFoundError:
-        print("ltrs.gff3 not found")
-        sys.exit()
+        print(f"{ltr_path} not found")
+        return
 
-    df_ltr = pd.DataFrame(ltr_data)
+    df_ltr = df_ltr.rename(columns={'Length': 'Length_bp', 'Similarity': 'LTR_Identity'})[
+        ['Key', 'Chromosome', 'Start', 'End', 'Length_bp', 'LTR_Identity']]
+    # LTRharvest reports identity to 2 decimals; widen the float32 column back for reporting/export
+    df_ltr['LTR_Identity'] = df_ltr['LTR_Identity'].astype('float64').round(2)
     print(f" -> Found {len(df_ltr)} putative LTR elements.")
 
     try:
-        df_cls = pd.read_csv("candidates.fasta.gydb.cls.tsv", sep="\t")
-        # Extract the coordinate Key from #TE column (e.g., LTR_14::ChrI:584115-589719 -> ChrI:584115-589719)
-        df_cls['Key'] = df_cls['#TE'].apply(lambda x: x.split("::")[1] if "::" in x else x)
+        # #TE coordinates (e.g., LTR_14::ChrI:584115-589719) are parsed into integer columns once
+        with stage("load_classification") as s:
+            df_cls = load_classification(cls_path)
+            s.count = len(df_cls)
         print(f" -> Found classification for {len(df_cls)} elements.")
     except FileNotFoundError:
-        print("candidates.fasta.gydb.cls.tsv not found.")
-        df_cls = pd.DataFrame(columns=['Key', 'Superfamily', 'Clade', 'Domains'])
+        print(f"{cls_path} not found.")
+        df_cls = pd.DataFrame(columns=['TE_Chrom', 'TE_Start', 'TE_End', 'Superfamily', 'Clade', 'Domains'])
 
-    df_merged = pd.merge(df_ltr, df_cls[['Key', 'Superfamily', 'Clade', 'Domains']], on='Key', how='left')
+    with stage("merge", count=len(df_ltr)):
+        df_merged = join_classification(df_ltr, df_cls)
     
     df_merged['Superfamily'] = df_merged['Superfamily'].fillna('Unclassified')
     df_merged['Clade'] = df_merged['Clade'].fillna('None')
@@ -81,11 +71,8 @@ def analyze_retrotransposons():
 
     # Centromere analysis
     print("\n Centromere/Chromovirus check")
-    cen_region = df_merged[
-        (df_merged['Chromosome'] == 'ChrVI') & 
-        (df_merged['Start'] > 650000) & 
-        (df_merged['Start'] < 670000)
-    ]
+    te_index = IntervalIndex.from_dataframe(df_merged)
+    cen_region = df_merged.iloc[np.sort(te_index.starting_in('ChrVI', 650001, 669999))]
     
     if not cen_region.empty:
         print("Element found near ChrVI Centromere (650kb-670kb):")
@@ -96,6 +83,16 @@ def analyze_retrotransposons():
     else:
         print("No elements found in the specific ChrVI centromere window.")
 
+    # TEs flanking every centromere motif hit (BED/TSV from motif_scanner.py), if available
+    if hits_path and os.path.exists(hits_path):
+        hits = pd.DataFrame(dict(zip(['Chromosome', 'Start', 'End'], read_intervals(hits_path))))
+        q, r = te_index.within_batch(hits['Chromosome'], hits['Start'], hits['End'], CEN_FLANK)
+        print(f"\n TEs within {CEN_FLANK // 1000} kb of {len(hits)} centromere motif hits ({hits_path}): {len(np.unique(r))}")
+        for qi, ri in zip(q.tolist(), r.tolist()):
+            hit = hits.iloc[qi]
+            row = df_merged.iloc[ri]
+            print(f"  * {hit['Chromosome']}:{hit['Start']}-{hit['End']} <- {row['Key']} | Clade: {row['Clade']}")
+
     # Domain analysis
     print("\n Domain analysis")
     mixed = df_merged[df_merged['Clade'] == 'mixture']
@@ -104,8 +101,13 @@ def analyze_retrotransposons():
         print("Mixed Domains (Biological Insight: Evolutionary Divergence):")
         print(mixed[['Key', 'Superfamily', 'Domains']].head(3).to_string(index=False))
 
-    df_merged.to_csv("FINAL_TE_DATASET.csv", index=False)
-    print(" -> Saved merged dataset to 'FINAL_TE_DATASET.csv'. Use this for your tables.")
+    with stage("export_csv", count=len(df_merged)):
+        df_merged.to_csv(output_csv, index=False)
+    print(f" -> Saved merged dataset to '{output_csv}'. Use this for your tables.")
 
 if __name__ == "__main__":
-    analyze_retrotransposons()
+    inputs = [LTR_FILE, CLS_FILE, __file__] + source_files('ltr_loader', 'interval_index', 'te_classification')
+    if os.path.exists(CENTROMERE_HITS_FILE):
+        inputs.append(CENTROMERE_HITS_FILE)
+    run_cached("retrotransposon_stats", analyze_retrotransposons, inputs=inputs, outputs=[OUTPUT_CSV],
+               params={'cen_flank': CEN_FLANK, 'hits': os.path.exists(CENTROMERE_HITS_FILE)})
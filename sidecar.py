@@ -0,0 +1,35 @@
+import contextlib
+import os
+
+# =================================================
+# Shared helpers for the sidecar files written next to the inputs (.fai,
+# <gtf>.npz, <fasta>.2bit.npz, <fasta>.tracks.npz, ltrs.gff3.feather,
+# *.state.json, the result cache index):
+#   file_stamp(path)    identifies the version of an input a sidecar was built from
+#   atomic_write(path)  writes a sidecar aside and renames it into place, so a
+#                       concurrent reader sees either the old file or the new one
+# =================================================
+
+
+def file_stamp(path):
+    """[mtime_ns, size] of a file, or None if there is no such file.
+    A list, so stamps still compare equal after a JSON round trip."""
+    try:
+        st = os.stat(path)
+    except (OSError, TypeError):
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+
+@contextlib.contextmanager
+def atomic_write(path, mode='wb'):
+    """Yields a file opened on a temporary name next to `path` and renames it over `path`
+    once the block completes; on any error the temporary file is removed instead"""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, mode) as f:
+            yield f
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
@@ -0,0 +1,13 @@
+# =================================================
+# Base-pair sizes written with K/M/G suffixes ('10k', '1.5M', '1G'), shared by the
+# command lines of genome_tracks.py, synthetic_data.py and benchmark_suite.py.
+# =================================================
+
+SIZE_FACTORS = {'K': 10 ** 3, 'M': 10 ** 6, 'G': 10 ** 9}
+
+
+def parse_size(text):
+    """'10M', '1G', '500k' or a plain number of bases"""
+    text = str(text).strip().upper()
+    factor = SIZE_FACTORS.get(text[-1:], 1)
+    return int(float(text[:-1] if factor > 1 else text) * factor)
@@ -0,0 +1,241 @@
+import argparse
+import json
+import os
+
+import numpy as np
+
+from ltr_loader import CHROM_MAP
+from size_units import parse_size
+
+# =================================================
+# Deterministic synthetic inputs for the benchmark suite.
+# One seed fixes a genome with planted centromere motifs (CDEI-spacer-CDEIII,
+# both strands), a BRAKER-like GTF whose introns carry planted GT-AG / GC-AG
+# splice sites, LTRharvest/GyDB tables and tBLASTn outfmt 6 hits. The planted
+# features are written to truth.json and double as correctness checks.
+# =================================================
+
+FASTA_NAME = "synthetic.fa"
+GTF_NAME = "synthetic.gtf"
+LTR_NAME = "ltrs.gff3"
+CLS_NAME = "candidates.fasta.gydb.cls.tsv"
+BLAST_NAME = "mat_search.txt"
+TRUTH_NAME = "truth.json"
+
+MAX_CHROM = 64_000_000
+LINE_WIDTH = 60
+BASES = np.frombuffer(b"ACGT", dtype=np.uint8)
+CDEI, CDEIII = b"ATCACGTG", b"TGTATGGT"
+CEN_SPACER = 120              # longest spacer the pattern allows, so a match ends exactly at the planted CDEIII
+MOTIFS_PER_MB = 10
+LTRS_PER_MB = 40
+BLAST_HITS_PER_MB = 1000
+GENE_NAMES = ['RPL3', 'RPS12', 'ACT1', 'TEF1', 'YPT7', 'FOO1', 'BAR2', 'BAZ3', '-', '-']
+COMPLEMENT = bytes.maketrans(b"ACGT", b"TGCA")
+
+
+def chrom_names(n):
+    """ChrI..ChrVI, then Chr7, Chr8, ... (the numbering ltr_loader uses for seq-nr >= 6)"""
+    return [CHROM_MAP.get(i, f"Chr{i + 1}") for i in range(n)]
+
+
+def _revcomp(seq):
+    return seq.translate(COMPLEMENT)[::-1]
+
+
+def _write_fasta_record(out, name, seq):
+    out.write(f">{name} synthetic\n".encode())
+    n_full = len(seq) // LINE_WIDTH
+    body = np.empty((n_full, LINE_WIDTH + 1), dtype=np.uint8)
+    body[:, :LINE_WIDTH] = seq[:n_full * LINE_WIDTH].reshape(n_full, LINE_WIDTH)
+    body[:, LINE_WIDTH] = ord('\n')
+    out.write(body.tobytes())
+    if len(seq) % LINE_WIDTH:
+        out.write(seq[n_full * LINE_WIDTH:].tobytes() + b"\n")
+
+
+def _layout_chromosome(rng, name, length, introns_per_gene, motif_rate):
+    """Places genes and centromere motifs left to right without overlaps.
+    Returns (genes, motifs): genes as (start, end, strand, [(exon_start, exon_end)]), 1-based."""
+    genes, motifs = [], []
+    pos = 1000
+    while pos < length - 20_000:
+        if rng.random() < motif_rate:
+            motifs.append((pos, pos + len(CDEI) + CEN_SPACER + len(CDEIII) - 1, '+' if rng.random() < 0.5 else '-'))
+            pos = motifs[-1][1] + int(rng.integers(200, 2000))
+            continue
+        n_introns = int(rng.poisson(introns_per_gene))
+        exons, p = [], pos
+        for _ in range(n_introns + 1):
+            length_e = int(rng.integers(100, 1500))
+            exons.append((p, p + length_e - 1))
+            p += length_e + int(rng.integers(60, 500))
+        genes.append((exons[0][0], exons[-1][1], '+' if rng.random() < 0.5 else '-', exons))
+        pos = exons[-1][1] + int(rng.integers(300, 3000))
+    return genes, motifs
+
+
+def _plant(rng, seq, genes, motifs):
+    """Writes motif and splice-site bases into `seq` (0-based uint8 array);
+    returns the planted splice motif of every intron, per gene"""
+    for start, end, strand in motifs:
+        spacer = BASES[rng.integers(0, 4, CEN_SPACER)].tobytes()
+        motif = CDEI + spacer + CDEIII
+        if strand == '-':
+            motif = _revcomp(motif)
+        seq[start - 1:end] = np.frombuffer(motif, dtype=np.uint8)
+
+    planted = []
+    for _, _, strand, exons in genes:
+        planted.append([])
+        for (_, a_end), (b_start, _) in zip(exons[:-1], exons[1:]):
+            donor = 'GC' if rng.random() < 0.02 else 'GT'
+            planted[-1].append(f"{donor}-AG")
+            site = (donor + 'AG').encode()       # intron on its own strand: donor..acceptor
+            if strand == '-':
+                site = _revcomp(site)
+            i0, i1 = a_end, b_start - 2          # 0-based first / last intron base
+            seq[i0:i0 + 2] = np.frombuffer(site[:2], dtype=np.uint8)
+            seq[i1 - 1:i1 + 1] = np.frombuffer(site[2:], dtype=np.uint8)
+    return planted
+
+
+def _write_gene(out, chrom, gid, strand, exons, name, transcripts):
+    gs, ge = exons[0][0], exons[-1][1]
+    extra = f' gene_name "{name}";' if name != '-' else ''
+    lines = [f'{chrom}\tAUGUSTUS\tgene\t{gs}\t{ge}\t.\t{strand}\t.\tgene_id "{gid}";{extra} go_terms "-"; cog_category "-";\n']
+    for t, tx_exons in enumerate(transcripts):
+        tid = f"{gid}.t{t + 1}"
+        ts, te = tx_exons[0][0], tx_exons[-1][1]
+        lines.append(f'{chrom}\tAUGUSTUS\ttranscript\t{ts}\t{te}\t.\t{strand}\t.\tgene_id "{gid}"; transcript_id "{tid}";{extra}\n')
+        for a, b in (tx_exons if strand == '+' else tx_exons[::-1]):
+            lines.append(f'{chrom}\tAUGUSTUS\texon\t{a}\t{b}\t.\t{strand}\t.\tgene_id "{gid}"; transcript_id "{tid}";{extra}\n')
+            lines.append(f'{chrom}\tAUGUSTUS\tCDS\t{a}\t{b}\t.\t{strand}\t0\tgene_id "{gid}"; transcript_id "{tid}";\n')
+    out.write("".join(lines))
+
+
+def generate_dataset(outdir, genome_size=10_000_000, seed=1, introns_per_gene=1.5, alt_fraction=0.1):
+    """Writes all synthetic inputs into `outdir` and returns the ground truth (also saved as truth.json)"""
+    os.makedirs(outdir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    n_chrom = max(6, -(-genome_size // MAX_CHROM))
+    lengths = [genome_size // n_chrom + (1 if i < genome_size % n_chrom else 0) for i in range(n_chrom)]
+    names = chrom_names(n_chrom)
+    motif_rate = MOTIFS_PER_MB * 3000 / 1e6   # layout slots are ~3 kb apart
+
+    truth = {'seed': seed, 'genome_size': genome_size, 'chromosomes': dict(zip(names, lengths)),
+             'motifs': [], 'genes': 0, 'transcripts': 0, 'exons': 0, 'alt_spliced_genes': 0,
+             'single_exon_genes': 0, 'multi_exon_genes': 0,
+             'introns': {'count': 0, 'sum': 0, 'min': None, 'max': None}, 'splice_sites': {'GT-AG': 0, 'GC-AG': 0}}
+
+    gene_counter = 0
+    with open(os.path.join(outdir, FASTA_NAME), 'wb') as fa, open(os.path.join(outdir, GTF_NAME), 'w') as gtf:
+        for chrom, length in zip(names, lengths):
+            seq = BASES[rng.integers(0, 4, length)]
+            genes, motifs = _layout_chromosome(rng, chrom, length, introns_per_gene, motif_rate)
+            splice_motifs = _plant(rng, seq, genes, motifs)
+            _write_fasta_record(fa, chrom, seq)
+            truth['motifs'] += [[chrom, s, e, strand] for s, e, strand in motifs]
+
+            for (_, _, strand, exons), gene_motifs in zip(genes, splice_motifs):
+                gene_counter += 1
+                transcripts = [exons]
+                if len(exons) > 2 and rng.random() < alt_fraction:
+                    transcripts.append(exons[:-1])   # alternative isoform without the last exon
+                _write_gene(gtf, chrom, f"g{gene_counter}", strand, exons,
+                            GENE_NAMES[int(rng.integers(0, len(GENE_NAMES)))], transcripts)
+
+                truth['genes'] += 1
+                truth['transcripts'] += len(transcripts)
+                truth['exons'] += len(exons)
+                truth['alt_spliced_genes'] += len(transcripts) > 1
+                truth['single_exon_genes' if len(exons) == 1 else 'multi_exon_genes'] += 1
+                for tx in transcripts:
+                    for (_, a_end), (b_start, _), motif in zip(tx[:-1], tx[1:], gene_motifs):
+                        l = b_start - a_end - 1
+                        truth['splice_sites'][motif] += 1
+                        t = truth['introns']
+                        t['count'] += 1
+                        t['sum'] += l
+                        t['min'] = l if t['min'] is None else min(t['min'], l)
+                        t['max'] = l if t['max'] is None else max(t['max'], l)
+
+    truth.update(_write_te_tables(rng, outdir, names, lengths, genome_size))
+    truth.update(_write_blast_hits(rng, outdir, names, lengths, genome_size))
+    with open(os.path.join(outdir, TRUTH_NAME), 'w') as f:
+        json.dump(truth, f)
+    return truth
+
+
+def _write_te_tables(rng, outdir, names, lengths, genome_size):
+    n = max(10, int(genome_size / 1e6 * LTRS_PER_MB))
+    seq_nr = rng.integers(0, len(names), n)
+    length = rng.integers(4000, 12000, n)
+    start = np.array([int(rng.integers(1, lengths[s] - 15_000)) for s in seq_nr])
+    _, first = np.unique(np.column_stack([seq_nr, start]), axis=0, return_index=True)
+    keep = np.sort(first)                 # one element per Chr:Start, as LTRharvest reports them
+    n, seq_nr, length, start = len(keep), seq_nr[keep], length[keep], start[keep]
+    end = start + length - 1
+    l_ltr, r_ltr = rng.integers(200, 400, n), rng.integers(200, 400, n)
+    sim = rng.choice([100.0, 99.5, 98.2, 95.0, 90.1], n)
+    classified = rng.random(n) < 0.7
+
+    with open(os.path.join(outdir, LTR_NAME), 'w') as f:
+        f.write("# predictions are reported in the following way\n"
+                "# s(ret) e(ret) l(ret) s(lLTR) e(lLTR) l(lLTR) s(rLTR) e(rLTR) l(rLTR) sim(LTRs) seq-nr\n")
+        f.write("".join(f"{s} {e} {L} {s} {s + ll - 1} {ll} {e - rl + 1} {e} {rl} {si:.2f} {sn}\n"
+                        for s, e, L, ll, rl, si, sn in zip(start.tolist(), end.tolist(), length.tolist(),
+                                                          l_ltr.tolist(), r_ltr.tolist(), sim.tolist(), seq_nr.tolist())))
+    superfamilies = ['Gypsy', 'Copia', 'mixture']
+    clades = ['Tcn1', 'Ty1', 'CRM', 'mixture', 'Ale']
+    domains = ['GAG|PROT|RT|RH|INT', 'GAG|INT|RT|RH', 'RT|RH', 'GAG|PROT|INT|RT', 'none']
+    with open(os.path.join(outdir, CLS_NAME), 'w') as f:
+        f.write("#TE\tOrder\tSuperfamily\tClade\tComplete\tStrand\tDomains\n")
+        for i in np.flatnonzero(classified).tolist():
+            f.write(f"LTR_{i}::{names[seq_nr[i]]}:{start[i]}-{end[i]}\tLTR\t"
+                    f"{superfamilies[i % 3]}\t{clades[i % 5]}\tyes\t+\t{domains[i % 5]}\n")
+    return {'ltrs': n, 'ltr_classified': int(classified.sum())}
+
+
+def _write_blast_hits(rng, outdir, names, lengths, genome_size):
+    """Background OtherProt hits everywhere; Sla2 on some scaffolds, MAT/HMG on a subset of those"""
+    n = max(100, int(genome_size / 1e6 * BLAST_HITS_PER_MB))
+    scaffolds = names
+    sla2 = [s for i, s in enumerate(scaffolds) if i % 2 == 0]
+    mat = [s for i, s in enumerate(sla2) if i % 2 == 0]
+    queries = np.array(['OtherProt'] * n, dtype=object)
+    subject = np.array(scaffolds, dtype=object)[rng.integers(0, len(scaffolds), n)]
+    k = max(4, n // 100)
+    queries[:k] = 'Sla2_Sc'
+    subject[:k] = np.array(sla2, dtype=object)[np.arange(k) % len(sla2)]
+    queries[k:2 * k] = np.array(['MATalpha1', 'HMG1', 'Mata1'], dtype=object)[np.arange(k) % 3]
+    subject[k:2 * k] = np.array(mat, dtype=object)[np.arange(k) % len(mat)]
+    order = rng.permutation(n)
+    queries, subject = queries[order], subject[order]
+
+    scaffold_len = dict(zip(scaffolds, lengths))
+    sstart = np.array([int(rng.integers(1, scaffold_len[s] - 5000)) for s in subject])
+    send = sstart + rng.choice([1, -1], n) * rng.integers(100, 3000, n)
+    pident = rng.uniform(25, 100, n)
+    alen = rng.integers(50, 900, n)
+    evalue = rng.choice([1e-50, 1e-5, 0.01, 2.5e-20], n)
+    bits = rng.uniform(20, 900, n)
+    with open(os.path.join(outdir, BLAST_NAME), 'w') as f:
+        f.write("".join(f"{q}\t{s}\t{p:.3f}\t{a}\t5\t1\t1\t300\t{ss}\t{se}\t{e}\t{b:.1f}\n"
+                        for q, s, p, a, ss, se, e, b in zip(queries.tolist(), subject.tolist(), pident.tolist(),
+                                                            alen.tolist(), sstart.tolist(), send.tolist(),
+                                                            evalue.tolist(), bits.tolist())))
+    return {'blast_hits': n, 'synteny_scaffolds': sorted(mat)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate deterministic synthetic genome/annotation/TE/BLAST inputs.")
+    parser.add_argument("outdir")
+    parser.add_argument("--size", default="10M", help="Genome size, e.g. 10M, 250M, 1G")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--introns-per-gene", type=float, default=1.5, help="Mean (Poisson) introns per gene")
+    args = parser.parse_args()
+
+    truth = generate_dataset(args.outdir, parse_size(args.size), args.seed, args.introns_per_gene)
+    print(f"Wrote {args.outdir}: {truth['genes']} genes, {truth['introns']['count']} introns, "
+          f"{len(truth['motifs'])} centromere motifs, {truth['ltrs']} LTRs, {truth['blast_hits']} BLAST hits")
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+
+# =================================================
+# GyDB classification stage shared by retrotransposon_stats.py and TE_analysis.py.
+# The "#TE" column (e.g. LTR_14::ChrI:584115-589719) is parsed once into integer
+# chrom/start/end columns with vectorised string ops, the INT/RT order check runs
+# column-wise, and LTR candidates are joined on (chrom code, start, end).
+# =================================================
+
+CLS_FILE = "candidates.fasta.gydb.cls.tsv"
+TE_COORD_RE = r'^(?:[^:]*::)?(?P<TE_Chrom>[^:]+):(?P<TE_Start>\d+)-(?P<TE_End>\d+)$'
+
+
+def domain_structure(domains):
+    """Vectorised INT/RT order check (Ty1/Copia = INT before RT; Ty3/Gypsy = RT before INT).
+    `domains` is a string column (load_classification reads it with dtype=str); missing = no domains."""
+    is_str = domains.notna().to_numpy()
+    text = domains.fillna("").astype(str)
+    pos_rt = text.str.find("RT").to_numpy()
+    pos_int = text.str.find("INT").to_numpy()
+
+    return pd.Series(np.select(
+        [~is_str,
+         (pos_rt == -1) | (pos_int == -1),
+         pos_int < pos_rt,
+         pos_rt < pos_int],
+        ["No domains",
+         "Incomplete (missing RT or INT)",
+         "Ty1/Copia-like (INT...RT)",
+         "Ty3/Gypsy-like (RT...INT)"],
+        default="Ambiguous"), index=domains.index)
+
+
+def load_classification(path=CLS_FILE):
+    """Reads the GyDB table and adds TE_Chrom/TE_Start/TE_End and Structure_Check columns.
+    Raises FileNotFoundError if the table does not exist."""
+    df = pd.read_csv(path, sep='\t', dtype={'Domains': str})
+    coords = df['#TE'].astype(str).str.extract(TE_COORD_RE)
+    df['TE_Chrom'] = coords['TE_Chrom']
+    df['TE_Start'] = pd.to_numeric(coords['TE_Start']).astype('Int64')
+    df['TE_End'] = pd.to_numeric(coords['TE_End']).astype('Int64')
+    df['Structure_Check'] = domain_structure(df['Domains'])
+    return df
+
+
+def join_classification(df_ltr, df_cls, columns=('Superfamily', 'Clade', 'Domains')):
+    """Left-joins classification `columns` onto LTR candidates by integer (chrom, start, end).
+    Equivalent to merging on the "Chr:Start-End" key string, without building it per row."""
+    chroms = pd.Index(pd.unique(pd.concat([df_ltr['Chromosome'], df_cls['TE_Chrom'].dropna()])))
+    parsed = df_cls[df_cls['TE_Start'].notna()]
+    right = pd.DataFrame({
+        '_chrom': chroms.get_indexer(parsed['TE_Chrom']),
+        'Start': parsed['TE_Start'].to_numpy(dtype=np.int64),
+        'End': parsed['TE_End'].to_numpy(dtype=np.int64),
+    })
+    for c in columns:
+        right[c] = parsed[c].to_numpy()
+
+    left = df_ltr.assign(_chrom=chroms.get_indexer(df_ltr['Chromosome']),
+                         Start=df_ltr['Start'].astype(np.int64), End=df_ltr['End'].astype(np.int64))
+    joined = left.merge(right, on=['_chrom', 'Start', 'End'], how='left').drop(columns='_chrom')
+    return joined.astype({'Start': df_ltr['Start'].dtype, 'End': df_ltr['End'].dtype})